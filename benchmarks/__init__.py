@@ -0,0 +1,6 @@
+"""
+Benchmarks for coverage, DPI extraction and report aggregation.
+
+    python -m benchmarks.run --out results.json
+    python -m benchmarks.compare before.json after.json
+"""
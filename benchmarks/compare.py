@@ -0,0 +1,57 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark result files.
+
+    python -m benchmarks.compare before.json after.json --threshold 0.1
+
+Prints wall time and peak RSS ratios per benchmark and exits with 1 if any
+benchmark got slower or bigger by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def _key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def load(path):
+    with open(path, encoding="utf-8") as fh:
+        return {_key(r): r for r in json.load(fh)["results"]}
+
+
+def compare(before, after, threshold):
+    """Yield (name, params, wall ratio, rss ratio, regressed) for shared keys."""
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        wall = new["wall_s"] / old["wall_s"] if old["wall_s"] else float("inf")
+        rss = new["peak_rss_mb"] / old["peak_rss_mb"] if old["peak_rss_mb"] else float("inf")
+        regressed = wall > 1 + threshold or rss > 1 + threshold
+        yield key[0], key[1], wall, rss, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description="Compare benchmark results.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown / growth (0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    before, after = load(args.before), load(args.after)
+    regressions = 0
+    print(f"{'benchmark':<24} {'params':<60} {'wall':>8} {'rss':>8}")
+    for name, params, wall, rss, regressed in compare(before, after, args.threshold):
+        flag = "  REGRESSION" if regressed else ""
+        regressions += regressed
+        print(f"{name:<24} {params:<60} {wall:>7.2f}x {rss:>7.2f}x{flag}")
+
+    for key in sorted(set(before) ^ set(after)):
+        side = "before" if key in before else "after"
+        print(f"{key[0]:<24} {key[1]:<60} only in {side}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
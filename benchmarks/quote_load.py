@@ -0,0 +1,177 @@
+# benchmarks/quote_load.py
+"""
+Load generator for the quote service (dtf/quote_server.py), fully offline.
+
+    python -m benchmarks.quote_load                         # starts a local server
+    python -m benchmarks.quote_load --server-workers 4 --clients 8 --duration 10
+    python -m benchmarks.quote_load --url http://127.0.0.1:8765 --endpoint batch --batch-size 100
+    python -m benchmarks.quote_load --endpoint design        # synthetic PNG upload
+
+Each client is a process with one keep-alive connection sending requests
+back to back. Prints requests/s and latency percentiles; --out also writes
+them as JSON.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ENDPOINTS = {"single": "/quote", "batch": "/quote/batch", "design": "/quote/design"}
+
+
+def _synthetic_design(length_m=0.2, dpi=150):
+    """PNG bytes of a generated design (see benchmarks.synth)."""
+    from benchmarks.synth import write_design
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "design.png")
+        write_design(path, length_m, dpi, 0.5, fmt="png")
+        with open(path, "rb") as fh:
+            return fh.read()
+
+
+def _request(endpoint, batch_size, design):
+    """(path, body, headers) for one request of the given kind."""
+    if endpoint == "design":
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"design\"; filename=\"load.png\"\r\n"
+            f"Content-Type: image/png\r\n\r\n"
+        ).encode() + design + f"\r\n--{boundary}--\r\n".encode()
+        return ENDPOINTS[endpoint], body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    rng = np.random.default_rng()
+    if endpoint == "batch":
+        jobs = [{"length_m": round(float(l), 3), "coverage": round(float(c), 3)}
+                for l, c in zip(rng.uniform(0.1, 5, batch_size), rng.random(batch_size))]
+        payload = {"jobs": jobs}
+    else:
+        payload = {"length_m": round(float(rng.uniform(0.1, 5)), 3), "coverage": round(float(rng.random()), 3)}
+    return ENDPOINTS[endpoint], json.dumps(payload).encode(), {"Content-Type": "application/json"}
+
+
+def _client(args):
+    host, port, endpoint, batch_size, design, duration = args
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    # a handful of pre-built bodies so building JSON doesn't dominate
+    requests = [_request(endpoint, batch_size, design) for _ in range(16)]
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        path, body, headers = requests[i % len(requests)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("POST", path, body, headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies, errors
+
+
+def _start_server(workers):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "dtf.quote_server", "--port", "0", "--workers", str(workers)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline()  # "Serving quotes on http://host:port with N workers"
+    if not line.startswith("Serving"):
+        proc.kill()
+        raise RuntimeError(f"quote server didn't start: {line!r}")
+    return proc, line.split()[3]
+
+
+def _wait_ready(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def run(url, endpoint="single", clients=4, duration=5.0, batch_size=50):
+    """Load `url` and return a dict of results."""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    _wait_ready(host, port)
+    design = _synthetic_design() if endpoint == "design" else b""
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(clients) as pool:
+        results = pool.map(_client, [(host, port, endpoint, batch_size, design, duration)] * clients)
+    latencies = np.concatenate([np.asarray(lat) for lat, _ in results]) if results else np.array([])
+    errors = sum(err for _, err in results)
+    ok = len(latencies)
+    p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).tolist() if ok else (None, None, None)
+    return {
+        "endpoint": endpoint,
+        "clients": clients,
+        "duration_s": duration,
+        "requests": ok,
+        "errors": errors,
+        "requests_per_s": ok / duration,
+        "quotes_per_s": ok * (batch_size if endpoint == "batch" else 1) / duration,
+        "latency_ms": {"p50": p50, "p95": p95, "p99": p99},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.quote_load", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="running service; default: start one on a free local port")
+    parser.add_argument("--server-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="single")
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds")
+    parser.add_argument("--batch-size", type=int, default=50, help="jobs per /quote/batch request")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if not url:
+        server, url = _start_server(args.server_workers)
+    try:
+        result = run(url, args.endpoint, args.clients, args.duration, args.batch_size)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    lat = result["latency_ms"]
+    print(
+        f"{result['endpoint']}: {result['requests_per_s']:.0f} req/s ({result['quotes_per_s']:.0f} quotes/s), "
+        f"{result['errors']} errors, latency p50 {lat['p50'] or 0:.2f} ms, p95 {lat['p95'] or 0:.2f} ms, "
+        f"p99 {lat['p99'] or 0:.2f} ms"
+    )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
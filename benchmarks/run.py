@@ -0,0 +1,264 @@
+# benchmarks/run.py
+"""
+Time coverage, DPI extraction and report aggregation on synthetic data.
+
+    python -m benchmarks.run --out results.json            # quick preset
+    python -m benchmarks.run --preset full --out full.json
+    python -m benchmarks.run --preset full --lengths 0.5 2 --dpis 300
+
+Every measurement runs in a fresh process so its peak RSS is its own.
+Imports and in-memory inputs are set up in that process before the clock
+starts, so wall_s is the work alone, not loading pandas. Generated files
+are kept in --data-dir and reused by later runs.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+PRESETS = {
+    "quick": {
+        "designs": [(0.5, 150, 0.1, "png"), (0.5, 300, 0.6, "tif"), (2, 300, 0.6, "tif"), (2, 300, 0.6, "png")],
+        "folders": [1000],
+        "rows": [10_000, 100_000],
+        "repeat": 3,
+    },
+    "full": {
+        "lengths": [0.5, 2, 5, 10],
+        "dpis": [150, 300, 600],
+        "densities": [0.05, 0.5, 0.95],
+        "formats": ["tif", "png"],
+        "folders": [1000, 10_000, 100_000],
+        "rows": [10_000, 100_000, 1_000_000],
+        "repeat": 1,
+    },
+}
+
+COVERAGE_METHODS = ("exact", "estimate", "ink")
+DPI_METHODS = ("header", "pillow", "scan")
+
+
+def _maxrss_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# --- cases (module level so spawned processes can import them) ---
+# Each case does its imports and builds its inputs, then returns the work
+# to time as a callable.
+
+def case_coverage(path, method):
+    if method == "exact":
+        from dtf.coverage import coverage_fraction
+        return lambda: coverage_fraction(path)
+    if method == "estimate":
+        from dtf.coverage import estimate_coverage
+        return lambda: estimate_coverage(path)
+    from dtf.ink import ink_usage
+    return lambda: ink_usage(path)
+
+
+def case_dpi(folder, method):
+    from PIL import Image
+
+    from dtf.report import get_dpi, list_tifs, process_files, read_tif_info
+
+    def header():
+        for _, path in list_tifs(folder):
+            read_tif_info(path)
+
+    def pillow():
+        for _, path in list_tifs(folder):
+            with Image.open(path) as img:
+                get_dpi(img)
+
+    def scan():
+        process_files(list_tifs(folder))
+
+    return {"header": header, "pillow": pillow, "scan": scan}[method]
+
+
+def case_aggregate(n_rows, method, folder=None):
+    import numpy as np
+    import pandas as pd
+
+    from dtf.report import summarize
+    from dtf.report_index import ReportIndex
+
+    if method == "groupby":
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            "Client": [f"client{i:03d}" for i in rng.integers(0, 50, n_rows)],
+            "Order": rng.integers(1, 10_000, n_rows),
+            "c*d": rng.random(n_rows) * 10,
+        })
+        return lambda: summarize(df)
+
+    def index():
+        # warm incremental index: nothing changed, just stat + read totals
+        with ReportIndex(os.path.join(folder, "..", os.path.basename(folder) + ".sqlite")) as report_index:
+            report_index.update(folder)
+            report_index.summary()
+
+    return index
+
+
+def _child(conn, func, args):
+    work = func(*args)
+    base = _maxrss_mb()
+    start = time.perf_counter()
+    work()
+    wall = time.perf_counter() - start
+    conn.send((wall, base, _maxrss_mb()))
+    conn.close()
+
+
+def measure(func, args, repeat):
+    """Time func(*args)() `repeat` times in fresh processes; min wall, max peak."""
+    ctx = multiprocessing.get_context("spawn")
+    walls, bases, peaks = [], [], []
+    for _ in range(repeat):
+        parent, child = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_child, args=(child, func, args))
+        proc.start()
+        child.close()
+        wall, base, peak = parent.recv()
+        proc.join()
+        walls.append(wall)
+        bases.append(base)
+        peaks.append(peak)
+    return {
+        "wall_s": min(walls),
+        "base_rss_mb": round(min(bases), 1),
+        "peak_rss_mb": round(max(peaks), 1),
+    }
+
+
+# --- data ---
+
+def _design_specs(preset, args):
+    if "designs" in preset and not any((args.lengths, args.dpis, args.densities, args.formats)):
+        return preset["designs"]
+    lengths = args.lengths or preset.get("lengths", [0.5, 2])
+    dpis = args.dpis or preset.get("dpis", [300])
+    densities = args.densities or preset.get("densities", [0.5])
+    formats = args.formats or preset.get("formats", ["tif"])
+    return [(l, d, a, f) for l in lengths for d in dpis for a in densities for f in formats]
+
+
+def _ensure_design(data_dir, length_m, dpi, density, fmt):
+    from benchmarks.synth import write_design
+
+    path = os.path.join(data_dir, f"design-{length_m}m-{dpi}dpi-{density}a.{fmt}")
+    if not os.path.exists(path):
+        tmp = path + ".partial"
+        write_design(tmp, length_m, dpi, density, fmt=fmt)
+        os.replace(tmp, path)
+    return path
+
+
+def _ensure_folder(data_dir, count):
+    from benchmarks.synth import write_report_folder
+
+    folder = os.path.join(data_dir, f"report-{count}")
+    done = folder + ".done"
+    if not os.path.exists(done):
+        write_report_folder(folder, count)
+        open(done, "w").close()
+    return folder
+
+
+def _meta():
+    import numpy
+    import pandas
+    import PIL
+
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        rev = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "pillow": PIL.__version__,
+    }
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "dtf-bench-data"))
+    parser.add_argument("--only", nargs="+", choices=["coverage", "dpi", "aggregate"], help="run only these groups")
+    parser.add_argument("--lengths", nargs="+", type=float, help="design lengths in meters")
+    parser.add_argument("--dpis", nargs="+", type=int)
+    parser.add_argument("--densities", nargs="+", type=float, help="fraction of inked area, 0..1")
+    parser.add_argument("--formats", nargs="+", choices=["tif", "png"])
+    parser.add_argument("--folders", nargs="+", type=int, help="files per report folder")
+    parser.add_argument("--rows", nargs="+", type=int, help="rows for the groupby benchmark")
+    parser.add_argument("--repeat", type=int)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    preset = PRESETS[args.preset]
+    repeat = args.repeat or preset["repeat"]
+    groups = args.only or ["coverage", "dpi", "aggregate"]
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    results = []
+
+    def record(name, params, func, func_args):
+        print(f"{name} {params} ...", end=" ", flush=True)
+        stats = measure(func, func_args, repeat)
+        print(f"{stats['wall_s']:.3f}s, peak {stats['peak_rss_mb']:.0f} MB", flush=True)
+        results.append({"name": name, "params": params, **stats})
+
+    if "coverage" in groups:
+        for length_m, dpi, density, fmt in _design_specs(preset, args):
+            path = _ensure_design(args.data_dir, length_m, dpi, density, fmt)
+            params = {"length_m": length_m, "dpi": dpi, "density": density, "format": fmt}
+            for method in COVERAGE_METHODS:
+                record(f"coverage.{method}", params, case_coverage, (path, method))
+
+    folders = args.folders or preset["folders"]
+    if "dpi" in groups:
+        for count in folders:
+            folder = _ensure_folder(args.data_dir, count)
+            for method in DPI_METHODS:
+                record(f"dpi.{method}", {"files": count}, case_dpi, (folder, method))
+
+    if "aggregate" in groups:
+        for n_rows in args.rows or preset["rows"]:
+            record("aggregate.groupby", {"rows": n_rows}, case_aggregate, (n_rows, "groupby"))
+        for count in folders:
+            folder = _ensure_folder(args.data_dir, count)
+            # first update builds the index; the timed one is the warm rerun
+            case_aggregate(count, "index", folder)()
+            record("aggregate.index_warm", {"files": count}, case_aggregate, (count, "index", folder))
+
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump({"meta": _meta(), "preset": args.preset, "results": results}, fh, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# benchmarks/synth.py
+"""
+Synthetic test data: gang-sheet designs and folders of report TIFs.
+
+Designs are written strip by strip (our own uncompressed TIFF and streaming
+PNG writers), so multi-meter sheets can be generated without holding the
+image in memory.
+"""
+import os
+import struct
+import zlib
+
+import numpy as np
+
+# every design is printed on the 60 cm roll
+SHEET_WIDTH_CM = 60.0
+
+# alpha is decided per block of pixels so shapes look like artwork, not noise
+_BLOCK_PX = 16
+
+
+def design_size(length_m, dpi, width_cm=SHEET_WIDTH_CM):
+    """Pixel (width, height) of a sheet of `length_m` at `dpi`."""
+    width = int(round(width_cm / 2.54 * dpi))
+    height = int(round(length_m * 100 / 2.54 * dpi))
+    return width, height
+
+
+def iter_design_strips(width, height, density, strip_rows=256, seed=0):
+    """
+    Yield (rows, width, 4) uint8 RGBA strips of a synthetic design.
+
+    About `density` of the blocks are inked, with mixed opacity; colour is a
+    gradient so CMYK channels all get some ink.
+    """
+    rng = np.random.default_rng(seed)
+    blocks_x = -(-width // _BLOCK_PX)
+    xs = np.arange(width)
+    for y0 in range(0, height, strip_rows):
+        rows = min(strip_rows, height - y0)
+        ys = np.arange(y0, y0 + rows)
+        block_rows = -(-rows // _BLOCK_PX) + 1
+        inked = rng.random((block_rows, blocks_x)) < density
+        opacity = rng.integers(1, 256, size=(block_rows, blocks_x), dtype=np.uint16)
+        by = (ys - (y0 - y0 % _BLOCK_PX)) // _BLOCK_PX
+        bx = xs // _BLOCK_PX
+
+        strip = np.empty((rows, width, 4), dtype=np.uint8)
+        strip[:, :, 0] = (xs * 255 // max(1, width - 1))[None, :]
+        strip[:, :, 1] = (ys * 255 // max(1, height - 1))[:, None]
+        strip[:, :, 2] = 128
+        strip[:, :, 3] = np.where(inked[by][:, bx], opacity[by][:, bx], 0)
+        yield strip
+
+
+def write_tiff(path, width, height, strips, dpi, samples=4, big=None):
+    """
+    Write an uncompressed TIFF from (rows, width[, samples]) uint8 strips.
+
+    samples=4 is RGBA (unassociated alpha), samples=1 greyscale. `big`
+    forces BigTIFF on or off; by default it is used when the pixel data
+    doesn't fit in 4 GB.
+    """
+    row_bytes = width * samples
+    data_bytes = row_bytes * height
+    if big is None:
+        big = data_bytes + 4096 >= 2 ** 32
+    e = "<"
+    off_fmt = "Q" if big else "L"
+    off_size = 8 if big else 4
+
+    # pixel data goes right after the header, the IFD after the data
+    header_size = 16 if big else 8
+    strip_offsets = []
+    strip_counts = []
+
+    with open(path, "wb") as fp:
+        fp.write(b"\0" * header_size)
+        for strip in strips:
+            strip_offsets.append(fp.tell())
+            buf = np.ascontiguousarray(strip, dtype=np.uint8).tobytes()
+            strip_counts.append(len(buf))
+            fp.write(buf)
+        rows_per_strip = height if len(strip_offsets) <= 1 else (strip_counts[0] // row_bytes)
+
+        long_type = 16 if big else 4
+        type_fmt = {3: "H", 4: "L", 5: "LL", 16: "Q"}
+        ratio = (int(round(dpi * 100)), 100)
+        entries = [
+            (256, 4, [width]),
+            (257, 4, [height]),
+            (258, 3, [8] * samples),
+            (259, 3, [1]),
+            (262, 3, [2 if samples == 4 else 1]),
+            (273, long_type, strip_offsets),
+            (277, 3, [samples]),
+            (278, 4, [rows_per_strip]),
+            (279, long_type, strip_counts),
+            (282, 5, [ratio]),
+            (283, 5, [ratio]),
+            (296, 3, [2]),
+        ]
+        if samples == 4:
+            entries.append((338, 3, [2]))  # unassociated alpha
+
+        # values that don't fit in the entry go between the data and the IFD
+        packed = []
+        extra = bytearray()
+        extra_base = fp.tell()
+        for tag, ftype, values in entries:
+            flat = [v for value in values for v in (value if isinstance(value, tuple) else (value,))]
+            raw = struct.pack(e + type_fmt[ftype] * len(values), *flat)
+            if len(raw) <= off_size:
+                inline = raw.ljust(off_size, b"\0")
+            else:
+                inline = struct.pack(e + off_fmt, extra_base + len(extra))
+                extra.extend(raw)
+                if len(extra) % 2:
+                    extra.append(0)
+            packed.append((tag, ftype, len(values), inline))
+        fp.write(extra)
+
+        ifd_at = fp.tell()
+        entry_fmt = e + ("HHQ" if big else "HHL")
+        fp.write(struct.pack(e + ("Q" if big else "H"), len(packed)))
+        for tag, ftype, count, inline in packed:
+            fp.write(struct.pack(entry_fmt, tag, ftype, count) + inline)
+        fp.write(b"\0" * off_size)  # no next IFD
+
+        fp.seek(0)
+        if big:
+            fp.write(b"II" + struct.pack(e + "HHHQ", 43, 8, 0, ifd_at))
+        else:
+            fp.write(b"II" + struct.pack(e + "HL", 42, ifd_at))
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">L", len(data)) + kind + data + struct.pack(">L", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def write_png(path, width, height, strips, dpi, level=6):
+    """Write an RGBA PNG from strips, compressing as we go."""
+    ppm = int(round(dpi / 0.0254))
+    comp = zlib.compressobj(level)
+    with open(path, "wb") as fp:
+        fp.write(b"\x89PNG\r\n\x1a\n")
+        fp.write(_png_chunk(b"IHDR", struct.pack(">LLBBBBB", width, height, 8, 6, 0, 0, 0)))
+        fp.write(_png_chunk(b"pHYs", struct.pack(">LLB", ppm, ppm, 1)))
+        for strip in strips:
+            rows = np.ascontiguousarray(strip, dtype=np.uint8).reshape(strip.shape[0], -1)
+            # filter type 0 (None) in front of every row
+            raw = np.hstack([np.zeros((rows.shape[0], 1), dtype=np.uint8), rows]).tobytes()
+            data = comp.compress(raw)
+            if data:
+                fp.write(_png_chunk(b"IDAT", data))
+        fp.write(_png_chunk(b"IDAT", comp.flush()))
+        fp.write(_png_chunk(b"IEND", b""))
+
+
+def write_design(path, length_m, dpi, density, fmt="tif", seed=0):
+    """Generate one design file; returns its (width, height)."""
+    width, height = design_size(length_m, dpi)
+    strips = iter_design_strips(width, height, density, seed=seed)
+    if fmt == "png":
+        write_png(path, width, height, strips, dpi)
+    else:
+        write_tiff(path, width, height, strips, dpi)
+    return width, height
+
+
+def write_report_folder(folder, count, clients=50, seed=0):
+    """
+    Fill `folder` with `count` tiny ``client-order-copies.tif`` files.
+
+    Heights and DPIs vary so lengths do too; pixels are 1 px wide since
+    only the header matters for the report.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    dpis = rng.choice([150, 300, 600], size=count)
+    heights = rng.integers(500, 20000, size=count)
+    copies = rng.integers(1, 20, size=count)
+    client_ids = rng.integers(0, clients, size=count)
+    for i in range(count):
+        name = f"client{client_ids[i]:03d}-{i + 1}-{copies[i]}.tif"
+        height = int(heights[i])
+        strip = np.zeros((height, 1), dtype=np.uint8)
+        write_tiff(os.path.join(folder, name), 1, height, [strip], float(dpis[i]), samples=1)
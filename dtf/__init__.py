@@ -0,0 +1,6 @@
+"""
+Shared (non-UI) helpers for the DTF Streamlit pages.
+
+Pages under ``pages/`` are Streamlit scripts and can't be imported without
+rendering, so anything reusable lives here.
+"""
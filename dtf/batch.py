@@ -0,0 +1,261 @@
+# dtf/batch.py
+"""
+Batch quoting: coverage and length for many designs, priced in one table.
+
+Reading alpha is CPU-bound numpy work, so designs are analyzed in a process
+pool and handed back as they finish. Workers return a small dict, so
+nothing large is pickled back.
+
+Files are read only when they are handed to a worker, and only as many as
+fit in `memory_budget` are in flight at once: 500 uploaded TIFs don't turn
+into 500 copies of their bytes queued in the pool. Uploads above
+`spill_bytes` are copied to a temp file in chunks and the worker reads them
+from disk, strip by strip; payloads are released as each result arrives.
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+from PIL import Image
+
+from dtf.coverage import DEFAULT_STRIP_BYTES
+from dtf.nesting import alpha_extent
+from dtf.pricing import price_jobs
+
+# leave one core for Streamlit itself
+DEFAULT_BATCH_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# file bytes allowed in flight (queued for or held by workers) at once
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+# uploads bigger than this go to workers as temp files instead of bytes
+DEFAULT_SPILL_BYTES = 16 * 1024 * 1024
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def analyze_design(name, source, strip_bytes=DEFAULT_STRIP_BYTES):
+    """
+    Coverage and size of one design, given as bytes, a path or a file object.
+
+    Returns a dict with name, width_px, height_px, dpi (None when the file
+    has none), coverage, ink_coverage (opacity-weighted), bbox (the inked
+    pixel box, see alpha_extent) and error (None or a message, in which case
+    the other values are missing).
+    """
+    try:
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        elif hasattr(source, "seek"):
+            source.seek(0)
+        with Image.open(source) as img:
+            extent = alpha_extent(img, strip_bytes=strip_bytes)
+        total = extent["width_px"] * extent["height_px"]
+        return {
+            "name": name,
+            "width_px": extent["width_px"],
+            "height_px": extent["height_px"],
+            "dpi": extent["dpi"],
+            "coverage": extent["inked_pixels"] / total if total else 0.0,
+            "ink_coverage": extent["weighted_pixels"] / total if total else 0.0,
+            "bbox": extent["bbox"],
+            "error": None,
+        }
+    except Exception as e:
+        return {"name": name, "error": f"Error processing {name}: {e}"}
+
+
+def iter_analyze(items, pool=None, workers=DEFAULT_BATCH_WORKERS, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 spill_bytes=DEFAULT_SPILL_BYTES):
+    """
+    Yield (index, analyze_design result) for (name, source) items as they
+    finish; a source is bytes, a path or a file object (e.g. an upload).
+
+    Uses `pool` if given (e.g. one kept alive across reruns), otherwise a
+    pool of `workers` processes for this call. workers <= 1 runs serially.
+    At most 2 * `workers` items are in flight, fewer when their bytes would
+    exceed `memory_budget` (one is always let through, however big).
+    """
+    items = list(items)
+    if pool is None and (workers is None or workers <= 1):
+        for i, (name, source) in enumerate(items):
+            yield i, analyze_design(name, source)
+        return
+
+    own = pool is None
+    if own:
+        pool = ProcessPoolExecutor(max_workers=int(workers))
+    max_in_flight = 2 * max(1, int(workers or 1))
+    pending = {}
+    in_memory = 0
+    queue = iter(enumerate(items))
+    next_item = next(queue, None)
+    try:
+        while pending or next_item is not None:
+            while next_item is not None and len(pending) < max_in_flight:
+                i, (name, source) = next_item
+                size = _size(source)
+                if pending and size <= spill_bytes and in_memory + size > memory_budget:
+                    break
+                payload, held, spilled = _payload(source, size, spill_bytes)
+                pending[pool.submit(analyze_design, name, payload)] = (i, held, spilled)
+                in_memory += held
+                del payload
+                next_item = next(queue, None)
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, held, spilled = pending.pop(future)
+                in_memory -= held
+                if spilled:
+                    os.remove(spilled)
+                try:
+                    yield i, future.result()
+                except Exception as e:  # worker died (e.g. out of memory)
+                    yield i, {"name": items[i][0], "error": f"Error processing {items[i][0]}: {e}"}
+    finally:
+        for future, (_, _, spilled) in pending.items():
+            future.cancel()
+            if spilled:
+                try:
+                    os.remove(spilled)
+                except OSError:  # still open in a worker (Windows); the OS cleans up temp
+                    pass
+        if own:
+            pool.shutdown(cancel_futures=True)
+
+
+def analyze_cached(items, keys, cache, pool=None, workers=DEFAULT_BATCH_WORKERS, progress=None,
+                   memory_budget=DEFAULT_MEMORY_BUDGET, spill_bytes=DEFAULT_SPILL_BYTES):
+    """
+    analyze_design results for `items`, in order, computing only cache misses.
+
+    `keys` are the cache digests of the items (content hash, or path + size
+    + mtime). Misses go to iter_analyze; successful results are stored under
+    ("batch", key). `progress(done, total, index, result)` is called as
+    misses finish.
+    """
+    results = [cache.get(("batch", key)) for key in keys]
+    todo = [i for i, result in enumerate(results) if result is None]
+    misses = iter_analyze([items[i] for i in todo], pool=pool, workers=workers, memory_budget=memory_budget,
+                          spill_bytes=spill_bytes)
+    for done, (j, result) in enumerate(misses, start=1):
+        i = todo[j]
+        results[i] = result
+        if not result["error"]:
+            cache.put(("batch", keys[i]), result)
+        if progress:
+            progress(done, len(todo), i, result)
+    return results
+
+
+def shared_pool():
+    """
+    The one process pool of this process, started on first use.
+
+    Pages pass it to iter_analyze/analyze_cached so they don't each start
+    workers that compete for the same cores. DTF_BATCH_WORKERS overrides
+    DEFAULT_BATCH_WORKERS.
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ProcessPoolExecutor(
+                max_workers=int(os.environ.get("DTF_BATCH_WORKERS", DEFAULT_BATCH_WORKERS))
+            )
+        return _shared_pool
+
+
+def _size(source):
+    """Bytes a source takes to send to a worker (paths are free)."""
+    if isinstance(source, (str, os.PathLike)):
+        return 0
+    if isinstance(source, bytes):
+        return len(source)
+    if hasattr(source, "getbuffer"):
+        with source.getbuffer() as view:
+            return view.nbytes
+    position = source.seek(0, os.SEEK_END)
+    source.seek(0)
+    return position
+
+
+def _payload(source, size, spill_bytes):
+    """
+    (what to send a worker, bytes of it held in memory, temp path to delete).
+
+    Paths go as they are. Sources up to `spill_bytes` go as bytes; bigger
+    ones are copied to a temp file in chunks and sent as its path.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return source, 0, None
+    if size <= spill_bytes:
+        if isinstance(source, bytes):
+            return source, size, None
+        source.seek(0)
+        return source.read(), size, None
+
+    fd, path = tempfile.mkstemp(prefix="dtf-spill-", suffix=".img")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if isinstance(source, bytes):
+                out.write(source)
+            else:
+                source.seek(0)
+                shutil.copyfileobj(source, out, 1024 * 1024)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, 0, path
+
+
+def price_batch(results, settings, copies=None, fallback_dpi=300.0):
+    """
+    One priced row per analyzed design plus a TOTAL row.
+
+    `copies` is a list parallel to `results` (default 1 each). Designs
+    without a DPI are measured at `fallback_dpi`. Failed designs are left
+    out. Costs are for all copies of a design.
+    """
+    rows = []
+    copies = copies if copies is not None else [1] * len(results)
+    for result, n in zip(results, copies):
+        if result is None or result["error"]:
+            continue
+        dpi = result["dpi"] or fallback_dpi
+        rows.append({
+            "Design": result["name"],
+            "DPI": round(dpi, 1),
+            "DPI from file": result["dpi"] is not None,
+            "Width (cm)": result["width_px"] / dpi * 2.54,
+            "Length (cm)": result["height_px"] / dpi * 2.54,
+            "Coverage (%)": result["coverage"] * 100,
+            "Copies": int(n),
+            "ink_coverage": result["ink_coverage"],
+        })
+    table = pd.DataFrame(rows, columns=[
+        "Design", "DPI", "DPI from file", "Width (cm)", "Length (cm)", "Coverage (%)", "Copies", "ink_coverage",
+    ])
+
+    length_m = table["Length (cm)"].to_numpy() / 100.0 * table["Copies"].to_numpy()
+    costs = price_jobs(length_m, table["Coverage (%)"].to_numpy() / 100.0, settings, table["ink_coverage"].to_numpy())
+    table = table.drop(columns="ink_coverage")
+    table["Min (EGP)"] = costs["total_min"].to_numpy()
+    table["Average (EGP)"] = costs["total_avg"].to_numpy()
+    table["Max (EGP)"] = costs["total_max"].to_numpy()
+
+    total = {
+        "Design": "TOTAL",
+        "Copies": int(table["Copies"].sum()),
+        "Min (EGP)": table["Min (EGP)"].sum(),
+        "Average (EGP)": table["Average (EGP)"].sum(),
+        "Max (EGP)": table["Max (EGP)"].sum(),
+    }
+    table = pd.concat([table, pd.DataFrame([total])], ignore_index=True)
+    return table.round({"Width (cm)": 2, "Length (cm)": 2, "Coverage (%)": 1,
+                        "Min (EGP)": 2, "Average (EGP)": 2, "Max (EGP)": 2})
@@ -0,0 +1,179 @@
+# dtf/cache.py
+"""
+Content-hash keyed cache for coverage results.
+
+Streamlit reruns the page on every widget change; with this cache a rerun
+that only changes prices finds the coverage by the upload's hash and skips
+decoding. One instance is meant to be shared by all sessions and pages
+(see shared_cache()), so it is thread safe.
+"""
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def content_hash(data):
+    """Hex digest identifying a file's bytes."""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def file_hash(fileobj, chunk_bytes=1024 * 1024):
+    """content_hash() of a file object's contents, read in chunks instead of one copy."""
+    digest = hashlib.blake2b(digest_size=20)
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_bytes), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def _sizeof(value):
+    """Rough memory size of a cached value, counting numpy buffers."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class CoverageCache:
+    """
+    LRU cache of results keyed by (kind, content hash).
+
+    `max_bytes` bounds the in-memory size; the least recently used entries
+    are dropped first. With `directory` set, entries are also pickled there
+    so they survive restarts; the directory is trimmed to `max_bytes` too,
+    oldest files first.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, directory=None):
+        self.max_bytes = int(max_bytes)
+        self.directory = directory
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def _path(self, key):
+        kind, digest = key
+        return os.path.join(self.directory, f"{kind}-{digest}.pkl")
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as fh:
+                    value = pickle.load(fh)
+                os.utime(path)  # disk trimming goes by last use
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return default
+            self._put_memory(key, value)
+            return value
+        return default
+
+    def put(self, key, value):
+        self._put_memory(key, value)
+        if self.directory:
+            self._put_disk(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, calling `compute()` on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _put_memory(self, key, value):
+        size = _sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+
+    def _put_disk(self, key, value):
+        # write to a temp file first so readers never see half a pickle
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        try:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pkl"):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def shared_cache():
+    """
+    The one CoverageCache of this process, created on first use.
+
+    Every page uses it, so DTF_COVERAGE_CACHE_MB (default 256) bounds the
+    whole server rather than each page; DTF_COVERAGE_CACHE_DIR, when set,
+    persists it. Keys start with their kind ("batch", "trim", ...), so pages
+    share entries only where they compute the same thing.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = CoverageCache(
+                max_bytes=int(os.environ.get("DTF_COVERAGE_CACHE_MB", "256")) * 1024 * 1024,
+                directory=os.environ.get("DTF_COVERAGE_CACHE_DIR") or None,
+            )
+        return _shared_cache
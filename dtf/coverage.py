@@ -0,0 +1,501 @@
+# dtf/coverage.py
+"""
+Print coverage from a design's alpha channel, computed strip by strip.
+
+``np.array(Image.open(f).convert("RGBA"))`` holds the decoded image, the
+RGBA copy and the numpy copy at the same time. Here we walk the image in
+horizontal strips and only ever keep one strip's alpha band around, so a
+60 cm x 5 m gang sheet doesn't need GBs. Uncompressed and multi-strip TIFFs
+are decoded band by band; 8-bit PNGs are inflated and unfiltered band by
+band too. Anything else is decoded whole, up to MAX_FULL_DECODE_BYTES.
+
+The result is the same number as ``(alpha > 0).sum() / alpha.size`` on the
+fully converted image. estimate_coverage() gives a quicker sampled number
+with a confidence interval for previews.
+"""
+import io
+import os
+import struct
+import zlib
+from bisect import bisect_right
+
+import numpy as np
+from PIL import Image
+
+from dtf.instrument import stage, timed_iter
+
+# memory allowed for one strip of decoded pixels
+DEFAULT_STRIP_BYTES = 64 * 1024 * 1024
+
+# largest sheet we quote: 60 cm x 10 m at 600 DPI. Pillow's default
+# decompression-bomb limit (~89 MP) rejects ordinary multi-meter gang sheets.
+MAX_DESIGN_PIXELS = 14_200 * 236_300
+if Image.MAX_IMAGE_PIXELS and Image.MAX_IMAGE_PIXELS < MAX_DESIGN_PIXELS:
+    Image.MAX_IMAGE_PIXELS = MAX_DESIGN_PIXELS
+
+# modes that carry their own alpha band
+_ALPHA_MODES = ("RGBA", "RGBa", "LA", "La", "PA")
+
+# bytes per pixel used to size strips (worst case for modes we meet)
+_BYTES_PER_PIXEL = 4
+
+# rows read by estimate_coverage (one per stratum)
+DEFAULT_SAMPLE_ROWS = 512
+
+# uncompressed raw modes whose rows we can seek to directly
+_RAW_BYTES_PER_PIXEL = {"RGBA": 4, "RGBa": 4, "LA": 2, "La": 2}
+
+# formats we can't read strip by strip are decoded whole; above this many
+# decoded bytes we refuse instead (DTF_MAX_FULL_DECODE_MB overrides)
+MAX_FULL_DECODE_BYTES = 2048 * 1024 * 1024
+
+# 8-bit PNG colour types we stream: colour type -> bytes per pixel
+_PNG_BYTES_PER_PIXEL = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# _decode_band drives Pillow's decoders directly, through internals that
+# aren't public API; without them we fall back to the whole-image path
+_HAVE_BAND_DECODER = (
+    hasattr(Image, "_getdecoder") and hasattr(Image.core, "new") and hasattr(Image.Image, "_new")
+)
+
+
+def _strip_rows(width, strip_bytes, bytes_per_pixel=_BYTES_PER_PIXEL):
+    """Rows per strip so one decoded strip stays within `strip_bytes`."""
+    per_row = max(1, width * bytes_per_pixel)
+    return max(1, int(strip_bytes) // per_row)
+
+
+def _has_implicit_opaque_alpha(img):
+    """
+    True when convert("RGBA") would give alpha 255 everywhere.
+
+    That is any mode without an alpha band and without a transparency key,
+    so we can skip decoding pixels altogether.
+    """
+    if img.mode in _ALPHA_MODES or img.mode == "P":
+        return False
+    return "transparency" not in img.info
+
+
+def _split_raw_tiles(tiles, max_rows):
+    """
+    Cut uncompressed ("raw") tiles taller than `max_rows` into row chunks.
+
+    Raw rows sit at a fixed stride in the file, so a chunk is just the same
+    tile with a later offset. Other codecs are returned untouched.
+    """
+    out = []
+    for tile in tiles:
+        decoder_name, (x0, y0, x1, y1), offset, args = tile
+        if isinstance(args, str):
+            args = (args, 0, 1)
+        row_px = _RAW_BYTES_PER_PIXEL.get(args[0]) if decoder_name == "raw" else None
+        if row_px is None or len(args) < 3 or args[2] != 1 or y1 - y0 <= max_rows:
+            out.append(tile)
+            continue
+        stride = args[1] or (x1 - x0) * row_px
+        for cy0 in range(y0, y1, max_rows):
+            cy1 = min(y1, cy0 + max_rows)
+            out.append((decoder_name, (x0, cy0, x1, cy1), offset + (cy0 - y0) * stride, args))
+    return out
+
+
+def _band_tiles(img, max_rows):
+    """
+    Group the image's decoder tiles into row bands, or None if we can't.
+
+    Only works when Pillow decodes the file as independent pieces, i.e.
+    uncompressed or multi-strip TIFFs. Single-stream formats (PNG, libtiff
+    compressed TIFF, JPEG) have one tile and must be decoded in one go.
+    """
+    tiles = list(getattr(img, "tile", None) or [])
+    if not _HAVE_BAND_DECODER or not tiles or img.mode not in _ALPHA_MODES:
+        return None
+    if hasattr(img, "load_read") or hasattr(img, "load_seek"):
+        return None
+    if getattr(img, "tile_prefix", b""):
+        return None
+    if any(t[0] == "libtiff" for t in tiles):
+        return None
+    if len(tiles) == 1 and tiles[0][0] != "raw":
+        return None
+
+    bands = {}
+    for tile in _split_raw_tiles(tiles, max_rows):
+        x0, y0, x1, y1 = tile[1]
+        bands.setdefault((y0, y1), []).append(tile)
+    return [(y0, y1, bands[(y0, y1)]) for y0, y1 in sorted(bands)]
+
+
+def _decode_band(img, y0, y1, tiles):
+    """Decode only `tiles` (all inside rows y0..y1) into a new image."""
+    band = Image.core.new(img.mode, (img.width, y1 - y0))
+    fp = img.fp
+    for decoder_name, extents, offset, args in tiles:
+        x0, ty0, x1, ty1 = extents
+        fp.seek(offset)
+        decoder = Image._getdecoder(img.mode, decoder_name, args, img.decoderconfig)
+        try:
+            decoder.setimage(band, (x0, ty0 - y0, x1, ty1 - y0))
+            if getattr(decoder, "pulls_fd", False):
+                decoder.setfd(fp)
+                decoder.decode(b"")
+            else:
+                buf = b""
+                while True:
+                    chunk = fp.read(img.decodermaxblock)
+                    if not chunk:
+                        break
+                    buf += chunk
+                    n, err = decoder.decode(buf)
+                    if n < 0:
+                        if err < 0:
+                            raise OSError(f"decoder error {err}")
+                        break
+                    buf = buf[n:]
+        finally:
+            decoder.cleanup()
+    return Image.Image()._new(band)
+
+
+def _iter_tile_bands(img, bands, max_rows):
+    """Merge consecutive tile bands up to `max_rows` and decode each group."""
+    group = []
+    group_y0 = None
+    for y0, y1, tiles in bands:
+        if group and y1 - group_y0 > max_rows:
+            yield _decode_band(img, group_y0, group_end, group)
+            group = []
+        if not group:
+            group_y0 = y0
+        group.extend(tiles)
+        group_end = y1
+    if group:
+        yield _decode_band(img, group_y0, group_end, group)
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">L", len(data)) + kind + data + struct.pack(">L", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def _png_layout(img):
+    """
+    (colour type, bytes per pixel, PLTE/tRNS chunks) of a PNG we can stream,
+    or None. That is a single-frame, non-interlaced, 8-bit PNG.
+    """
+    fp = getattr(img, "fp", None)
+    if img.format != "PNG" or fp is None or getattr(img, "is_animated", False):
+        return None
+    fp.seek(0)
+    if fp.read(8) != _PNG_SIGNATURE:
+        return None
+    layout = None
+    extra = []
+    while True:
+        head = fp.read(8)
+        if len(head) < 8:
+            return None
+        length, kind = struct.unpack(">L4s", head)
+        if kind == b"IDAT":
+            fp.seek(-8, os.SEEK_CUR)
+            return (*layout, extra) if layout else None
+        data = fp.read(length)
+        fp.seek(4, os.SEEK_CUR)  # crc
+        if kind == b"IHDR":
+            _, _, depth, colour, _, _, interlace = struct.unpack(">LLBBBBB", data)
+            if depth != 8 or interlace or colour not in _PNG_BYTES_PER_PIXEL:
+                return None
+            layout = (colour, _PNG_BYTES_PER_PIXEL[colour])
+        elif kind in (b"PLTE", b"tRNS"):
+            extra.append(_png_chunk(kind, data))
+
+
+def _iter_idat(fp, piece_bytes=1024 * 1024):
+    """Yield the compressed image data of a PNG positioned at its first IDAT, in pieces."""
+    while True:
+        head = fp.read(8)
+        if len(head) < 8:
+            return
+        length, kind = struct.unpack(">L4s", head)
+        if kind == b"IEND":
+            return
+        if kind != b"IDAT":
+            fp.seek(length + 4, os.SEEK_CUR)
+            continue
+        while length:
+            piece = fp.read(min(length, piece_bytes))
+            if not piece:
+                return
+            length -= len(piece)
+            yield piece
+        fp.seek(4, os.SEEK_CUR)  # crc
+
+
+def _iter_png_bands(img, layout, max_rows):
+    """
+    Decode a PNG `max_rows` rows at a time without holding the whole image.
+
+    The zlib stream is inflated just far enough for each band. Its still
+    filtered scanlines become a small stand-alone PNG that Pillow decodes
+    (unfiltering in C); the previous band's last row goes in front as an
+    unfiltered row, since Up/Average/Paeth filters refer to it.
+    """
+    colour, bpp, extra = layout
+    width, height = img.size
+    row_bytes = 1 + width * bpp
+    inflate = zlib.decompressobj()
+    pieces = _iter_idat(img.fp)
+    prior = None
+    for y0 in range(0, height, max_rows):
+        rows = min(max_rows, height - y0)
+        need = rows * row_bytes
+        scan = bytearray(b"\0" + prior) if prior is not None else bytearray()
+        start = len(scan)
+        while len(scan) - start < need:
+            data = inflate.unconsumed_tail or next(pieces, None)
+            if data is None or (inflate.eof and not inflate.unconsumed_tail):
+                raise OSError("truncated PNG image data")
+            scan += inflate.decompress(data, need - (len(scan) - start))
+        band_rows = rows + (prior is not None)
+        png = b"".join([
+            _PNG_SIGNATURE,
+            _png_chunk(b"IHDR", struct.pack(">LLBBBBB", width, band_rows, 8, colour, 0, 0, 0)),
+            *extra,
+            _png_chunk(b"IDAT", zlib.compress(scan, 0)),
+            _png_chunk(b"IEND", b""),
+        ])
+        del scan
+        band = Image.open(io.BytesIO(png))
+        band.load()
+        del png
+        prior = band.crop((0, band_rows - 1, width, band_rows)).tobytes()
+        yield band.crop((0, 1, width, band_rows)) if band_rows > rows else band
+
+
+def _full_decode_limit():
+    env = os.environ.get("DTF_MAX_FULL_DECODE_MB")
+    return int(env) * 1024 * 1024 if env else MAX_FULL_DECODE_BYTES
+
+
+def _check_full_decode(img):
+    """Refuse images we'd have to decode whole when they don't fit the limit."""
+    width, height = img.size
+    size = width * height * (1 if len(img.getbands()) == 1 else 4)
+    limit = _full_decode_limit()
+    if size > limit:
+        raise ValueError(
+            f"{img.format or 'this'} image of {width} x {height} px can't be read strip by strip and would "
+            f"need {size / 2 ** 20:,.0f} MB decoded (limit {limit / 2 ** 20:,.0f} MB, DTF_MAX_FULL_DECODE_MB); "
+            f"save it as an uncompressed TIFF or a non-interlaced 8-bit PNG"
+        )
+
+
+def _iter_strips(img, max_rows):
+    """Yield `img` as PIL images of at most `max_rows` rows, top to bottom."""
+    bands = _band_tiles(img, max_rows)
+    if bands is not None:
+        yield from _iter_tile_bands(img, bands, max_rows)
+        return
+
+    layout = _png_layout(img)
+    if layout is not None:
+        yield from _iter_png_bands(img, layout, max_rows)
+        return
+
+    # other single-stream formats (compressed TIFF, JPEG, interlaced PNG):
+    # the decoder needs the whole image once, but we still avoid the extra
+    # RGBA copy and the full numpy array
+    _check_full_decode(img)
+    width, height = img.size
+    for y0 in range(0, height, max_rows):
+        yield img.crop((0, y0, width, min(height, y0 + max_rows)))
+
+
+def iter_alpha_strips(img, strip_bytes=DEFAULT_STRIP_BYTES):
+    """
+    Yield the RGBA alpha channel of `img` as uint8 arrays, one strip at a time.
+
+    Each array is (rows, width). Concatenated they equal
+    ``np.array(img.convert("RGBA"))[:, :, 3]``.
+    """
+    width, height = img.size
+    max_rows = _strip_rows(width, strip_bytes)
+
+    if _has_implicit_opaque_alpha(img):
+        for y0 in range(0, height, max_rows):
+            yield np.full((min(max_rows, height - y0), width), 255, dtype=np.uint8)
+        return
+
+    for strip in _iter_strips(img, max_rows):
+        if strip.mode in _ALPHA_MODES:
+            alpha = strip.getchannel("A")
+        else:
+            alpha = strip.convert("RGBA").getchannel("A")
+        yield np.asarray(alpha)
+
+
+def iter_rgba_strips(img, strip_bytes=DEFAULT_STRIP_BYTES, bytes_per_pixel=_BYTES_PER_PIXEL):
+    """
+    Yield `img` converted to RGBA as (rows, width, 4) uint8 arrays.
+
+    `bytes_per_pixel` lets callers that build temporaries per strip size the
+    strips for their own working memory.
+    """
+    max_rows = _strip_rows(img.width, strip_bytes, bytes_per_pixel)
+    for strip in _iter_strips(img, max_rows):
+        if strip.mode != "RGBA":
+            strip = strip.convert("RGBA")
+        yield np.asarray(strip)
+
+
+def open_image(source):
+    """
+    Return (image, should_close) for a path, file-like object or PIL image.
+
+    Only images we opened from a path are ours to close; callers keep their
+    file objects (e.g. Streamlit uploads) usable. File objects are rewound
+    first since uploads get read again on every rerun.
+    """
+    if isinstance(source, Image.Image):
+        return source, False
+    if hasattr(source, "seek"):
+        source.seek(0)
+    with stage("open"):
+        img = Image.open(source)
+    return img, isinstance(source, (str, os.PathLike))
+
+
+def alpha_pixel_count(source, strip_bytes=DEFAULT_STRIP_BYTES):
+    """
+    Count pixels with alpha > 0. Returns (inked_pixels, total_pixels).
+
+    `source` is a path, a file-like object or an already opened PIL image.
+    """
+    img, own = open_image(source)
+    try:
+        inked = 0
+        for alpha in timed_iter(iter_alpha_strips(img, strip_bytes=strip_bytes), "decode"):
+            with stage("reduce"):
+                inked += int(np.count_nonzero(alpha))
+        return inked, img.width * img.height
+    finally:
+        if own:
+            img.close()
+
+
+def coverage_fraction(source, strip_bytes=DEFAULT_STRIP_BYTES):
+    """Fraction (0..1) of pixels with non-empty alpha."""
+    inked, total = alpha_pixel_count(source, strip_bytes=strip_bytes)
+    return inked / total if total else 0.0
+
+
+def _alpha_rows(img, rows):
+    """
+    RGBA alpha of the given (sorted) row indices, as (len(rows), width) uint8.
+
+    Seekable files (uncompressed / strip TIFFs) only decode the strips that
+    hold those rows; other formats are walked strip by strip.
+    """
+    out = np.empty((len(rows), img.width), dtype=np.uint8)
+    bands = _band_tiles(img, 1)
+    if bands is not None:
+        starts = [band[0] for band in bands]
+        current = None
+        for i, y in enumerate(rows):
+            j = bisect_right(starts, y) - 1
+            if current is None or current[0] != j:
+                y0, y1, tiles = bands[j]
+                band = _decode_band(img, y0, y1, tiles)
+                current = (j, y0, np.asarray(band.getchannel("A")))
+            out[i] = current[2][y - current[1]]
+        return out
+
+    i = 0
+    y0 = 0
+    for strip in _iter_strips(img, _strip_rows(img.width, DEFAULT_STRIP_BYTES)):
+        y1 = y0 + strip.height
+        if i < len(rows) and rows[i] < y1:
+            if strip.mode not in _ALPHA_MODES:
+                strip = strip.convert("RGBA")
+            alpha = np.asarray(strip.getchannel("A"))
+            while i < len(rows) and rows[i] < y1:
+                out[i] = alpha[rows[i] - y0]
+                i += 1
+        if i == len(rows):
+            break
+        y0 = y1
+    return out
+
+
+def _stratified_se(values, weights):
+    """
+    Standard error of a one-sample-per-stratum mean (collapsed strata).
+
+    Neighbouring strata are paired and the spread inside each pair stands in
+    for the within-stratum variance.
+    """
+    n = len(values)
+    if n < 2:
+        return 0.0
+    k = n // 2 * 2
+    a, b = values[0:k:2], values[1:k:2]
+    pair_w = weights[0:k:2] + weights[1:k:2]
+    var = float(np.sum(pair_w ** 2 * (a - b) ** 2 / 4.0))
+    if n % 2:
+        var += float(weights[-1] ** 2 * (values[-1] - values[-2]) ** 2 / 2.0)
+    return var ** 0.5
+
+
+def estimate_coverage(source, samples=DEFAULT_SAMPLE_ROWS, z=1.96, seed=0):
+    """
+    Estimate coverage from a stratified sample of rows.
+
+    The image is cut into `samples` equal bands of rows and one random row is
+    read from each. Returns a dict with ``coverage`` (fraction with alpha > 0),
+    its ``low``/``high`` bounds at `z` standard errors (1.96 ~ 95%),
+    ``weighted_coverage`` and ``mean_opacity`` estimates, ``rows_sampled`` and
+    ``exact`` (True when every row was read or the answer is known without
+    sampling).
+    """
+    img, own = open_image(source)
+    try:
+        width, height = img.size
+        if _has_implicit_opaque_alpha(img) or not width or not height:
+            full = 1.0 if width and height else 0.0
+            return {
+                "coverage": full, "low": full, "high": full,
+                "weighted_coverage": full, "mean_opacity": 1.0,
+                "rows_sampled": 0, "exact": True,
+            }
+
+        if samples >= height:
+            edges = np.arange(height + 1)
+            rows = edges[:-1]
+        else:
+            edges = np.linspace(0, height, int(samples) + 1).astype(np.int64)
+            rng = np.random.default_rng(seed)
+            rows = edges[:-1] + (rng.random(len(edges) - 1) * np.diff(edges)).astype(np.int64)
+        with stage("decode"):
+            alpha = _alpha_rows(img, rows)
+    finally:
+        if own:
+            img.close()
+
+    weights = np.diff(edges) / float(height)
+    area_rows = np.count_nonzero(alpha, axis=1) / float(width)
+    weighted_rows = alpha.sum(axis=1, dtype=np.uint64) / (255.0 * width)
+
+    coverage = float(np.sum(weights * area_rows))
+    weighted = float(np.sum(weights * weighted_rows))
+    exact = len(rows) == height
+    margin = 0.0 if exact else z * _stratified_se(area_rows, weights)
+    return {
+        "coverage": coverage,
+        "low": max(0.0, coverage - margin),
+        "high": min(1.0, coverage + margin),
+        "weighted_coverage": weighted,
+        "mean_opacity": weighted / coverage if coverage else 1.0,
+        "rows_sampled": len(rows),
+        "exact": exact,
+    }
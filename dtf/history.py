@@ -0,0 +1,282 @@
+# dtf/history.py
+"""
+Report history: every processed file, kept in one SQLite file for queries.
+
+Clients are dictionary-encoded (a clients table of names, rows store the
+id) and come back as a pandas Categorical. Each row also stores its day
+(days since 1970-01-01, local time) and month (year * 12 + month - 1) as
+integers. A trigger keeps per-day, per-client totals in their own table, so
+queries group at most days x clients rows (not one per file) and week,
+month and year buckets are integer arithmetic on those.
+
+The job time of a row is the file's mtime when known, else when it was
+recorded. Files read from a folder are recorded once per path: re-running
+a report, or touching or re-syncing a file, doesn't count it again, and a
+file whose row changed replaces its old row (the daily totals move with
+it). Same-named jobs in other folders (order numbers restart per folder)
+are kept. Uploads have no path, so they are recorded once per name and c*d.
+"""
+import datetime
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+HISTORY_FILENAME = ".dtf_report_history.sqlite"
+
+# same integer c*d units as dtf.report_index
+_CD_SCALE = 10000
+
+# 1970-01-01 was a Thursday; (day + 3) % 7 is 0 on Mondays
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+PERIODS = ("day", "week", "month", "year", None)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    client_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    job_time INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    client_id INTEGER NOT NULL REFERENCES clients (client_id),
+    order_no INTEGER,
+    copies INTEGER,
+    length_m REAL,
+    cd_e4 INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    path TEXT UNIQUE,
+    recorded_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_day ON history (day, client_id);
+CREATE UNIQUE INDEX IF NOT EXISTS history_upload ON history (file, cd_e4) WHERE path IS NULL;
+CREATE TABLE IF NOT EXISTS daily (
+    day INTEGER NOT NULL,
+    client_id INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    copies INTEGER NOT NULL,
+    cd_e4 INTEGER NOT NULL,
+    max_order INTEGER,
+    PRIMARY KEY (day, client_id)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS history_daily AFTER INSERT ON history BEGIN
+    INSERT INTO daily (day, client_id, month, files, copies, cd_e4, max_order)
+    VALUES (NEW.day, NEW.client_id, NEW.month, 1, COALESCE(NEW.copies, 0), NEW.cd_e4, NEW.order_no)
+    ON CONFLICT (day, client_id) DO UPDATE SET
+        files = files + 1,
+        copies = copies + excluded.copies,
+        cd_e4 = cd_e4 + excluded.cd_e4,
+        max_order = MAX(COALESCE(max_order, excluded.max_order), excluded.max_order);
+END;
+-- a replaced row leaves its old day (a max can't be decremented, so it is
+-- recomputed from the day's rows) and is counted on its new one
+CREATE TRIGGER IF NOT EXISTS history_daily_update AFTER UPDATE ON history BEGIN
+    UPDATE daily SET
+        files = files - 1,
+        copies = copies - COALESCE(OLD.copies, 0),
+        cd_e4 = cd_e4 - OLD.cd_e4,
+        max_order = (SELECT MAX(order_no) FROM history WHERE day = OLD.day AND client_id = OLD.client_id)
+    WHERE day = OLD.day AND client_id = OLD.client_id;
+    DELETE FROM daily WHERE day = OLD.day AND client_id = OLD.client_id AND files <= 0;
+    INSERT INTO daily (day, client_id, month, files, copies, cd_e4, max_order)
+    VALUES (NEW.day, NEW.client_id, NEW.month, 1, COALESCE(NEW.copies, 0), NEW.cd_e4, NEW.order_no)
+    ON CONFLICT (day, client_id) DO UPDATE SET
+        files = files + 1,
+        copies = copies + excluded.copies,
+        cd_e4 = cd_e4 + excluded.cd_e4,
+        max_order = MAX(COALESCE(max_order, excluded.max_order), excluded.max_order);
+END;
+"""
+
+_ROW = (
+    "INTO history (job_time, day, month, client_id, order_no, copies, length_m, cd_e4, file, path, recorded_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_INSERT_UPLOAD = "INSERT OR IGNORE " + _ROW
+
+# a folder file already recorded is replaced only when its row changed
+_UPSERT_BY_PATH = "INSERT " + _ROW + (
+    " ON CONFLICT (path) DO UPDATE SET job_time = excluded.job_time, day = excluded.day, month = excluded.month, "
+    "client_id = excluded.client_id, order_no = excluded.order_no, copies = excluded.copies, "
+    "length_m = excluded.length_m, cd_e4 = excluded.cd_e4, file = excluded.file, recorded_at = excluded.recorded_at "
+    "WHERE client_id IS NOT excluded.client_id OR order_no IS NOT excluded.order_no "
+    "OR copies IS NOT excluded.copies OR length_m IS NOT excluded.length_m OR cd_e4 IS NOT excluded.cd_e4 "
+    "OR file IS NOT excluded.file"
+)
+
+# SQL for each period bucket; labels are turned into dates in _bucket_label
+_BUCKETS = {
+    "day": "day",
+    "week": "day - (day + 3) % 7",
+    "month": "month",
+    "year": "month / 12",
+    None: "0",
+}
+
+
+def default_history_path():
+    """DTF_HISTORY_PATH, or a file in the user's home directory."""
+    return os.environ.get("DTF_HISTORY_PATH") or os.path.join(os.path.expanduser("~"), HISTORY_FILENAME)
+
+
+def _day(date):
+    return date.toordinal() - _EPOCH_ORDINAL
+
+
+def _date(day):
+    return datetime.date.fromordinal(int(day) + _EPOCH_ORDINAL)
+
+
+def _bucket_label(period, value):
+    if period in ("day", "week"):
+        return _date(value)
+    if period == "month":
+        return datetime.date(int(value) // 12, int(value) % 12 + 1, 1)
+    if period == "year":
+        return datetime.date(int(value), 1, 1)
+    return None
+
+
+class HistoryStore:
+    """
+    History of report rows, one per job, with date-range/client queries.
+
+    ``with HistoryStore(default_history_path()) as store: store.append(rows)``
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+        self._client_ids = dict(self._db.execute("SELECT name, client_id FROM clients"))
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _client_id(self, name):
+        client_id = self._client_ids.get(name)
+        if client_id is None:
+            client_id = self._db.execute("INSERT INTO clients (name) VALUES (?)", (name,)).lastrowid
+            self._client_ids[name] = client_id
+        return client_id
+
+    def append(self, rows, job_times=None, paths=None):
+        """
+        Record report rows (dicts as built by dtf.report.make_row).
+
+        `job_times` (unix times, e.g. mtimes) and `paths` are sequences
+        parallel to `rows`, with None where unknown. Rows without a job time
+        get the current time. A row with a path replaces that path's row if
+        it changed and is skipped otherwise (a new mtime alone isn't a new
+        job); a row without one is skipped if its File was recorded with the
+        same c*d. Returns the number of new or replaced rows.
+        """
+        now = int(time.time())
+        rows = list(rows)
+        job_times = job_times if job_times is not None else [None] * len(rows)
+        paths = paths if paths is not None else [None] * len(rows)
+        by_path, uploads = [], []
+        with self._db:
+            for row, job_time, path in zip(rows, job_times, paths):
+                job_time = int(now if job_time is None else job_time)
+                date = datetime.date.fromtimestamp(job_time)
+                cd_e4 = int(round(row["c*d"] * _CD_SCALE))
+                (uploads if path is None else by_path).append((
+                    job_time,
+                    _day(date),
+                    date.year * 12 + date.month - 1,
+                    self._client_id(row["Client"]),
+                    row["Order"],
+                    row["Copies (c)"],
+                    row["Length (d, m)"],
+                    cd_e4,
+                    row["File"],
+                    path,
+                    now,
+                ))
+            # rowcount leaves out the triggers' changes to the daily table
+            added = self._db.executemany(_UPSERT_BY_PATH, by_path).rowcount
+            added += self._db.executemany(_INSERT_UPLOAD, uploads).rowcount
+            return added
+
+    def clients(self):
+        """All client names, sorted."""
+        return sorted(self._client_ids)
+
+    def date_range(self):
+        """(first, last) job date in the store, or (None, None) when empty."""
+        first, last = self._db.execute("SELECT MIN(day), MAX(day) FROM daily").fetchone()
+        if first is None:
+            return None, None
+        return _date(first), _date(last)
+
+    def _where(self, start, end, clients):
+        where, params = [], []
+        if start is not None:
+            where.append("day >= ?")
+            params.append(_day(start))
+        if end is not None:
+            where.append("day <= ?")
+            params.append(_day(end))
+        if clients:
+            ids = [self._client_ids[name] for name in clients if name in self._client_ids]
+            where.append(f"client_id IN ({', '.join('?' * len(ids))})" if ids else "0")
+            params.extend(ids)
+        return (" WHERE " + " AND ".join(where)) if where else "", params
+
+    def _categorical(self, ids):
+        names = {client_id: name for name, client_id in self._client_ids.items()}
+        codes = ids.map({client_id: i for i, client_id in enumerate(sorted(names, key=names.get))})
+        return pd.Categorical.from_codes(codes.astype("int64"), categories=sorted(names.values()))
+
+    def query(self, start=None, end=None, clients=None, period="week"):
+        """
+        Per-client totals between `start` and `end` (dates, inclusive).
+
+        `period` is "day", "week" (starting Monday), "month", "year" or None
+        for one total per client. Returns a DataFrame with Period (the first
+        day of the bucket), Client (categorical), Files, Copies, Meters
+        (Σ c*d) and Max Order.
+        """
+        if period not in _BUCKETS:
+            raise ValueError(f"period must be one of {PERIODS}")
+        where, params = self._where(start, end, clients)
+        data = self._db.execute(
+            f"SELECT {_BUCKETS[period]} AS bucket, client_id, SUM(files), SUM(copies), SUM(cd_e4), MAX(max_order) "
+            f"FROM daily{where} GROUP BY bucket, client_id ORDER BY bucket",
+            params,
+        ).fetchall()
+        frame = pd.DataFrame(data, columns=["bucket", "client_id", "Files", "Copies", "cd_e4", "Max Order"])
+        frame.insert(0, "Period", [_bucket_label(period, value) for value in frame["bucket"]])
+        frame.insert(1, "Client", self._categorical(frame["client_id"]))
+        frame["Meters"] = frame.pop("cd_e4") / _CD_SCALE
+        frame = frame.drop(columns=["bucket", "client_id"])
+        if period is None:
+            frame = frame.drop(columns="Period")
+        return frame[[c for c in ("Period", "Client", "Files", "Copies", "Meters", "Max Order") if c in frame]]
+
+    def rows(self, start=None, end=None, clients=None):
+        """Raw history rows in the range, oldest first, with a Job Time (UTC) column."""
+        where, params = self._where(start, end, clients)
+        data = self._db.execute(
+            "SELECT job_time, client_id, order_no, copies, length_m, cd_e4, file "
+            f"FROM history{where} ORDER BY job_time, id",
+            params,
+        ).fetchall()
+        frame = pd.DataFrame(data, columns=["job_time", "client_id", "Order", "Copies (c)", "Length (d, m)", "cd_e4", "File"])
+        frame.insert(0, "Job Time (UTC)", pd.to_datetime(frame.pop("job_time"), unit="s"))
+        frame.insert(1, "Client", self._categorical(frame.pop("client_id")))
+        frame.insert(5, "c*d", frame.pop("cd_e4") / _CD_SCALE)
+        return frame
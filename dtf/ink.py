@@ -0,0 +1,129 @@
+# dtf/ink.py
+"""
+Opacity-weighted ink estimate per CMYK channel plus white underbase.
+
+Plain alpha coverage counts a 5% shadow like a solid area. Here every pixel
+is weighted by its alpha, RGB is split into CMYK with full grey component
+replacement (K = 255 - max(R, G, B)), and white underbase is laid under
+everything that is inked, at the pixel's opacity.
+
+All per-pixel work is uint16 on one strip at a time (see dtf.coverage), so
+multi-meter designs don't need float copies of the whole image.
+"""
+import numpy as np
+
+from dtf.coverage import DEFAULT_STRIP_BYTES, iter_rgba_strips, open_image
+from dtf.instrument import stage, timed_iter
+
+INK_CHANNELS = ("C", "M", "Y", "K", "W")
+
+# rgba strip + ~8 uint16 temporaries per pixel
+_WORK_BYTES_PER_PIXEL = 4 + 8 * 2
+
+
+def _strip_channel_sums(rgba):
+    """
+    Sum opacity-weighted channel values for one (rows, width, 4) uint8 strip.
+
+    Returns (sums, row_alpha): sums is a length-5 uint64 array in INK_CHANNELS
+    order, in units of 255 * 255 per fully inked pixel; row_alpha is the
+    alpha sum per row.
+    """
+    r = rgba[:, :, 0].astype(np.uint16)
+    g = rgba[:, :, 1].astype(np.uint16)
+    b = rgba[:, :, 2].astype(np.uint16)
+    a = rgba[:, :, 3].astype(np.uint16)
+
+    mx = np.maximum(np.maximum(r, g), b)
+    safe = np.maximum(mx, 1)  # black pixels: C=M=Y=0 either way
+
+    sums = np.zeros(len(INK_CHANNELS), dtype=np.uint64)
+    for i, chan in enumerate((r, g, b)):
+        # (mx - chan) * 255 <= 65025, fits uint16
+        ink = (mx - chan) * 255 // safe
+        ink *= a  # ink <= 255, a <= 255
+        sums[i] = ink.sum(dtype=np.uint64)
+
+    k = 255 - mx
+    k *= a
+    sums[3] = k.sum(dtype=np.uint64)
+    sums[4] = a.sum(dtype=np.uint64) * 255
+
+    return sums, a.sum(axis=1, dtype=np.uint64)
+
+
+def ink_usage(source, strip_bytes=DEFAULT_STRIP_BYTES):
+    """
+    Estimate ink coverage of a design, channel by channel.
+
+    `source` is a path, file-like object or PIL image. Returns a dict:
+
+    - ``channels``: {"C", "M", "Y", "K", "W"} -> fraction (0..1) of the design
+      area that would be covered if that channel were printed solid
+    - ``area_coverage``: fraction of pixels with alpha > 0 (the old number)
+    - ``weighted_coverage``: opacity-weighted coverage (same as ``W``)
+    - ``mean_opacity``: weighted / area coverage, 1.0 for a blank design
+    - ``row_profile``: float32 array, opacity-weighted coverage of each row
+      from top to bottom
+    - ``bbox``: (left, top, right, bottom) pixel box of alpha > 0, as in
+      dtf.trim.trim_extent, or None for a fully transparent design
+    """
+    img, own = open_image(source)
+    try:
+        width, height = img.size
+        totals = np.zeros(len(INK_CHANNELS), dtype=np.uint64)
+        inked = 0
+        profile = np.empty(height, dtype=np.float32)
+        cols = np.zeros(width, dtype=bool)
+        top = bottom = None
+        y = 0
+        for rgba in timed_iter(iter_rgba_strips(img, strip_bytes, _WORK_BYTES_PER_PIXEL), "decode"):
+            with stage("reduce"):
+                sums, row_alpha = _strip_channel_sums(rgba)
+                totals += sums
+                inked += int(np.count_nonzero(rgba[:, :, 3]))
+                rows = np.flatnonzero(row_alpha)
+                if rows.size:
+                    if top is None:
+                        top = y + int(rows[0])
+                    bottom = y + int(rows[-1]) + 1
+                    cols |= rgba[rows[0]:rows[-1] + 1, :, 3].any(axis=0)
+            profile[y:y + len(row_alpha)] = row_alpha / (255.0 * width)
+            y += len(row_alpha)
+    finally:
+        if own:
+            img.close()
+
+    bbox = None
+    if top is not None:
+        xs = np.flatnonzero(cols)
+        bbox = (int(xs[0]), top, int(xs[-1]) + 1, bottom)
+
+    pixels = width * height
+    full = float(pixels) * 255 * 255
+    channels = {
+        name: (float(total) / full if pixels else 0.0)
+        for name, total in zip(INK_CHANNELS, totals)
+    }
+    area = inked / pixels if pixels else 0.0
+    weighted = channels["W"]
+    return {
+        "channels": channels,
+        "area_coverage": area,
+        "weighted_coverage": weighted,
+        "mean_opacity": weighted / area if area else 1.0,
+        "row_profile": profile,
+        "bbox": bbox,
+    }
+
+
+def channel_split(channels):
+    """
+    Share of total ink per channel (sums to 1), for splitting ml figures.
+
+    Returns equal shares when nothing is inked.
+    """
+    total = sum(channels[name] for name in INK_CHANNELS)
+    if total <= 0:
+        return {name: 1.0 / len(INK_CHANNELS) for name in INK_CHANNELS}
+    return {name: channels[name] / total for name in INK_CHANNELS}
@@ -0,0 +1,201 @@
+# dtf/instrument.py
+"""
+Per-stage timing and memory instrumentation for the pages.
+
+A page run creates a Recorder and activates it; code anywhere below (also
+inside dtf modules) wraps work in ``with stage("name", file=...)``. When no
+recorder is active, stage() returns a shared no-op context manager, so the
+cost when disabled is one context-variable lookup.
+
+Finished runs can be appended to a JSON-lines file and/or summarized in a
+Prometheus text-format file (for node_exporter's textfile collector).
+Enable with DTF_TIMINGS=1; DTF_TIMINGS_JSONL and DTF_TIMINGS_PROM set the
+output files.
+"""
+import contextvars
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+_current = contextvars.ContextVar("dtf_recorder", default=None)
+
+# process-wide totals for the Prometheus file: (page, stage) -> [count, seconds]
+_prom_totals = {}
+_prom_lock = threading.Lock()
+
+
+def enabled_by_env():
+    return os.environ.get("DTF_TIMINGS", "").lower() in ("1", "true", "yes", "on")
+
+
+def _rss_mb():
+    """Current resident set size in MB (peak RSS where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        import resource  # not on Windows, where /proc is missing too
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+_END = object()
+
+
+class _Stage:
+    __slots__ = ("recorder", "key", "start", "rss")
+
+    def __init__(self, recorder, key):
+        self.recorder = recorder
+        self.key = key
+
+    def __enter__(self):
+        self.rss = _rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.start
+        self.recorder._add(self.key, wall, _rss_mb() - self.rss)
+        return False
+
+
+class Recorder:
+    """
+    Collects stage timings for one page run.
+
+    Repeated stages with the same name and file (e.g. one per strip) are
+    summed into one record with a count.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self._records = {}  # (stage, file) -> [count, seconds, rss delta MB]
+        self._lock = threading.Lock()
+        self._token = None
+
+    def _add(self, key, wall, rss_delta):
+        with self._lock:
+            rec = self._records.get(key)
+            if rec is None:
+                self._records[key] = [1, wall, rss_delta]
+            else:
+                rec[0] += 1
+                rec[1] += wall
+                rec[2] += rss_delta
+
+    def stage(self, name, file=None):
+        return _Stage(self, (name, file))
+
+    def activate(self):
+        """Make this the recorder used by stage() in this context."""
+        self._token = _current.set(self)
+        return self
+
+    def deactivate(self):
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def rows(self):
+        """Records as dicts, in the order stages were first seen."""
+        with self._lock:
+            items = list(self._records.items())
+        return [
+            {
+                "page": self.page,
+                "run_id": self.run_id,
+                "stage": stage_name,
+                "file": file,
+                "count": count,
+                "wall_ms": round(wall * 1000, 3),
+                "rss_delta_mb": round(rss_delta, 2),
+            }
+            for (stage_name, file), (count, wall, rss_delta) in items
+        ]
+
+    def write_jsonl(self, path):
+        """Append this run's records to a JSON-lines file."""
+        ts = round(self.started, 3)
+        with open(path, "a", encoding="utf-8") as fh:
+            for row in self.rows():
+                fh.write(json.dumps({"ts": ts, **row}) + "\n")
+
+    def write_prometheus(self, path):
+        """
+        Add this run to the process totals and rewrite the Prometheus file.
+
+        Per-file detail is left out to keep label cardinality low.
+        """
+        with _prom_lock:
+            for row in self.rows():
+                total = _prom_totals.setdefault((row["page"], row["stage"]), [0, 0.0])
+                total[0] += row["count"]
+                total[1] += row["wall_ms"] / 1000.0
+            lines = [
+                "# HELP dtf_stage_seconds_total Time spent per page stage.",
+                "# TYPE dtf_stage_seconds_total counter",
+            ]
+            lines += [
+                f'dtf_stage_seconds_total{{page="{page}",stage="{name}"}} {seconds:.6f}'
+                for (page, name), (_, seconds) in sorted(_prom_totals.items())
+            ]
+            lines += [
+                "# HELP dtf_stage_calls_total Number of times a page stage ran.",
+                "# TYPE dtf_stage_calls_total counter",
+            ]
+            lines += [
+                f'dtf_stage_calls_total{{page="{page}",stage="{name}"}} {count}'
+                for (page, name), (count, _) in sorted(_prom_totals.items())
+            ]
+            # write then rename so the collector never reads half a file
+            directory = os.path.dirname(os.path.abspath(path))
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write("\n".join(lines) + "\n")
+            os.replace(tmp, path)
+
+    def flush(self):
+        """Write to the files configured by DTF_TIMINGS_JSONL / DTF_TIMINGS_PROM."""
+        jsonl = os.environ.get("DTF_TIMINGS_JSONL")
+        prom = os.environ.get("DTF_TIMINGS_PROM")
+        if jsonl:
+            self.write_jsonl(jsonl)
+        if prom:
+            self.write_prometheus(prom)
+
+
+def stage(name, file=None):
+    """Time a block under the active recorder; no-op when there is none."""
+    recorder = _current.get()
+    if recorder is None:
+        return _NO_STAGE
+    return recorder.stage(name, file)
+
+
+def timed_iter(iterable, name, file=None):
+    """Yield from `iterable`, timing each step (e.g. decoding a strip) as `name`."""
+    it = iter(iterable)
+    while True:
+        with stage(name, file):
+            item = next(it, _END)
+        if item is _END:
+            return
+        yield item
@@ -0,0 +1,278 @@
+# dtf/nesting.py
+"""
+Gang-sheet nesting: pack many designs onto the 60 cm roll, shortest first.
+
+Each design is reduced to the tight bounding box of its inked (alpha > 0)
+pixels, read strip by strip like dtf.coverage. Boxes are packed with a
+skyline bottom-left heuristic: the roll width is split into columns of
+`grid_cm`, the skyline is one height per column, and each box goes where
+its top ends up lowest (trying both orientations when rotation is
+allowed). Finding that spot is a sliding-window max over the skyline, done
+in numpy, so a few hundred boxes pack in well under a second.
+
+The heuristic packs three orders (tallest, widest, largest first) and
+keeps the shortest. nest(..., refine_seconds=N) then spends up to N seconds on
+random swaps of that order, keeping any swap that doesn't lengthen the sheet.
+"""
+import math
+import random
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from dtf.coverage import DEFAULT_STRIP_BYTES, iter_alpha_strips, open_image
+from dtf.instrument import stage, timed_iter
+from dtf.pricing import FIXED_WIDTH_CM
+from dtf.report import get_dpi, has_dpi
+
+# space kept between designs for cutting
+DEFAULT_GAP_CM = 0.5
+
+# skyline column width; boxes are rounded up to whole columns
+DEFAULT_GRID_CM = 0.1
+
+
+@dataclass
+class Design:
+    """One design to nest, in cm. `area_cm2` / `ink_area_cm2` default to the box."""
+
+    name: str
+    width_cm: float
+    height_cm: float
+    copies: int = 1
+    # inked area and opacity-weighted inked area, for the sheet's coverage
+    area_cm2: float = None
+    ink_area_cm2: float = None
+
+
+def alpha_extent(source, strip_bytes=DEFAULT_STRIP_BYTES):
+    """
+    Bounding box and inked pixel counts of a design's alpha channel.
+
+    `source` is a path, file-like object or PIL image. Returns a dict:
+
+    - ``bbox``: (left, top, right, bottom) pixel box of alpha > 0 (right and
+      bottom exclusive), or None for a fully transparent image
+    - ``inked_pixels``: pixels with alpha > 0
+    - ``weighted_pixels``: sum of alpha / 255
+    - ``width_px``, ``height_px``
+    - ``dpi``: see dtf.report.get_dpi, or None when the file states none
+    """
+    img, own = open_image(source)
+    try:
+        width, height = img.size
+        dpi = get_dpi(img) if has_dpi(img) else None
+        cols = np.zeros(width, dtype=bool)
+        top = bottom = None
+        inked = 0
+        alpha_sum = 0
+        y = 0
+        for alpha in timed_iter(iter_alpha_strips(img, strip_bytes=strip_bytes), "decode"):
+            with stage("reduce"):
+                rows = np.flatnonzero(alpha.any(axis=1))
+                if rows.size:
+                    if top is None:
+                        top = y + int(rows[0])
+                    bottom = y + int(rows[-1]) + 1
+                    cols |= alpha.any(axis=0)
+                    inked += int(np.count_nonzero(alpha))
+                    alpha_sum += int(alpha.sum(dtype=np.uint64))
+            y += len(alpha)
+    finally:
+        if own:
+            img.close()
+
+    bbox = None
+    if top is not None:
+        xs = np.flatnonzero(cols)
+        bbox = (int(xs[0]), top, int(xs[-1]) + 1, bottom)
+    return {
+        "bbox": bbox,
+        "inked_pixels": inked,
+        "weighted_pixels": alpha_sum / 255.0,
+        "width_px": width,
+        "height_px": height,
+        "dpi": dpi,
+    }
+
+
+def design_from_extent(name, extent, copies=1, dpi=None):
+    """
+    Build a Design from alpha_extent() output, or None if nothing is inked.
+
+    `dpi` overrides the DPI read from the file; files without one are
+    measured at 300 DPI unless it is given.
+    """
+    if extent["bbox"] is None:
+        return None
+    cm_per_px = 2.54 / (dpi or extent["dpi"] or 300.0)
+    left, top, right, bottom = extent["bbox"]
+    return Design(
+        name=name,
+        width_cm=(right - left) * cm_per_px,
+        height_cm=(bottom - top) * cm_per_px,
+        copies=int(copies),
+        area_cm2=extent["inked_pixels"] * cm_per_px ** 2,
+        ink_area_cm2=extent["weighted_pixels"] * cm_per_px ** 2,
+    )
+
+
+def _window_max(a, w):
+    """max(a[i:i + w]) for every i, in O(len(a) * log w)."""
+    out = a
+    span = 1
+    while span * 2 <= w:
+        out = np.maximum(out[:-span], out[span:])
+        span *= 2
+    n = len(a) - w + 1
+    return np.maximum(out[:n], out[w - span:w - span + n])
+
+
+def _pieces(designs, allow_rotation, sheet_width_cm, gap_cm, grid_cm):
+    """Expand copies into (design index, [(cols, width, height, rotated), ...])."""
+    n_cols = int(math.floor((sheet_width_cm + gap_cm) / grid_cm + 1e-9))
+    pieces = []
+    for i, d in enumerate(designs):
+        orientations = [(d.width_cm, d.height_cm, False)]
+        if allow_rotation and not math.isclose(d.width_cm, d.height_cm):
+            orientations.append((d.height_cm, d.width_cm, True))
+        fits = []
+        for w, h, rotated in orientations:
+            cols = max(1, int(math.ceil((w + gap_cm) / grid_cm - 1e-9)))
+            if cols <= n_cols:
+                fits.append((cols, w, h, rotated))
+        if not fits:
+            raise ValueError(
+                f"{d.name} ({d.width_cm:.1f} x {d.height_cm:.1f} cm) doesn't fit the {sheet_width_cm:g} cm width"
+            )
+        pieces.extend([(i, fits)] * max(0, int(d.copies)))
+    return n_cols, pieces
+
+
+def _pack(pieces, order, n_cols, gap_cm):
+    """Skyline bottom-left pack of pieces in `order`. Returns (length, placements)."""
+    skyline = np.zeros(n_cols)
+    placements = []
+    for p in order:
+        design, fits = pieces[p]
+        best = None
+        for cols, w, h, rotated in fits:
+            base = _window_max(skyline, cols)
+            x = int(np.argmin(base))  # lowest top; ties go left
+            top = base[x] + h
+            if best is None or top < best[0] - 1e-9:
+                best = (top, x, base[x], cols, w, h, rotated)
+        top, x, y, cols, w, h, rotated = best
+        skyline[x:x + cols] = top + gap_cm
+        placements.append((p, design, x, y, w, h, rotated))
+    length = float(skyline.max()) - gap_cm if placements else 0.0
+    return max(length, 0.0), placements
+
+
+def _orders(pieces):
+    """Deterministic starting orders: tallest, widest, largest first."""
+    def longest(p):
+        return max(max(w, h) for _, w, h, _ in pieces[p][1])
+
+    def shortest_fit(p):
+        return min(w for _, w, _, _ in pieces[p][1])
+
+    def area(p):
+        _, w, h, _ = pieces[p][1][0]
+        return w * h
+
+    idx = range(len(pieces))
+    return [
+        sorted(idx, key=longest, reverse=True),
+        sorted(idx, key=shortest_fit, reverse=True),
+        sorted(idx, key=area, reverse=True),
+    ]
+
+
+def nest(
+    designs,
+    sheet_width_cm=FIXED_WIDTH_CM,
+    gap_cm=DEFAULT_GAP_CM,
+    allow_rotation=True,
+    refine_seconds=0.0,
+    grid_cm=DEFAULT_GRID_CM,
+    seed=0,
+):
+    """
+    Pack `designs` (Design objects, copies expanded) onto the roll.
+
+    Returns a dict:
+
+    - ``length_cm``: roll length used
+    - ``placements``: list of dicts (name, copy, x_cm, y_cm, width_cm,
+      height_cm, rotated), sizes as placed
+    - ``coverage`` / ``ink_coverage``: inked and opacity-weighted inked area
+      as a fraction of width x length, for dtf.pricing.price_jobs
+    - ``utilization``: box area / sheet area
+    - ``orders_tried``
+
+    Raises ValueError if a design doesn't fit the width in any orientation.
+    """
+    n_cols, pieces = _pieces(designs, allow_rotation, sheet_width_cm, gap_cm, grid_cm)
+
+    with stage("nest"):
+        best = None
+        tried = 0
+        for order in _orders(pieces):
+            length, placed = _pack(pieces, order, n_cols, gap_cm)
+            tried += 1
+            if best is None or length < best[0]:
+                best = (length, placed, order)
+
+    if refine_seconds and len(pieces) > 1:
+        # local search: swap two pieces, keep the order if it isn't longer
+        with stage("nest_refine"):
+            rng = random.Random(seed)
+            deadline = time.perf_counter() + refine_seconds
+            order = list(best[2])
+            current = best[0]
+            while time.perf_counter() < deadline:
+                i, j = rng.randrange(len(order)), rng.randrange(len(order))
+                if i == j:
+                    continue
+                order[i], order[j] = order[j], order[i]
+                length, placed = _pack(pieces, order, n_cols, gap_cm)
+                tried += 1
+                if length <= current:
+                    current = length
+                    if length < best[0]:
+                        best = (length, placed, list(order))
+                else:
+                    order[i], order[j] = order[j], order[i]
+
+    length_cm, placed, _ = best
+    copy_no = {}
+    placements = []
+    area = ink_area = box_area = 0.0
+    for _, design, x, y, w, h, rotated in sorted(placed, key=lambda item: item[0]):
+        d = designs[design]
+        copy_no[design] = copy_no.get(design, 0) + 1
+        placements.append({
+            "name": d.name,
+            "copy": copy_no[design],
+            "x_cm": x * grid_cm,
+            "y_cm": float(y),
+            "width_cm": w,
+            "height_cm": h,
+            "rotated": rotated,
+        })
+        box = d.width_cm * d.height_cm
+        box_area += box
+        area += box if d.area_cm2 is None else d.area_cm2
+        ink_area += box if d.ink_area_cm2 is None else d.ink_area_cm2
+
+    sheet_area = sheet_width_cm * length_cm
+    return {
+        "length_cm": length_cm,
+        "placements": placements,
+        "coverage": area / sheet_area if sheet_area else 0.0,
+        "ink_coverage": ink_area / sheet_area if sheet_area else 0.0,
+        "utilization": box_area / sheet_area if sheet_area else 0.0,
+        "orders_tried": tried,
+    }
@@ -0,0 +1,181 @@
+# dtf/preview.py
+"""
+Downscaled preview pyramid of a design, built in one strip-wise decode pass.
+
+A 7,000 x 59,000 px sheet can't be sent to the browser, and thumbnail()
+decodes all of it on every rerun. build_pyramid() walks the image once
+(see dtf.coverage), composites each strip on white, block-averages it into
+the finest preview level and records per-block ink coverage and the trim
+box (bounding box of alpha > 0) from the same pixels. Coarser levels are
+2x2 averages of the finer one. The result is a dict of small uint8 arrays,
+meant to be kept in a CoverageCache under ("preview", content hash).
+
+render_view() cuts a window out of one level and draws the overlays.
+"""
+import math
+
+import numpy as np
+
+from dtf.coverage import DEFAULT_STRIP_BYTES, iter_rgba_strips, open_image
+from dtf.instrument import stage, timed_iter
+
+# finest level is at most this many pixels (~16 MB as RGB + coverage)
+DEFAULT_PREVIEW_PIXELS = 4_000_000
+
+# coarsest level's longer side
+_MIN_LEVEL_SIDE = 512
+
+# rgba strip + ~4 uint16 RGB temporaries + masks, per pixel
+_WORK_BYTES_PER_PIXEL = 4 + 4 * 3 * 2 + 2
+
+_COVERAGE_TINT = np.array([230, 40, 40], dtype=np.float32)
+_TRIM_COLOR = np.array([20, 90, 230], dtype=np.uint8)
+
+
+def _block_means(comp, inked, f, n_rows):
+    """
+    Average (rows, width_padded, 3) composite and inked mask over f x f
+    blocks. `n_rows` <= rows * f is how many rows are real (last block).
+    """
+    rows, width = comp.shape[0] // f, comp.shape[1] // f
+    sums = comp.reshape(rows, f, width, f, 3).sum(axis=(1, 3), dtype=np.uint32)
+    counts = inked.reshape(rows, f, width, f).sum(axis=(1, 3), dtype=np.uint32)
+    div = f * min(f, n_rows) if rows == 1 else f * f
+    return (sums // div).astype(np.uint8), (counts * 255 // div).astype(np.uint8)
+
+
+def _halve(a):
+    """2x2 average; odd last rows/columns are averaged with themselves."""
+    if a.shape[0] % 2:
+        a = np.concatenate([a, a[-1:]], axis=0)
+    if a.shape[1] % 2:
+        a = np.concatenate([a, a[:, -1:]], axis=1)
+    s = a.astype(np.uint16)
+    return ((s[0::2, 0::2] + s[1::2, 0::2] + s[0::2, 1::2] + s[1::2, 1::2] + 2) // 4).astype(np.uint8)
+
+
+def build_pyramid(source, max_pixels=DEFAULT_PREVIEW_PIXELS, strip_bytes=DEFAULT_STRIP_BYTES):
+    """
+    Decode `source` once into a preview pyramid.
+
+    Returns a dict:
+
+    - ``levels``: list of (h, w, 3) uint8 RGB images on white, finest first
+    - ``coverage_levels``: matching (h, w) uint8 maps, 255 = every pixel inked
+    - ``scale``: source pixels per pixel of level 0 (level n is scale * 2**n)
+    - ``width_px``, ``height_px``: source size
+    - ``bbox``: trim box (left, top, right, bottom) in source pixels, or None
+    - ``coverage``: fraction of source pixels with alpha > 0
+    """
+    img, own = open_image(source)
+    try:
+        width, height = img.size
+        f = max(1, math.ceil(math.sqrt(width * height / max_pixels)))
+        padded = math.ceil(width / f) * f
+        level0, cov0 = [], []
+        cols = np.zeros(width, dtype=bool)
+        top = bottom = None
+        inked_total = 0
+        carry = None
+        y = 0
+        strips = iter_rgba_strips(img, strip_bytes, _WORK_BYTES_PER_PIXEL)
+        for rgba in timed_iter(strips, "decode"):
+            with stage("preview"):
+                a = rgba[:, :, 3]
+                inked = a > 0
+                rows_any = np.flatnonzero(inked.any(axis=1))
+                if rows_any.size:
+                    top = y + int(rows_any[0]) if top is None else top
+                    bottom = y + int(rows_any[-1]) + 1
+                    cols |= inked.any(axis=0)
+                    inked_total += int(np.count_nonzero(inked))
+                y += len(rgba)
+
+                # composite on white: c * a / 255 + 255 * (1 - a / 255), fits uint16
+                a16 = a.astype(np.uint16)[:, :, None]
+                comp = np.full((len(rgba), padded, 3), 255, dtype=np.uint16)
+                comp[:, :width] = (rgba[:, :, :3] * a16 + 255 * (255 - a16)) // 255
+                mask = np.zeros((len(rgba), padded), dtype=bool)
+                mask[:, :width] = inked
+
+                if carry is not None:
+                    comp = np.concatenate([carry[0], comp])
+                    mask = np.concatenate([carry[1], mask])
+                whole = len(comp) // f * f
+                if whole:
+                    rgb, cov = _block_means(comp[:whole], mask[:whole], f, f)
+                    level0.append(rgb)
+                    cov0.append(cov)
+                carry = (comp[whole:], mask[whole:]) if whole < len(comp) else None
+
+        if carry is not None:
+            # last partial block row: pad to f rows, average over the real ones
+            n = len(carry[0])
+            comp = np.concatenate([carry[0], np.zeros((f - n, padded, 3), dtype=np.uint16)])
+            mask = np.concatenate([carry[1], np.zeros((f - n, padded), dtype=bool)])
+            rgb, cov = _block_means(comp, mask, f, n)
+            level0.append(rgb)
+            cov0.append(cov)
+    finally:
+        if own:
+            img.close()
+
+    levels = [np.concatenate(level0)]
+    coverage_levels = [np.concatenate(cov0)]
+    while max(levels[-1].shape[:2]) > _MIN_LEVEL_SIDE:
+        levels.append(_halve(levels[-1]))
+        coverage_levels.append(_halve(coverage_levels[-1][:, :, None])[:, :, 0])
+
+    bbox = None
+    if top is not None:
+        xs = np.flatnonzero(cols)
+        bbox = (int(xs[0]), top, int(xs[-1]) + 1, bottom)
+    return {
+        "levels": levels,
+        "coverage_levels": coverage_levels,
+        "scale": f,
+        "width_px": width,
+        "height_px": height,
+        "bbox": bbox,
+        "coverage": inked_total / (width * height) if width * height else 0.0,
+    }
+
+
+def render_view(pyramid, level=0, top=0.0, rows=None, show_coverage=True, show_trim=True):
+    """
+    RGB window of one pyramid level with overlays, as a uint8 array.
+
+    `top` is where the window starts, as a fraction of the design height;
+    `rows` is the window height in level pixels (default: the whole level).
+    Inked areas are tinted by their coverage; everything outside the trim
+    box is dimmed and the box is outlined.
+    """
+    image = pyramid["levels"][level]
+    height = image.shape[0]
+    rows = height if rows is None else min(int(rows), height)
+    y0 = min(int(round(top * height)), height - rows)
+    view = image[y0:y0 + rows].astype(np.float32)
+
+    if show_coverage:
+        weight = pyramid["coverage_levels"][level][y0:y0 + rows, :, None].astype(np.float32) / 255.0 * 0.45
+        view = view * (1 - weight) + _COVERAGE_TINT * weight
+
+    view = view.astype(np.uint8)
+    bbox = pyramid["bbox"]
+    if show_trim and bbox is not None:
+        scale = pyramid["scale"] * 2 ** level
+        left, top_px, right, bottom = (
+            int(bbox[0] // scale), int(bbox[1] // scale) - y0,
+            int(math.ceil(bbox[2] / scale)), int(math.ceil(bbox[3] / scale)) - y0,
+        )
+        inside = np.zeros(view.shape[:2], dtype=bool)
+        inside[max(top_px, 0):max(bottom, 0), left:right] = True
+        view[~inside] = view[~inside] // 2 + 64
+        for y in (top_px, bottom - 1):
+            if 0 <= y < rows:
+                view[y, left:right] = _TRIM_COLOR
+        y_lo, y_hi = max(top_px, 0), min(bottom, rows)
+        for x in (left, right - 1):
+            if 0 <= x < view.shape[1] and y_lo < y_hi:
+                view[y_lo:y_hi, x] = _TRIM_COLOR
+    return view
@@ -0,0 +1,138 @@
+# dtf/pricing.py
+"""
+DTF cost model: film, ink, powder and overhead, min/avg/max.
+
+Works on arrays so one call prices a single design or a whole order book.
+Lengths are in meters, coverages are fractions (0..1) of the 60 cm stripe.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+LEVELS = ("min", "avg", "max")
+
+# width of the film roll every design is printed on
+FIXED_WIDTH_CM = 60.0
+
+
+@dataclass
+class PriceSettings:
+    """Prices (EGP) and consumption rates, as entered in the calculator sidebar."""
+
+    film_roll_price: float = 1800.0
+    roll_length_m: float = 100.0
+    ink_price_per_l: float = 1350.0
+    powder_price_per_kg: float = 450.0
+    # ink ml per meter at 60 cm width, for a solid design
+    ink_ml_per_m_min: float = 4.0
+    ink_ml_per_m_avg: float = 6.0
+    ink_ml_per_m_max: float = 8.0
+    # powder g per meter at 60 cm width, for a solid design
+    powder_g_per_m_min: float = 8.0
+    powder_g_per_m_avg: float = 10.0
+    powder_g_per_m_max: float = 12.0
+    labor_monthly: float = 85000.0
+    electricity_monthly: float = 15000.0
+    monthly_output_m: float = 4000.0
+
+    @property
+    def film_cost_per_m(self):
+        return self.film_roll_price / self.roll_length_m
+
+    @property
+    def ink_price_per_ml(self):
+        return self.ink_price_per_l / 1000.0
+
+    @property
+    def powder_price_per_g(self):
+        return self.powder_price_per_kg / 1000.0
+
+    @property
+    def overhead_per_m(self):
+        if self.monthly_output_m > 0:
+            return (self.labor_monthly + self.electricity_monthly) / self.monthly_output_m
+        return 0.0
+
+    @property
+    def ink_ml_per_m(self):
+        return np.array([self.ink_ml_per_m_min, self.ink_ml_per_m_avg, self.ink_ml_per_m_max])
+
+    @property
+    def powder_g_per_m(self):
+        return np.array([self.powder_g_per_m_min, self.powder_g_per_m_avg, self.powder_g_per_m_max])
+
+
+def price_arrays(length_m, coverage, settings, ink_coverage=None):
+    """
+    Price many jobs in one vectorized pass; price_jobs() without the DataFrame.
+
+    Returns a dict of float64 arrays, one value per job, keyed like the
+    price_jobs columns. Used where pandas overhead per call matters (the
+    quote service).
+    """
+    length_m = np.asarray(length_m, dtype=np.float64)
+    coverage = np.asarray(coverage, dtype=np.float64)
+    ink_coverage = coverage if ink_coverage is None else np.asarray(ink_coverage, dtype=np.float64)
+    length_m, coverage, ink_coverage = np.broadcast_arrays(
+        np.atleast_1d(length_m), np.atleast_1d(coverage), np.atleast_1d(ink_coverage)
+    )
+
+    # (jobs, 3) for min/avg/max
+    ink_ml = (ink_coverage * length_m)[:, None] * settings.ink_ml_per_m[None, :]
+    powder_g = (coverage * length_m)[:, None] * settings.powder_g_per_m[None, :]
+    ink_cost = ink_ml * settings.ink_price_per_ml
+    powder_cost = powder_g * settings.powder_price_per_g
+
+    film = settings.film_cost_per_m * length_m
+    overhead = settings.overhead_per_m * length_m
+    total = (film + overhead)[:, None] + ink_cost + powder_cost
+
+    columns = {"film": film, "overhead": overhead}
+    for i, level in enumerate(LEVELS):
+        columns[f"ink_ml_{level}"] = ink_ml[:, i]
+        columns[f"ink_{level}"] = ink_cost[:, i]
+        columns[f"powder_g_{level}"] = powder_g[:, i]
+        columns[f"powder_{level}"] = powder_cost[:, i]
+        columns[f"total_{level}"] = total[:, i]
+    return columns
+
+
+def price_jobs(length_m, coverage, settings, ink_coverage=None):
+    """
+    Price many jobs in one vectorized pass.
+
+    `length_m` and `coverage` are array-likes of the same length (scalars
+    broadcast). `ink_coverage` is the opacity-weighted coverage used for ink
+    (see dtf.ink); it defaults to `coverage`. Powder follows plain coverage.
+
+    Returns a DataFrame with one row per job: film, overhead, and
+    ink_ml_*, ink_*, powder_g_*, powder_*, total_* for min/avg/max.
+    """
+    return pd.DataFrame(price_arrays(length_m, coverage, settings, ink_coverage))
+
+
+def price_frame(jobs, settings, length_col="length_m", coverage_col="coverage", ink_coverage_col=None):
+    """
+    Price a DataFrame of jobs; returns `jobs` with the cost columns appended.
+    """
+    ink_coverage = jobs[ink_coverage_col].to_numpy() if ink_coverage_col else None
+    costs = price_jobs(jobs[length_col].to_numpy(), jobs[coverage_col].to_numpy(), settings, ink_coverage)
+    costs.index = jobs.index
+    return pd.concat([jobs, costs], axis=1)
+
+
+def cost_table(costs):
+    """
+    Min/Average/Max table for one priced job (a row of price_jobs output),
+    laid out like the calculator's results table.
+    """
+    rows = [
+        ["Film (EGP)", costs["film"], costs["film"], costs["film"]],
+        ["Ink (EGP)", costs["ink_min"], costs["ink_avg"], costs["ink_max"]],
+        ["Powder (EGP)", costs["powder_min"], costs["powder_avg"], costs["powder_max"]],
+        ["Overhead (EGP)", costs["overhead"], costs["overhead"], costs["overhead"]],
+        ["TOTAL (EGP)", costs["total_min"], costs["total_avg"], costs["total_max"]],
+    ]
+    rows = [[item] + [f"{value:.2f}" for value in values] for item, *values in rows]
+    return pd.DataFrame(rows, columns=["Item", "Min", "Average", "Max"]).set_index("Item")
@@ -0,0 +1,406 @@
+# dtf/quote_server.py
+"""
+Standalone HTTP quote service on the calculator's cost model.
+
+    python -m dtf.quote_server --port 8765 --workers 4 --settings prices.json
+
+Endpoints (JSON in, JSON out):
+
+- ``GET /health``
+- ``GET /settings``: the PriceSettings in use
+- ``POST /quote``: ``{"length_m": 1.5, "coverage": 0.4}``, optional
+  ``ink_coverage`` and ``copies``
+- ``POST /quote/batch``: ``{"jobs": [{...}, ...]}``, priced in one
+  vectorized call
+- ``POST /quote/design``: multipart upload of one ``design`` file; coverage
+  comes from its alpha channel, length from a ``length_m`` form field or
+  the file's DPI
+- ``POST /quote/designs``: multipart with several ``design`` files
+
+Any JSON body may carry ``"settings": {...}`` to override PriceSettings
+fields for that request. Designs are cached by content hash, so a repeated
+upload is priced without decoding. Designs over ``--max-megapixels`` are
+refused from their header, before any pixel is decoded: dtf.coverage lifts
+Pillow's own limit to the largest sheet the pages accept, which is far more
+than one request of a public service should be able to make us decode.
+
+Workers are forked processes sharing one listening socket, each a
+threading HTTP/1.1 server with keep-alive. On platforms without fork only
+one worker runs. Use benchmarks/quote_load.py to load-test it offline.
+"""
+import argparse
+import dataclasses
+import email.parser
+import email.policy
+import io
+import json
+import math
+import os
+import signal
+import socket
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+from dtf.batch import analyze_design
+from dtf.cache import DEFAULT_CACHE_BYTES, CoverageCache, content_hash
+from dtf.pricing import LEVELS, PriceSettings, price_arrays
+
+DEFAULT_PORT = 8765
+
+# largest request body accepted (a multi-meter TIFF fits)
+DEFAULT_MAX_BODY_BYTES = 512 * 1024 * 1024
+
+# largest design decoded per request: 60 cm x 5 m at 300 DPI
+DEFAULT_MAX_DESIGN_PIXELS = 7_100 * 59_100
+
+# settings that are divided by, so 0 can't be priced
+_POSITIVE_SETTINGS = ("roll_length_m",)
+
+_SETTINGS_FIELDS = {field.name for field in dataclasses.fields(PriceSettings)}
+
+
+class BadRequest(Exception):
+    """A client error, answered with 400 and the message."""
+
+
+def load_settings(path=None, overrides=None):
+    """PriceSettings from a JSON file of field values, then `overrides`."""
+    values = {}
+    if path:
+        with open(path, encoding="utf-8") as fh:
+            values.update(json.load(fh))
+    values.update(overrides or {})
+    unknown = set(values) - _SETTINGS_FIELDS
+    if unknown:
+        raise BadRequest(f"unknown settings: {', '.join(sorted(unknown))}")
+    try:
+        values = {name: float(value) for name, value in values.items()}
+    except (TypeError, ValueError) as e:
+        raise BadRequest(f"bad settings: {e}") from None
+    for name, value in values.items():
+        if not math.isfinite(value) or value < 0:
+            raise BadRequest(f"bad settings: {name} must be a number >= 0")
+        if name in _POSITIVE_SETTINGS and value == 0:
+            raise BadRequest(f"bad settings: {name} must be > 0")
+    return PriceSettings(**values)
+
+
+def _number(job, name, default=None):
+    value = job.get(name, default)
+    if value is None:
+        raise BadRequest(f"missing {name}")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{name} must be a number") from None
+    if not math.isfinite(value) or value < 0:
+        raise BadRequest(f"{name} must be a number >= 0")
+    return value
+
+
+def _fraction(job, name, default=None):
+    value = _number(job, name, default)
+    if value > 1:
+        raise BadRequest(f"{name} is a fraction (0..1)")
+    return value
+
+
+def _count(job, name, default=None):
+    value = _number(job, name, default)
+    if value < 1 or not value.is_integer():
+        raise BadRequest(f"{name} must be a whole number >= 1")
+    return int(value)
+
+
+def _quotes(columns):
+    """Turn price_arrays output into one JSON-ready dict per job."""
+    n = len(columns["film"])
+    quotes = []
+    for i in range(n):
+        quote = {"film": round(float(columns["film"][i]), 4), "overhead": round(float(columns["overhead"][i]), 4)}
+        for part in ("ink_ml", "ink", "powder_g", "powder", "total"):
+            quote[part] = {level: round(float(columns[f"{part}_{level}"][i]), 4) for level in LEVELS}
+        quotes.append(quote)
+    return quotes
+
+
+def price_json_jobs(jobs, settings):
+    """Price a list of job dicts (length_m, coverage, ink_coverage, copies)."""
+    lengths, coverages, ink_coverages = [], [], []
+    for job in jobs:
+        if not isinstance(job, dict):
+            raise BadRequest("each job must be an object")
+        coverage = _fraction(job, "coverage")
+        lengths.append(_number(job, "length_m") * _count(job, "copies", 1))
+        coverages.append(coverage)
+        ink_coverages.append(_fraction(job, "ink_coverage", coverage))
+    if not jobs:
+        return []
+    columns = price_arrays(lengths, coverages, settings, ink_coverages)
+    # finite inputs can still overflow, and JSON has no Infinity
+    if not all(np.isfinite(values).all() for values in columns.values()):
+        raise BadRequest("values too large to price")
+    return _quotes(columns)
+
+
+class QuoteService:
+    """Settings and design cache shared by the handler threads of one worker."""
+
+    def __init__(self, settings, cache_bytes=DEFAULT_CACHE_BYTES, max_body_bytes=DEFAULT_MAX_BODY_BYTES,
+                 max_pixels=DEFAULT_MAX_DESIGN_PIXELS):
+        self.settings = settings
+        self.settings_json = json.dumps(dataclasses.asdict(settings)).encode()
+        self.cache = CoverageCache(max_bytes=cache_bytes)
+        self.max_body_bytes = max_body_bytes
+        self.max_pixels = max_pixels
+
+    def settings_for(self, body):
+        overrides = body.get("settings") if isinstance(body, dict) else None
+        if not overrides:
+            return self.settings
+        if not isinstance(overrides, dict):
+            raise BadRequest("settings must be an object")
+        return load_settings(overrides={**dataclasses.asdict(self.settings), **overrides})
+
+    def _check_pixels(self, name, data):
+        """Refuse designs over max_pixels; Image.open only reads the header."""
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                width, height = img.size
+        except Exception:
+            return  # not an image: analyze_design reports it
+        if width * height > self.max_pixels:
+            raise BadRequest(f"{name} is {width}x{height} px, over the limit of {self.max_pixels} pixels")
+
+    def _analyze(self, name, data):
+        self._check_pixels(name, data)
+        return analyze_design(name, data)
+
+    def analyze(self, name, data):
+        result = self.cache.get_or_compute(("batch", content_hash(data)), lambda: self._analyze(name, data))
+        if result["error"]:
+            raise BadRequest(result["error"])
+        return {**result, "name": name}
+
+    def quote_designs(self, files, fields):
+        """Price uploaded designs; fields may hold length_m, dpi, copies, settings."""
+        overrides = {}
+        if "settings" in fields:
+            try:
+                overrides = {"settings": json.loads(fields["settings"])}
+            except ValueError:
+                raise BadRequest("settings field is not valid JSON") from None
+        settings = self.settings_for(overrides)
+        jobs, designs = [], []
+        for name, data in files:
+            design = self.analyze(name, data)
+            dpi = _number(fields, "dpi", design["dpi"]) if ("dpi" in fields or design["dpi"]) else None
+            if "length_m" in fields:
+                length_m = _number(fields, "length_m")
+            elif dpi:
+                length_m = design["height_px"] / dpi * 0.0254
+            else:
+                raise BadRequest(f"{name} has no DPI; send length_m or dpi")
+            jobs.append({
+                "length_m": length_m,
+                "coverage": design["coverage"],
+                "ink_coverage": design["ink_coverage"],
+                "copies": fields.get("copies", 1),
+            })
+            designs.append({"name": name, "length_m": round(length_m, 4), "dpi": dpi,
+                            "coverage": round(design["coverage"], 6), "ink_coverage": round(design["ink_coverage"], 6)})
+        quotes = price_json_jobs(jobs, settings)
+        return [{**design, **quote} for design, quote in zip(designs, quotes)]
+
+
+def _parse_multipart(content_type, body):
+    """(files, fields) of a multipart/form-data body: [(filename, bytes)], {name: str}."""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise BadRequest("expected multipart/form-data")
+    files, fields = [], {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True) or b""
+        filename = part.get_filename()
+        if filename is not None:
+            files.append((filename, payload))
+        elif name:
+            fields[name] = payload.decode("utf-8")
+    return files, fields
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "dtf-quote/1"
+    # headers and body go out in separate writes; without this, keep-alive
+    # clients wait ~40 ms per response on Nagle + delayed ACK
+    disable_nagle_algorithm = True
+    service = None  # set on the class by make_server
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, payload):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.service.max_body_bytes:
+            # the body is left unread, so the connection can't be reused
+            self.close_connection = True
+            raise BadRequest(f"request body over {self.service.max_body_bytes} bytes")
+        return self.rfile.read(length)
+
+    def _json_body(self):
+        try:
+            return json.loads(self._body() or b"{}")
+        except ValueError:
+            raise BadRequest("body is not valid JSON") from None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "pid": os.getpid()})
+        elif self.path == "/settings":
+            self._send(200, self.service.settings_json)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            if self.path == "/quote":
+                body = self._json_body()
+                if not isinstance(body, dict):
+                    raise BadRequest("body must be a JSON object")
+                self._send(200, price_json_jobs([body], self.service.settings_for(body))[0])
+            elif self.path == "/quote/batch":
+                body = self._json_body()
+                jobs = body.get("jobs") if isinstance(body, dict) else None
+                if not isinstance(jobs, list):
+                    raise BadRequest('expected {"jobs": [...]}')
+                self._send(200, {"quotes": price_json_jobs(jobs, self.service.settings_for(body))})
+            elif self.path in ("/quote/design", "/quote/designs"):
+                files, fields = _parse_multipart(self.headers.get("Content-Type", ""), self._body())
+                files = [(name, data) for name, data in files if data]
+                if not files or (self.path == "/quote/design" and len(files) != 1):
+                    raise BadRequest("upload one design file" if self.path == "/quote/design" else "upload design files")
+                quotes = self.service.quote_designs(files, fields)
+                self._send(200, quotes[0] if self.path == "/quote/design" else {"quotes": quotes})
+            else:
+                # drain the body so the connection stays usable
+                self._body()
+                self._send(404, {"error": "not found"})
+        except BadRequest as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:  # keep the worker alive, report the failure
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+
+def make_server(sock, service, verbose=False):
+    """A ThreadingHTTPServer serving `service` on an already listening socket."""
+    handler = type("Handler", (QuoteHandler,), {"service": service, "verbose": verbose})
+    server = ThreadingHTTPServer(sock.getsockname()[:2], handler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.daemon_threads = True
+    return server
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, workers=1, settings=None, cache_bytes=DEFAULT_CACHE_BYTES,
+          verbose=False, ready=None, max_pixels=DEFAULT_MAX_DESIGN_PIXELS):
+    """
+    Serve until interrupted. With workers > 1 (and fork available) the
+    parent only supervises. `ready(address)` is called once listening.
+    """
+    settings = settings or PriceSettings()
+    sock = socket.create_server((host, port), backlog=1024)
+    if ready:
+        ready(sock.getsockname()[:2])
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        server = make_server(sock, QuoteService(settings, cache_bytes, max_pixels=max_pixels), verbose)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            # each worker warms its own cache
+            server = make_server(sock, QuoteService(settings, cache_bytes, max_pixels=max_pixels), verbose)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, lambda *_: (stop(), sys.exit(0)))
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        stop()
+    finally:
+        sock.close()
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m dtf.quote_server", description="DTF quote HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--settings", help="JSON file with PriceSettings fields (defaults otherwise)")
+    parser.add_argument("--cache-mb", type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help="design cache size per worker")
+    parser.add_argument("--max-megapixels", type=float, default=DEFAULT_MAX_DESIGN_PIXELS / 1e6,
+                        help="largest design decoded per request")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    try:
+        settings = load_settings(args.settings)
+    except (OSError, ValueError, BadRequest) as e:
+        print(f"Can't load settings: {e}", file=sys.stderr)
+        return 2
+
+    def ready(address):
+        print(f"Serving quotes on http://{address[0]}:{address[1]} with {args.workers} workers", flush=True)
+
+    serve(args.host, args.port, args.workers, settings, args.cache_mb * 1024 * 1024, args.verbose, ready,
+          max_pixels=int(args.max_megapixels * 1e6))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
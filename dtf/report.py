@@ -0,0 +1,370 @@
+# dtf/report.py
+"""
+TIF report helpers: filename parsing, DPI lookup and folder scanning.
+
+Used by pages/report_page.py.
+"""
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+from PIL import Image
+
+from dtf.instrument import stage
+from dtf.pricing import LEVELS, price_jobs
+from dtf.tiff_meta import (
+    TAG_HEIGHT,
+    TAG_RESOLUTION_UNIT,
+    TAG_WIDTH,
+    TAG_X_RESOLUTION,
+    TAG_Y_RESOLUTION,
+    read_tiff_tags,
+)
+
+TIF_EXTENSIONS = (".tif", ".tiff")
+DEFAULT_SCAN_WORKERS = 8
+
+
+def get_dpi(img):
+    """
+    Try several ways to get DPI (pixels per inch) from the image.
+    Fallback to 300 if we can't find a reliable DPI.
+    """
+    # 1) Pillow info; for TIFFs only when the tags are there, since Pillow
+    # fills in (1, 1) for a TIFF without 282/283
+    dpi_info = img.info.get("dpi") if _states_resolution(img) is not False else None
+    if dpi_info:
+        try:
+            if isinstance(dpi_info, (tuple, list)):
+                # (x_dpi, y_dpi)
+                dpi = float(dpi_info[1] or dpi_info[0])
+            else:
+                dpi = float(dpi_info)
+            if dpi > 0:
+                return dpi
+        except Exception:
+            pass
+
+    # 2) TIFF tags (common for .tif) using tag_v2
+    try:
+        tags = getattr(img, "tag_v2", None)
+        if tags:
+            xres = tags.get(282)  # XResolution
+            yres = tags.get(283)  # YResolution
+            resunit = tags.get(296)  # ResolutionUnit: 2=inches, 3=cm
+
+            def to_float(v):
+                try:
+                    return float(v)
+                except Exception:
+                    # IFDRational or tuple like (num, den)
+                    try:
+                        if hasattr(v, "numerator") and hasattr(v, "denominator"):
+                            return v.numerator / v.denominator
+                        if isinstance(v, (tuple, list)) and len(v) >= 2:
+                            return float(v[0]) / float(v[1])
+                    except Exception:
+                        return None
+                return None
+
+            val = None
+            if yres is not None:
+                val = to_float(yres)
+            elif xres is not None:
+                val = to_float(xres)
+
+            if val:
+                # if resolution unit == 3 it's per cm, convert to per inch
+                if resunit == 3:
+                    val = val * 2.54
+                if val > 0:
+                    return val
+    except Exception:
+        pass
+
+    # fallback
+    return 300.0
+
+
+def _states_resolution(img):
+    """For a TIFF, whether tag 282 or 283 holds a positive value; None for other formats."""
+    tags = getattr(img, "tag_v2", None)
+    if tags is None:
+        return None
+    for tag in (282, 283):
+        try:
+            if float(tags.get(tag) or 0) > 0:
+                return True
+        except (TypeError, ValueError, ZeroDivisionError):
+            pass
+    return False
+
+
+def has_dpi(img):
+    """True if the file states a resolution (get_dpi() falls back to 300 otherwise)."""
+    stated = _states_resolution(img)
+    if stated is not None:
+        return stated
+    return bool(img.info.get("dpi"))
+
+
+def parse_filename(fname):
+    """
+    Parse ``client-order-copies.tif`` into (client, order, copies).
+
+    Returns (None, error_message) when the name doesn't match.
+    """
+    name_no_ext = os.path.splitext(fname)[0].strip()
+    # split from the right 2 parts so names with dashes in client are OK: a-b-c  (rsplit)
+    parts = name_no_ext.rsplit("-", 2)
+    if len(parts) != 3:
+        return None, f"Filename not in a-b-c format: {fname}"
+    client = parts[0].strip()
+    order_s = parts[1].strip()
+    copies_s = parts[2].strip()
+    try:
+        order = int(order_s)
+        copies = int(copies_s)
+    except Exception:
+        return None, f"Order or copies not integer in file: {fname}"
+    return (client, order, copies), None
+
+
+class _TiffHeader:
+    """Just enough of a Pillow TIFF image (info, tag_v2) for get_dpi()."""
+
+    def __init__(self, tags):
+        self.tag_v2 = tags
+        self.info = {}
+        # same derivation of info["dpi"] as Pillow's TiffImagePlugin._setup
+        xres = tags.get(TAG_X_RESOLUTION, 1)
+        yres = tags.get(TAG_Y_RESOLUTION, 1)
+        if xres and yres:
+            resunit = tags.get(TAG_RESOLUTION_UNIT)
+            if resunit == 2 or resunit is None:
+                self.info["dpi"] = (xres, yres)
+            elif resunit == 3:
+                self.info["dpi"] = (xres * 2.54, yres * 2.54)
+
+
+def read_tif_info(source):
+    """
+    Read (height_px, dpi) of a TIF.
+
+    Plain TIFF headers are parsed directly (dtf.tiff_meta); anything else
+    goes through Image.open, opened just long enough to read them.
+    """
+    tags = read_tiff_tags(source)
+    if tags and tags.get(TAG_HEIGHT) and tags.get(TAG_WIDTH):
+        return tags[TAG_HEIGHT], get_dpi(_TiffHeader(tags))
+
+    with Image.open(source) as img:
+        height_px = getattr(img, "height", img.size[1])
+        dpi = get_dpi(img)
+    return height_px, dpi
+
+
+def make_row(fname, client, order, copies, height_px, dpi):
+    """The report row for one file, as shown in the raw table."""
+    # calculate length in meters: height_px / dpi (inch) * 0.0254 m/in
+    length_m = (height_px / dpi) * 0.0254
+
+    p_val = copies * length_m
+
+    return {
+        "Client": client,
+        "Order": order,
+        "Copies (c)": copies,
+        "Length (d, m)": round(length_m, 4),
+        "c*d": round(p_val, 4),
+        "File": fname,
+    }
+
+
+def process_file(fname, source):
+    """
+    Build one report row for a TIF.
+
+    `source` is a path or a file-like object (e.g. a Streamlit UploadedFile).
+    Returns (row, None) on success or (None, error_message).
+    """
+    try:
+        parsed, err = parse_filename(fname)
+        if err:
+            return None, err
+        with stage("read_header", file=fname):
+            height_px, dpi = read_tif_info(source)
+        return make_row(fname, *parsed, height_px, dpi), None
+    except Exception as e:
+        return None, f"Error processing {fname}: {e}"
+
+
+def list_tifs(folder_path):
+    """
+    List (name, path) for the TIFs directly inside `folder_path`, sorted by name.
+
+    Uses os.scandir so file type checks come from the directory listing
+    instead of an extra stat per entry (matters on network shares).
+    """
+    found = []
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            if entry.name.lower().endswith(TIF_EXTENSIONS) and entry.is_file():
+                found.append((entry.name, entry.path))
+    found.sort()
+    return found
+
+
+def walk_tifs(root, recursive=True, with_stat=False):
+    """
+    List (name, path) for every TIF under `root`, sorted by path.
+
+    With `with_stat` the tuples are (name, path, size, mtime_ns), taken from
+    the same directory scan.
+    """
+    found = []
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.name.lower().endswith(TIF_EXTENSIONS) and entry.is_file():
+                    if with_stat:
+                        st = entry.stat()
+                        found.append((entry.name, entry.path, st.st_size, st.st_mtime_ns))
+                    else:
+                        found.append((entry.name, entry.path))
+    found.sort(key=lambda item: item[1])
+    return found
+
+
+def iter_threaded(func, items, workers=DEFAULT_SCAN_WORKERS, chunk_size=None):
+    """
+    Yield func(*item) for each item, in input order, using a thread pool.
+
+    Items are handed to the pool a chunk at a time, so only `chunk_size`
+    results are pending at once even for 100k files. workers <= 1 runs
+    serially.
+    """
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(*item)
+        return
+
+    workers = int(workers)
+    chunk_size = chunk_size or workers * 64
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+            # run each item in a copy of our context so stage() timings
+            # inside func reach the caller's recorder
+            jobs = [(contextvars.copy_context(), item) for item in chunk]
+            yield from pool.map(lambda job: job[0].run(func, *job[1]), jobs)
+
+
+def iter_process_files(files, workers=DEFAULT_SCAN_WORKERS, chunk_size=None):
+    """Yield process_file results for (fname, source) pairs, in input order."""
+    return iter_threaded(process_file, files, workers=workers, chunk_size=chunk_size)
+
+
+def process_files(files, workers=DEFAULT_SCAN_WORKERS, progress=None):
+    """
+    Run process_file over (fname, source) pairs with a bounded thread pool.
+
+    Opening files and reading headers is I/O bound, so threads overlap the
+    network latency. Results keep the input order, so rows/errors are the
+    same as a serial loop. workers <= 1 runs serially. `progress(done,
+    total)` is called after each file.
+    """
+    files = list(files)
+    rows = []
+    errors = []
+    for done, (row, err) in enumerate(iter_process_files(files, workers=workers), start=1):
+        if err:
+            errors.append(err)
+        else:
+            rows.append(row)
+        if progress:
+            progress(done, len(files))
+    return rows, errors
+
+
+def summarize(df):
+    """Summary per client: Number of Orders = max order, P = sum(c*d)."""
+    return (
+        df.groupby("Client", as_index=False)
+        .agg({"Order": "max", "c*d": "sum"})
+        .rename(columns={"Order": "Number of Orders", "c*d": "P (Σ c*d)"})
+    )
+
+
+COST_COLUMNS = {level: f"Cost {level} (EGP)" for level in LEVELS}
+
+
+def add_costs(df, settings):
+    """
+    Price every row of a report table; returns a copy with cost columns.
+
+    `df` needs "c*d" (meters printed, all copies), "Coverage" and "Ink
+    coverage" (fractions, see dtf.batch.analyze_design). One vectorized
+    price_jobs call covers the whole table.
+    """
+    costs = price_jobs(df["c*d"].to_numpy(), df["Coverage"].to_numpy(), settings, df["Ink coverage"].to_numpy())
+    df = df.copy()
+    for level, column in COST_COLUMNS.items():
+        df[column] = costs[f"total_{level}"].to_numpy()
+    return df
+
+
+def summarize_costs(df):
+    """summarize() with the per-client sum of the cost columns from add_costs()."""
+    totals = df.groupby("Client", as_index=False)[list(COST_COLUMNS.values())].sum()
+    return summarize(df).merge(totals, on="Client", how="left").round({c: 2 for c in COST_COLUMNS.values()})
+
+
+def trim_fraction(result):
+    """
+    Share of a design's height that is inked, from a dtf.batch.analyze_design
+    result: 0.0 when fully transparent, None when unknown (failed file).
+    """
+    if not result or result.get("error") or "bbox" not in result:
+        return None
+    if result["bbox"] is None:
+        return 0.0
+    return (result["bbox"][3] - result["bbox"][1]) / result["height_px"]
+
+
+def apply_trim(df, fractions):
+    """
+    Shorten each row's length to its inked height; returns a copy.
+
+    `fractions` has one trim_fraction() per row (None keeps the row as is).
+    The header length is kept in "Raw length (m)" and c*d is recomputed.
+    "Coverage" and "Ink coverage", when present, are shares of the whole
+    file; they are rescaled to the trimmed area so pricing doesn't shrink
+    ink and powder a second time.
+    """
+    fractions = np.array([1.0 if f is None else f for f in fractions], dtype=float)
+    df = df.copy()
+    df.insert(df.columns.get_loc("Length (d, m)"), "Raw length (m)", df["Length (d, m)"])
+    length_m = df["Length (d, m)"].to_numpy() * fractions
+    df["Length (d, m)"] = length_m.round(4)
+    df["c*d"] = (df["Copies (c)"].to_numpy() * length_m).round(4)
+    # a fully transparent file has no coverage to rescale
+    scale = np.divide(1.0, fractions, out=np.ones_like(fractions), where=fractions > 0)
+    for column in ("Coverage", "Ink coverage"):
+        if column in df:
+            df[column] = np.minimum(1.0, df[column].astype(float).to_numpy() * scale)
+    return df
+
+
+def scan_folder(folder_path, workers=DEFAULT_SCAN_WORKERS):
+    """Scan a folder of TIFs concurrently. Returns (rows, errors)."""
+    return process_files(list_tifs(folder_path), workers=workers)
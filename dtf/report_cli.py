@@ -0,0 +1,123 @@
+# dtf/report_cli.py
+"""
+Headless version of the Reports page, for scheduled runs.
+
+    python -m dtf.report_cli /jobs/2024-05 --summary summary.csv --raw raw.parquet
+
+Walks the folder tree, parses ``client-order-copies.tif`` names, reads DPI
+and height, and writes the per-client summary and the raw table. Output
+format follows the file extension (.csv or .parquet). Exit code is 0 when
+every file was processed, 1 if any file had an error, 2 if nothing could
+be processed at all.
+
+With ``--index PATH`` results are kept in a SQLite index (see
+dtf.report_index) and only new or changed files are read on the next run.
+``--history PATH`` also appends the processed files to a report history
+store (see dtf.history), dated by their mtime.
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from dtf.history import HistoryStore
+from dtf.report import DEFAULT_SCAN_WORKERS, iter_process_files, summarize, walk_tifs
+from dtf.report_index import ReportIndex
+
+EXIT_OK = 0
+EXIT_FILE_ERRORS = 1
+EXIT_NOTHING_PROCESSED = 2
+
+
+def write_table(df, path):
+    """Write `df` as CSV or Parquet depending on the extension of `path`."""
+    if path.lower().endswith((".parquet", ".pq")):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m dtf.report_cli",
+        description="TIF folder -> client summary, without the Streamlit UI.",
+    )
+    parser.add_argument("folder", help="folder to scan (sub-folders included)")
+    parser.add_argument("--summary", default="report_summary.csv", help="summary output (.csv or .parquet)")
+    parser.add_argument("--raw", help="raw per-file table output (.csv or .parquet)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_SCAN_WORKERS, help="parallel file reads")
+    parser.add_argument("--progress-every", type=int, default=1000, help="print progress every N files (0 = off)")
+    parser.add_argument("--index", help="SQLite index file; only new or changed files are read")
+    parser.add_argument("--history", help="report history file to append the processed files to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    out = sys.stdout
+
+    if not os.path.isdir(args.folder):
+        print(f"Folder not found: {args.folder}", file=sys.stderr)
+        return EXIT_NOTHING_PROCESSED
+
+    def report_progress(done, total):
+        if args.progress_every and (done % args.progress_every == 0 or done == total):
+            print(f"{done}/{total} files processed", file=out, flush=True)
+
+    if args.index:
+        with ReportIndex(args.index) as index:
+            changes = index.update(args.folder, recursive=True, workers=args.workers, progress=report_progress)
+            print(
+                f"Index: {changes['added']} new, {changes['changed']} changed, "
+                f"{changes['removed']} removed, {changes['unchanged']} unchanged files",
+                file=out, flush=True,
+            )
+            rows, error_list, summary = index.rows(), index.errors(), index.summary()
+            # (path, mtime in seconds) per row, for the history
+            sources = [(path, mtime_ns / 1e9) for path, mtime_ns in index.sources(args.folder)]
+        for err in error_list:
+            print(f"ERROR {err}", file=sys.stderr)
+        errors = len(error_list)
+    else:
+        files = walk_tifs(os.path.abspath(args.folder), with_stat=True)
+        total = len(files)
+        print(f"Found {total} TIF files under {args.folder}", file=out, flush=True)
+
+        rows = []
+        sources = []
+        errors = 0
+        summary = None
+        results = iter_process_files([(name, path) for name, path, _, _ in files], workers=args.workers)
+        for done, ((_, path, _, mtime_ns), (row, err)) in enumerate(zip(files, results), start=1):
+            if err:
+                errors += 1
+                print(f"ERROR {err}", file=sys.stderr, flush=True)
+            else:
+                rows.append(row)
+                sources.append((path, mtime_ns / 1e9))
+            report_progress(done, total)
+
+    if not rows:
+        print("No valid TIF files processed. Check filenames and file contents.", file=sys.stderr)
+        return EXIT_NOTHING_PROCESSED
+
+    df = pd.DataFrame(rows).sort_values(["Client", "Order"])
+    if summary is None:
+        summary = summarize(df)
+    write_table(summary, args.summary)
+    print(f"Summary for {len(summary)} clients written to {args.summary}", file=out)
+    if args.raw:
+        write_table(df, args.raw)
+        print(f"{len(df)} raw rows written to {args.raw}", file=out)
+    if args.history:
+        # keyed by path: the same file name recurs in every day's folder
+        with HistoryStore(args.history) as store:
+            added = store.append(rows, [mtime for _, mtime in sources], [path for path, _ in sources])
+        print(f"{added} new or changed files recorded in {args.history}", file=out)
+
+    return EXIT_FILE_ERRORS if errors else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
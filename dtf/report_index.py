@@ -0,0 +1,230 @@
+# dtf/report_index.py
+"""
+Persistent SQLite index of processed TIFs, for incremental reports.
+
+Each file is stored with its size and mtime. On update() the folder is only
+stat'ed; files whose (size, mtime) didn't change are not opened again, and
+deleted files are dropped. Per-client totals (Number of Orders, P) are kept
+in their own table and adjusted by the rows that changed, instead of a full
+groupby over every file.
+
+c*d is stored in 1e-4 units as an integer (the report rounds it to 4
+decimals anyway), so adding and subtracting never drifts.
+
+Paths are stored relative to the folder passed to update(), so the same
+folder reached through another mount point, drive letter or symlink keeps
+its index. Files not found in that folder are dropped: updating with
+another folder replaces the rows (reading its files once) instead of
+mixing two folders into one report.
+"""
+import os
+import sqlite3
+
+import pandas as pd
+
+from dtf.report import (
+    DEFAULT_SCAN_WORKERS,
+    iter_threaded,
+    make_row,
+    parse_filename,
+    read_tif_info,
+    walk_tifs,
+)
+
+INDEX_FILENAME = ".dtf_report_index.sqlite"
+
+_CD_SCALE = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    client TEXT,
+    order_no INTEGER,
+    copies INTEGER,
+    dpi REAL,
+    length_m REAL,
+    cd_e4 INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS files_client ON files (client);
+CREATE TABLE IF NOT EXISTS clients (
+    client TEXT PRIMARY KEY,
+    n_files INTEGER NOT NULL,
+    max_order INTEGER,
+    cd_e4 INTEGER NOT NULL
+);
+"""
+
+
+def _index_file(fname, path):
+    """Parse and read one file; returns the record for the files table."""
+    record = {"file": fname, "client": None, "order_no": None, "copies": None,
+              "dpi": None, "length_m": None, "cd_e4": None, "error": None}
+    parsed, err = parse_filename(fname)
+    if err:
+        record["error"] = err
+        return record
+    try:
+        height_px, dpi = read_tif_info(path)
+    except Exception as e:
+        record["error"] = f"Error processing {fname}: {e}"
+        return record
+    row = make_row(fname, *parsed, height_px, dpi)
+    record.update(
+        client=row["Client"],
+        order_no=row["Order"],
+        copies=row["Copies (c)"],
+        dpi=dpi,
+        length_m=row["Length (d, m)"],
+        cd_e4=int(round(row["c*d"] * _CD_SCALE)),
+    )
+    return record
+
+
+class ReportIndex:
+    """
+    On-disk index of one report folder.
+
+    Use update() to sync with the folder, then rows()/summary()/errors() to
+    read the report without touching the files.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, folder, recursive=False, workers=DEFAULT_SCAN_WORKERS, progress=None):
+        """
+        Sync the index with `folder`.
+
+        Only new or modified files are opened. `progress(done, total)` is
+        called while they are read. Returns a dict with the counts of
+        ``added``, ``changed``, ``removed`` and ``unchanged`` files.
+        """
+        folder = os.path.abspath(folder)
+        on_disk = walk_tifs(folder, recursive=recursive, with_stat=True)
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self._db.execute("SELECT path, size, mtime_ns FROM files")
+        }
+
+        todo = []
+        seen = set()
+        for fname, path, size, mtime_ns in on_disk:
+            rel = os.path.relpath(path, folder)
+            seen.add(rel)
+            if known.get(rel) != (size, mtime_ns):
+                todo.append((fname, path, rel, size, mtime_ns))
+        removed = [rel for rel in known if rel not in seen]
+
+        records = []
+        total = len(todo)
+        items = ((fname, path) for fname, path, _, _, _ in todo)
+        for done, record in enumerate(iter_threaded(_index_file, items, workers=workers), start=1):
+            records.append(record)
+            if progress:
+                progress(done, total)
+
+        with self._db:
+            touched = set()
+            for rel in removed + [item[2] for item in todo if item[2] in known]:
+                self._drop(rel, touched)
+            for (_, _, rel, size, mtime_ns), record in zip(todo, records):
+                self._add(rel, size, mtime_ns, record, touched)
+            self._refresh_max_order(touched)
+
+        changed = sum(1 for item in todo if item[2] in known)
+        return {
+            "added": total - changed,
+            "changed": changed,
+            "removed": len(removed),
+            "unchanged": len(on_disk) - total,
+        }
+
+    def _drop(self, path, touched):
+        old = self._db.execute("SELECT client, cd_e4 FROM files WHERE path = ?", (path,)).fetchone()
+        self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+        if old and old[0] is not None:
+            client, cd_e4 = old
+            self._db.execute(
+                "UPDATE clients SET n_files = n_files - 1, cd_e4 = cd_e4 - ? WHERE client = ?",
+                (cd_e4, client),
+            )
+            touched.add(client)
+
+    def _add(self, path, size, mtime_ns, record, touched):
+        self._db.execute(
+            "INSERT INTO files (path, size, mtime_ns, file, client, order_no, copies, dpi, length_m, cd_e4, error) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, record["file"], record["client"], record["order_no"], record["copies"],
+             record["dpi"], record["length_m"], record["cd_e4"], record["error"]),
+        )
+        client = record["client"]
+        if client is None:
+            return
+        self._db.execute(
+            "INSERT INTO clients (client, n_files, max_order, cd_e4) VALUES (?, 1, ?, ?) "
+            "ON CONFLICT (client) DO UPDATE SET n_files = n_files + 1, "
+            "max_order = MAX(COALESCE(max_order, excluded.max_order), excluded.max_order), "
+            "cd_e4 = cd_e4 + excluded.cd_e4",
+            (client, record["order_no"], record["cd_e4"]),
+        )
+        touched.add(client)
+
+    def _refresh_max_order(self, clients):
+        # a max can't be decremented, so recompute it for the touched clients only
+        for client in clients:
+            self._db.execute(
+                "UPDATE clients SET max_order = (SELECT MAX(order_no) FROM files WHERE client = ?) WHERE client = ?",
+                (client, client),
+            )
+        self._db.execute("DELETE FROM clients WHERE n_files <= 0")
+
+    def summary(self):
+        """Per-client summary with the same columns as dtf.report.summarize."""
+        data = self._db.execute("SELECT client, max_order, cd_e4 FROM clients ORDER BY client").fetchall()
+        return pd.DataFrame(
+            [(client, max_order, cd_e4 / _CD_SCALE) for client, max_order, cd_e4 in data],
+            columns=["Client", "Number of Orders", "P (Σ c*d)"],
+        )
+
+    def rows(self):
+        """Raw table rows, as dtf.report.process_file builds them."""
+        data = self._db.execute(
+            "SELECT client, order_no, copies, length_m, cd_e4, file FROM files "
+            "WHERE error IS NULL ORDER BY path"
+        ).fetchall()
+        return [
+            {
+                "Client": client,
+                "Order": order_no,
+                "Copies (c)": copies,
+                "Length (d, m)": length_m,
+                "c*d": cd_e4 / _CD_SCALE,
+                "File": fname,
+            }
+            for client, order_no, copies, length_m, cd_e4, fname in data
+        ]
+
+    def sources(self, folder):
+        """(path under `folder`, mtime_ns) of each row of rows(), in the same order."""
+        folder = os.path.abspath(folder)
+        data = self._db.execute("SELECT path, mtime_ns FROM files WHERE error IS NULL ORDER BY path")
+        return [(os.path.join(folder, rel), mtime_ns) for rel, mtime_ns in data]
+
+    def errors(self):
+        """Error messages for indexed files that couldn't be processed."""
+        return [row[0] for row in self._db.execute("SELECT error FROM files WHERE error IS NOT NULL ORDER BY path")]
@@ -0,0 +1,168 @@
+# dtf/scenarios.py
+"""
+Scenario sweeps and Monte Carlo draws over the cost model's inputs.
+
+One job (length, coverage) is priced for many settings at once: every
+parameter is an array and the total comes out of a single broadcast numpy
+expression, so 100k scenarios take milliseconds. Consumption uses one rate
+per scenario (the calculator's "avg" rate is the base value).
+"""
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+# parameter -> label, in sidebar order
+PARAMETERS = {
+    "film_roll_price": "Film roll price (EGP/roll)",
+    "roll_length_m": "Roll length (m)",
+    "ink_price_per_l": "Ink price (EGP/l)",
+    "powder_price_per_kg": "Powder price (EGP/kg)",
+    "ink_ml_per_m": "Ink consumption (ml/m)",
+    "powder_g_per_m": "Powder consumption (g/m)",
+    "labor_monthly": "Labor monthly (EGP)",
+    "electricity_monthly": "Electricity monthly (EGP)",
+    "monthly_output_m": "Monthly production (m)",
+}
+
+# keep a sweep from eating the server's memory (~15 float64 columns each)
+MAX_SCENARIOS = 2_000_000
+
+COST_COLUMNS = ("film", "ink", "powder", "overhead", "total")
+
+
+def base_params(settings):
+    """Scenario parameters at their PriceSettings values."""
+    consumption = {"ink_ml_per_m": settings.ink_ml_per_m_avg, "powder_g_per_m": settings.powder_g_per_m_avg}
+    return {name: consumption.get(name, getattr(settings, name, None)) for name in PARAMETERS}
+
+
+def scenario_costs(length_m, coverage, params, ink_coverage=None):
+    """
+    Cost breakdown for every scenario in `params` (name -> array, all the
+    same length or scalars). Returns (film, ink, powder, overhead, total).
+    """
+    ink_coverage = coverage if ink_coverage is None else ink_coverage
+    p = {name: np.asarray(value, dtype=np.float64) for name, value in params.items()}
+
+    film = p["film_roll_price"] / p["roll_length_m"] * length_m
+    ink = ink_coverage * length_m * p["ink_ml_per_m"] * p["ink_price_per_l"] / 1000.0
+    powder = coverage * length_m * p["powder_g_per_m"] * p["powder_price_per_kg"] / 1000.0
+    monthly = p["labor_monthly"] + p["electricity_monthly"]
+    output = p["monthly_output_m"]
+    per_m = np.divide(monthly, output, out=np.zeros(np.broadcast(monthly, output).shape), where=output > 0)
+    overhead = per_m * length_m
+    total = film + ink + powder + overhead
+    return film, ink, powder, overhead, total
+
+
+def _frame(varied, base, length_m, coverage, ink_coverage):
+    n = len(next(iter(varied.values()))) if varied else 1
+    params = {**base, **varied}
+    costs = scenario_costs(length_m, coverage, params, ink_coverage)
+    columns = dict(varied)
+    for name, values in zip(COST_COLUMNS, costs):
+        columns[name] = np.broadcast_to(values, (n,))
+    return pd.DataFrame(columns)
+
+
+def sweep_grid(settings, length_m, coverage, ranges, ink_coverage=None):
+    """
+    Price every combination of the values in `ranges` (name -> values).
+
+    Parameters not in `ranges` stay at their settings value. Returns a
+    DataFrame with one column per varied parameter plus the cost columns.
+    Raises ValueError beyond MAX_SCENARIOS combinations.
+    """
+    names = list(ranges)
+    values = [np.asarray(ranges[name], dtype=np.float64) for name in names]
+    size = int(np.prod([len(v) for v in values])) if values else 1
+    if size > MAX_SCENARIOS:
+        raise ValueError(f"{size:,} scenarios is more than the {MAX_SCENARIOS:,} limit")
+    mesh = np.meshgrid(*values, indexing="ij") if values else []
+    varied = {name: grid.ravel() for name, grid in zip(names, mesh)}
+    return _frame(varied, base_params(settings), length_m, coverage, ink_coverage)
+
+
+def monte_carlo(settings, length_m, coverage, ranges, n=10_000, ink_coverage=None, seed=0):
+    """
+    Price `n` random scenarios. `ranges` maps a parameter to (low, high).
+
+    Each parameter is drawn from a triangular distribution peaking at its
+    settings value (uniform when that value is outside the range).
+    """
+    if n > MAX_SCENARIOS:
+        raise ValueError(f"{n:,} scenarios is more than the {MAX_SCENARIOS:,} limit")
+    rng = np.random.default_rng(seed)
+    base = base_params(settings)
+    varied = {}
+    for name, (low, high) in ranges.items():
+        mode = base[name]
+        if low < mode < high:
+            varied[name] = rng.triangular(low, mode, high, size=n)
+        else:
+            varied[name] = rng.uniform(low, high, size=n)
+    return _frame(varied, base, length_m, coverage, ink_coverage)
+
+
+def tornado(settings, length_m, coverage, ranges, ink_coverage=None):
+    """
+    One-at-a-time sensitivity: total at each parameter's low and high with
+    the others at base. Returns a DataFrame sorted by swing, largest first.
+    """
+    base = base_params(settings)
+    names = list(ranges)
+    k = len(names)
+    # 2k scenarios: row 2i is parameter i at low, row 2i+1 at high
+    varied = {name: np.full(2 * k, base[name], dtype=np.float64) for name in names}
+    for i, name in enumerate(names):
+        varied[name][2 * i], varied[name][2 * i + 1] = ranges[name]
+    total = np.broadcast_to(scenario_costs(length_m, coverage, {**base, **varied}, ink_coverage)[-1], (2 * k,))
+    base_total = float(scenario_costs(length_m, coverage, base, ink_coverage)[-1])
+    frame = pd.DataFrame({
+        "parameter": [PARAMETERS[name] for name in names],
+        "low": [ranges[name][0] for name in names],
+        "high": [ranges[name][1] for name in names],
+        "total_at_low": total[0::2],
+        "total_at_high": total[1::2],
+    })
+    frame["swing"] = (frame["total_at_high"] - frame["total_at_low"]).abs()
+    frame.attrs["base_total"] = base_total
+    return frame.sort_values("swing", ascending=False, ignore_index=True)
+
+
+def percentiles(totals, qs=(5, 25, 50, 75, 95)):
+    """Summary row of a total distribution: mean and the given percentiles."""
+    values = np.percentile(totals, qs)
+    return pd.Series({"mean": float(np.mean(totals)), **{f"p{q}": float(v) for q, v in zip(qs, values)}})
+
+
+def distribution_figure(totals, base_total=None, bins=60):
+    """Histogram of scenario totals, with the base case marked."""
+    fig = Figure(figsize=(7, 3.2))
+    ax = fig.subplots()
+    ax.hist(totals, bins=bins, color="tab:blue", alpha=0.8)
+    if base_total is not None:
+        ax.axvline(base_total, color="black", linestyle="--", linewidth=1, label="current settings")
+        ax.legend()
+    ax.set_xlabel("Total cost (EGP)")
+    ax.set_ylabel("Scenarios")
+    fig.tight_layout()
+    return fig
+
+
+def tornado_figure(frame):
+    """Horizontal bars from tornado(): low and high totals around the base."""
+    base_total = frame.attrs.get("base_total", 0.0)
+    rows = frame.iloc[::-1]  # largest swing on top
+    fig = Figure(figsize=(7, 0.45 * len(rows) + 1.2))
+    ax = fig.subplots()
+    y = np.arange(len(rows))
+    ax.barh(y, rows["total_at_low"] - base_total, left=base_total, color="tab:green", label="parameter at low")
+    ax.barh(y, rows["total_at_high"] - base_total, left=base_total, color="tab:red", label="parameter at high")
+    ax.axvline(base_total, color="black", linewidth=1)
+    ax.set_yticks(y)
+    ax.set_yticklabels(rows["parameter"])
+    ax.set_xlabel("Total cost (EGP)")
+    ax.legend(loc="best")
+    fig.tight_layout()
+    return fig
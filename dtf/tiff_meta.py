@@ -0,0 +1,136 @@
+# dtf/tiff_meta.py
+"""
+Minimal TIFF header reader: image size and resolution tags of the first IFD.
+
+The report only needs the height and tags 282/283/296. Reading them here
+takes a handful of small seek+read calls instead of Pillow's plugin
+detection and full tag parsing. Handles little/big-endian classic TIFF and
+BigTIFF. Anything else returns None so callers can fall back to Pillow.
+"""
+import os
+import struct
+from fractions import Fraction
+
+TAG_WIDTH = 256
+TAG_HEIGHT = 257
+TAG_X_RESOLUTION = 282
+TAG_Y_RESOLUTION = 283
+TAG_RESOLUTION_UNIT = 296
+
+_WANTED = (TAG_WIDTH, TAG_HEIGHT, TAG_X_RESOLUTION, TAG_Y_RESOLUTION, TAG_RESOLUTION_UNIT)
+
+# TIFF field type -> (struct code, size in bytes)
+_TYPES = {
+    1: ("B", 1),   # BYTE
+    3: ("H", 2),   # SHORT
+    4: ("L", 4),   # LONG
+    5: ("LL", 8),  # RATIONAL
+    6: ("b", 1),   # SBYTE
+    8: ("h", 2),   # SSHORT
+    9: ("l", 4),   # SLONG
+    10: ("ll", 8),  # SRATIONAL
+    11: ("f", 4),  # FLOAT
+    12: ("d", 8),  # DOUBLE
+    16: ("Q", 8),  # LONG8 (BigTIFF)
+    17: ("q", 8),  # SLONG8 (BigTIFF)
+}
+
+# don't follow absurd entry counts in damaged files
+_MAX_ENTRIES = 4096
+
+
+def _rational(num, den):
+    # a zero denominator reads as NaN, like Pillow's IFDRational
+    if den == 0:
+        return float("nan")
+    return Fraction(num, den)
+
+
+def _read_exact(fp, size):
+    data = fp.read(size)
+    if len(data) != size:
+        raise ValueError("truncated TIFF")
+    return data
+
+
+def _decode_value(fp, endian, field_type, inline, big):
+    """First value of an IFD entry (all the tags we want have count 1)."""
+    code, size = _TYPES[field_type]
+    if size > (8 if big else 4):
+        (offset,) = struct.unpack(endian + ("Q" if big else "L"), inline)
+        fp.seek(offset)
+        raw = _read_exact(fp, size)
+    else:
+        raw = inline[:size]
+    values = struct.unpack(endian + code, raw)
+    if field_type in (5, 10):
+        return _rational(*values)
+    return values[0]
+
+
+def _read_first_ifd(fp):
+    header = _read_exact(fp, 8)
+    if header[:2] == b"II":
+        endian = "<"
+    elif header[:2] == b"MM":
+        endian = ">"
+    else:
+        return None
+
+    (magic,) = struct.unpack(endian + "H", header[2:4])
+    if magic == 42:
+        big = False
+        (ifd_offset,) = struct.unpack(endian + "L", header[4:8])
+    elif magic == 43:
+        big = True
+        bytesize, _ = struct.unpack(endian + "HH", header[4:8])
+        if bytesize != 8:
+            return None
+        (ifd_offset,) = struct.unpack(endian + "Q", _read_exact(fp, 8))
+    else:
+        return None
+
+    fp.seek(ifd_offset)
+    if big:
+        (count,) = struct.unpack(endian + "Q", _read_exact(fp, 8))
+        entry_fmt, entry_size = endian + "HHQ8s", 20
+    else:
+        (count,) = struct.unpack(endian + "H", _read_exact(fp, 2))
+        entry_fmt, entry_size = endian + "HHL4s", 12
+    if count > _MAX_ENTRIES:
+        return None
+
+    entries = _read_exact(fp, count * entry_size)
+    tags = {}
+    for i in range(count):
+        tag, field_type, n, inline = struct.unpack_from(entry_fmt, entries, i * entry_size)
+        if tag in _WANTED and n >= 1 and field_type in _TYPES:
+            tags[tag] = _decode_value(fp, endian, field_type, inline, big)
+    return tags
+
+
+def read_tiff_tags(source):
+    """
+    Read width, height and resolution tags from the first IFD of a TIFF.
+
+    `source` is a path or a seekable binary file object (its position is
+    restored). Returns a dict keyed by tag number with only the tags that are
+    present, or None when this isn't a TIFF we can parse.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        try:
+            with open(source, "rb", buffering=0) as fp:
+                return _read_first_ifd(fp)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    try:
+        start = source.tell()
+    except (AttributeError, OSError):
+        return None
+    try:
+        return _read_first_ifd(source)
+    except (OSError, ValueError, struct.error):
+        return None
+    finally:
+        source.seek(start)
@@ -0,0 +1,93 @@
+# dtf/trim.py
+"""
+Print length of a design without its transparent margins.
+
+The film used is the height of the inked area, not of the file: designs
+often come with empty space above and below. trim_extent() projects the
+alpha channel onto rows strip by strip (see dtf.coverage), keeping only
+the first and last inked rows, and onto columns over the inked rows for
+the width check. One strip is held at a time, so multi-meter files run in
+bounded memory; the reductions are cheap next to decoding.
+
+dtf.ink.ink_usage() finds the same box while it reads the design, so
+trim_from_ink() gets the trim without decoding the file again.
+"""
+import numpy as np
+
+from dtf.coverage import DEFAULT_STRIP_BYTES, iter_alpha_strips, open_image
+from dtf.instrument import stage, timed_iter
+from dtf.report import get_dpi, has_dpi
+
+
+def trim_extent(source, strip_bytes=DEFAULT_STRIP_BYTES):
+    """
+    Trim box of a design and its size in cm.
+
+    `source` is a path, file-like object or PIL image. Returns a dict:
+
+    - ``bbox``: (left, top, right, bottom) pixel box of alpha > 0 (right and
+      bottom exclusive), or None for a fully transparent image
+    - ``width_px``, ``height_px``: full image size
+    - ``dpi``: see dtf.report.get_dpi; ``dpi_in_file`` is False when that is
+      the 300 DPI fallback
+    - ``length_cm``, ``width_cm``: trimmed size (0.0 when fully transparent)
+    - ``height_cm``: full image height
+    """
+    img, own = open_image(source)
+    try:
+        width, height = img.size
+        dpi, dpi_in_file = get_dpi(img), has_dpi(img)
+        cols = np.zeros(width, dtype=np.uint8)
+        top = bottom = None
+        y = 0
+        for alpha in timed_iter(iter_alpha_strips(img, strip_bytes=strip_bytes), "decode"):
+            with stage("trim"):
+                rows = np.flatnonzero(alpha.max(axis=1))
+                if rows.size:
+                    if top is None:
+                        top = y + int(rows[0])
+                    bottom = y + int(rows[-1]) + 1
+                    np.maximum(cols, alpha[rows[0]:rows[-1] + 1].max(axis=0), out=cols)
+            y += len(alpha)
+    finally:
+        if own:
+            img.close()
+
+    bbox = None
+    if top is not None:
+        xs = np.flatnonzero(cols)
+        bbox = (int(xs[0]), top, int(xs[-1]) + 1, bottom)
+    return _trim(bbox, width, height, dpi, dpi_in_file)
+
+
+def trim_from_ink(source, ink):
+    """
+    trim_extent() of a design from its ink_usage() result.
+
+    Only the header of `source` is read, for the size and DPI. Results
+    without a ``bbox`` (cached by older versions) fall back to trim_extent().
+    """
+    if "bbox" not in ink:
+        return trim_extent(source)
+    img, own = open_image(source)
+    try:
+        width, height = img.size
+        dpi, dpi_in_file = get_dpi(img), has_dpi(img)
+    finally:
+        if own:
+            img.close()
+    return _trim(ink["bbox"], width, height, dpi, dpi_in_file)
+
+
+def _trim(bbox, width, height, dpi, dpi_in_file):
+    cm_per_px = 2.54 / dpi
+    return {
+        "bbox": bbox,
+        "width_px": width,
+        "height_px": height,
+        "dpi": dpi,
+        "dpi_in_file": dpi_in_file,
+        "length_cm": (bbox[3] - bbox[1]) * cm_per_px if bbox else 0.0,
+        "width_cm": (bbox[2] - bbox[0]) * cm_per_px if bbox else 0.0,
+        "height_cm": height * cm_per_px,
+    }
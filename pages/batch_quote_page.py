@@ -0,0 +1,86 @@
+# pages/batch_quote_page.py
+import pandas as pd
+import streamlit as st
+
+from dtf.batch import analyze_cached, price_batch, shared_pool
+from dtf.cache import content_hash, shared_cache
+from dtf.pricing import PriceSettings
+
+st.set_page_config(page_title="Batch Quote", layout="wide")
+
+st.title("🧾 Batch Quote — price a whole order of designs")
+
+# prices come from the calculator page's sidebar when it was opened this session
+settings = st.session_state.get("price_settings")
+if settings is None:
+    settings = PriceSettings()
+    st.caption("Using default prices — open the DTF Calculator page to change them.")
+
+uploaded_files = st.file_uploader(
+    "Upload designs (PNG/TIFF/JPG) — length is read from each file's DPI",
+    type=["png", "tif", "tiff", "jpg", "jpeg"],
+    accept_multiple_files=True,
+)
+fallback_dpi = st.number_input("DPI for files without one", min_value=1.0, value=300.0, step=1.0)
+
+if not uploaded_files:
+    st.info("Upload the designs of one order.")
+    st.stop()
+
+# --- Analyze: cached designs first, the rest in the process pool ---
+coverage_cache = shared_cache()
+upload_hashes = st.session_state.setdefault("upload_hashes", {})
+digests = []
+for f in uploaded_files:
+    if f.file_id not in upload_hashes:
+        upload_hashes[f.file_id] = content_hash(f.getvalue())
+    digests.append(upload_hashes[f.file_id])
+
+progress = st.progress(0.0, text="Analyzing designs…")
+live = st.empty()
+done_so_far = []
+
+
+def _show(done, total, i, result):
+    done_so_far.append(result)
+    progress.progress(done / total, text=f"Analyzed {done}/{total}: {result['name']}")
+    live.dataframe(price_batch(done_so_far, settings, fallback_dpi=fallback_dpi), use_container_width=True)
+
+
+items = [(f.name, f) for f in uploaded_files]
+results = analyze_cached(items, digests, coverage_cache, pool=shared_pool(), progress=_show)
+progress.empty()
+live.empty()
+
+# --- Priced table; copies are editable ---
+ok = [i for i, result in enumerate(results) if not result["error"]]
+copies_key = "batch_copies"
+copies_table = pd.DataFrame({
+    "Design": [uploaded_files[i].name for i in ok],
+    "Copies": [st.session_state.get(copies_key, {}).get(digests[i], 1) for i in ok],
+})
+st.subheader("Copies per design")
+copies_table = st.data_editor(copies_table, disabled=["Design"], hide_index=True, use_container_width=True)
+st.session_state[copies_key] = {digests[i]: int(n) for i, n in zip(ok, copies_table["Copies"])}
+
+table = price_batch([results[i] for i in ok], settings, copies=list(copies_table["Copies"]), fallback_dpi=fallback_dpi)
+
+st.subheader("Cost range per design (EGP, all copies)")
+st.dataframe(table, use_container_width=True, hide_index=True)
+
+total = table.iloc[-1]
+st.write(
+    f"**Order total:** {total['Min (EGP)']:.2f} — {total['Average (EGP)']:.2f} — {total['Max (EGP)']:.2f} EGP "
+    f"(min — avg — max) for {int(total['Copies'])} prints"
+)
+if (~table["DPI from file"].iloc[:-1].astype(bool)).any():
+    st.warning(f"Some designs have no DPI in the file; their length assumes {fallback_dpi:g} DPI.")
+
+errors = [result["error"] for result in results if result["error"]]
+if errors:
+    st.subheader("⚠️ Warnings / Errors")
+    for e in errors:
+        st.write("- " + e)
+
+csv = table.to_csv(index=False).encode("utf-8")
+st.download_button("Download batch cost table (CSV)", csv, "dtf_batch_costs.csv", "text/csv")
@@ -1,26 +1,50 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 import pandas as pd
-from PIL import Image
 import numpy as np
 
+from dtf.cache import content_hash, shared_cache
+from dtf.coverage import estimate_coverage
+from dtf.instrument import Recorder, enabled_by_env, stage
+from dtf.ink import INK_CHANNELS, channel_split, ink_usage
+from dtf.preview import build_pyramid, render_view
+from dtf.pricing import FIXED_WIDTH_CM, PriceSettings, cost_table, price_jobs
+from dtf.scenarios import (
+    PARAMETERS,
+    base_params,
+    distribution_figure,
+    monte_carlo,
+    percentiles,
+    sweep_grid,
+    tornado,
+    tornado_figure,
+)
+from dtf.trim import trim_from_ink
+
 # ------- Page config -------
 st.set_page_config(page_title="DTF Cost Range Calculator", layout="wide")
 
+
+@st.cache_resource
+def _background_pool():
+    """Shared pool for exact coverage runs started by the fast preview."""
+    return ThreadPoolExecutor(max_workers=2)
+
+
 # ------- Sidebar inputs (editable) -------
 st.sidebar.header("Cost & Consumption Settings (EGP)")
 
 # Film / roll
 film_roll_price = st.sidebar.number_input("Film roll price (EGP per roll)", value=1800.0, step=10.0)
 roll_length_m = st.sidebar.number_input("Roll length (meters)", value=100.0, step=1.0)
-film_cost_per_m = film_roll_price / roll_length_m
 
 # Ink price
 ink_price_per_l = st.sidebar.number_input("Ink price (EGP per liter)", value=1350.0, step=10.0)
-ink_price_per_ml = ink_price_per_l / 1000.0
 
 # Powder price
 powder_price_per_kg = st.sidebar.number_input("Powder price (EGP per kg)", value=450.0, step=5.0)
-powder_price_per_g = powder_price_per_kg / 1000.0
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("Ink consumption (ml per meter at 60cm width)")
@@ -40,6 +64,28 @@ labor_monthly = st.sidebar.number_input("Labor monthly cost (EGP)", value=85000.
 electricity_monthly = st.sidebar.number_input("Electricity monthly cost (EGP)", value=15000.0, step=500.0)
 monthly_output_m = st.sidebar.number_input("Monthly production (meters)", value=4000.0, step=50.0)
 
+st.sidebar.markdown("---")
+show_timings = st.sidebar.checkbox("Show timing debug panel", value=enabled_by_env())
+recorder = Recorder("dtf_dashboard").activate() if show_timings or enabled_by_env() else None
+
+settings = PriceSettings(
+    film_roll_price=film_roll_price,
+    roll_length_m=roll_length_m,
+    ink_price_per_l=ink_price_per_l,
+    powder_price_per_kg=powder_price_per_kg,
+    ink_ml_per_m_min=ink_ml_per_m_min,
+    ink_ml_per_m_avg=ink_ml_per_m_avg,
+    ink_ml_per_m_max=ink_ml_per_m_max,
+    powder_g_per_m_min=powder_g_per_m_min,
+    powder_g_per_m_avg=powder_g_per_m_avg,
+    powder_g_per_m_max=powder_g_per_m_max,
+    labor_monthly=labor_monthly,
+    electricity_monthly=electricity_monthly,
+    monthly_output_m=monthly_output_m,
+)
+# the gang sheet page prices with the same settings
+st.session_state["price_settings"] = settings
+
 # ------- Main UI -------
 st.title("DTF Cost Calculator — Min → Avg → Max for Ink & Powder")
 
@@ -47,37 +93,128 @@ col1, col2 = st.columns([2, 1])
 
 with col1:
     st.subheader("1) Upload design (optional) or enter length manually")
-    uploaded_file = st.file_uploader("Upload design (PNG/TIFF/JPG) — optional (we won't read DPI for length)", type=["png","tif","tiff","jpg","jpeg"])
-    st.info("Important: enter the design LENGTH (height) manually below (cm). This ensures correct length even if image DPI is missing/wrong).")
+    uploaded_file = st.file_uploader("Upload design (PNG/TIFF/JPG) — optional (its inked length can pre-fill the length)", type=["png","tif","tiff","jpg","jpeg"])
+    st.info("Important: check the design LENGTH (height) below (cm). It is pre-filled from the upload's inked area and DPI, so a missing/wrong DPI gives a wrong length.")
 
 with col2:
     st.subheader("Quick reference")
-    st.write(f"Film cost per meter: **{film_cost_per_m:.2f} EGP/m**")
-    st.write(f"Ink price per ml: **{ink_price_per_ml:.3f} EGP/ml**")
-    st.write(f"Powder price per g: **{powder_price_per_g:.3f} EGP/g**")
-    st.write(f"Overhead per meter (approx): **{(labor_monthly+electricity_monthly)/monthly_output_m:.2f} EGP/m**")
+    st.write(f"Film cost per meter: **{settings.film_cost_per_m:.2f} EGP/m**")
+    st.write(f"Ink price per ml: **{settings.ink_price_per_ml:.3f} EGP/ml**")
+    st.write(f"Powder price per g: **{settings.powder_price_per_g:.3f} EGP/g**")
+    st.write(f"Overhead per meter (approx): **{settings.overhead_per_m:.2f} EGP/m**")
 
 st.markdown("---")
 
 # 2) manual inputs
 st.subheader("2) Design dimensions & coverage")
-design_height_cm = st.number_input("Design length / height (cm)", value=150.0, step=1.0)  # user-controlled
-fixed_width_cm = 60.0  # fixed
+if uploaded_file:
+    # hash each upload once; reruns for price changes then only hit the cache
+    upload_hashes = st.session_state.setdefault("upload_hashes", {})
+    if uploaded_file.file_id not in upload_hashes:
+        with stage("upload_hash", file=uploaded_file.name):
+            upload_hashes[uploaded_file.file_id] = content_hash(uploaded_file.getvalue())
+    digest = upload_hashes[uploaded_file.file_id]
 
-# If file uploaded, optionally compute auto coverage from alpha channel (show result but let user override)
-auto_coverage_pct = None
+prefill = bool(uploaded_file) and st.checkbox(
+    "Pre-fill the length from the design (transparent margins trimmed)", value=True
+)
+fast_preview = st.checkbox("Fast preview — sampled estimate first, exact result computed in the background", value=True)
+
+# If file uploaded, compute coverage from the alpha channel (shown below, the user can override it).
+# The exact run also finds the inked box, so the trim needs no decode of its own.
+ink_info = None
+estimate = None
+read_error = None
 if uploaded_file:
-    img = Image.open(uploaded_file).convert("RGBA")
-    arr = np.array(img)
-    alpha = arr[:, :, 3]
-    auto_coverage_frac = (alpha > 0).sum() / alpha.size
-    auto_coverage_pct = float(round(auto_coverage_frac * 100, 1))
+    coverage_cache = shared_cache()
+    ink_info = coverage_cache.get(("ink", digest))
+    # corrupt or too large to decode: remembered per upload, so reruns don't read (or resubmit) it again
+    read_errors = st.session_state.setdefault("read_errors", {})
+    try:
+        if digest in read_errors:
+            pass
+        elif ink_info is None and fast_preview:
+            # exact run keeps going across reruns; pick it up once it's finished
+            exact_jobs = st.session_state.setdefault("exact_ink_jobs", {})
+            if digest not in exact_jobs:
+                upload_bytes = uploaded_file.getvalue()
+                exact_jobs[digest] = _background_pool().submit(
+                    coverage_cache.get_or_compute, ("ink", digest), lambda: ink_usage(io.BytesIO(upload_bytes))
+                )
+            if exact_jobs[digest].done():
+                ink_info = exact_jobs.pop(digest).result()  # re-raises the run's error
+            else:
+                with stage("coverage", file=uploaded_file.name):
+                    estimate = coverage_cache.get_or_compute(
+                        ("estimate", digest), lambda: estimate_coverage(uploaded_file)
+                    )
+        elif ink_info is None:
+            with stage("coverage", file=uploaded_file.name):
+                ink_info = coverage_cache.get_or_compute(("ink", digest), lambda: ink_usage(uploaded_file))
+    except Exception as e:
+        read_errors[digest] = f"Couldn't read {uploaded_file.name}: {e}"
+    read_error = read_errors.get(digest)
+    if read_error:
+        st.error(f"{read_error} — enter the length and coverage by hand.")
+
+# a new upload pre-fills the length with its trimmed (inked) height once the exact run is done; edits stick after that
+trim = None
+st.session_state.setdefault("design_height_cm", 150.0)
+if prefill and ink_info:
+    with stage("trim", file=uploaded_file.name):
+        trim = shared_cache().get_or_compute(("trim", digest), lambda: trim_from_ink(uploaded_file, ink_info))
+    if st.session_state.get("trim_prefilled") != digest:
+        st.session_state["trim_prefilled"] = digest
+        if trim["bbox"] is not None:
+            st.session_state["design_height_cm"] = round(trim["length_cm"], 1)
+elif prefill and not read_error:
+    st.caption("The length is pre-filled from the design when the exact result is ready.")
+design_height_cm = st.number_input("Design length / height (cm)", step=1.0, key="design_height_cm")  # user-controlled
+fixed_width_cm = FIXED_WIDTH_CM  # fixed
+if trim is not None:
+    if trim["bbox"] is None:
+        st.warning("The design is fully transparent — there is nothing to print.")
+    else:
+        st.caption(
+            f"Inked area {trim['width_cm']:.1f} × {trim['length_cm']:.1f} cm at {trim['dpi']:.0f} DPI "
+            f"(the file is {trim['height_cm']:.1f} cm long, {trim['height_cm'] - trim['length_cm']:.1f} cm of it "
+            f"transparent margin)"
+        )
+        if not trim["dpi_in_file"]:
+            st.warning("The file has no DPI, so the length assumes 300 DPI — check it.")
+        if trim["width_cm"] > fixed_width_cm + 0.05:
+            st.warning(f"The inked area is {trim['width_cm']:.1f} cm wide — wider than the {fixed_width_cm:.0f} cm film.")
+
+auto_coverage_pct = None
+opacity_factor = 1.0
+# coverage is measured over the whole file; priced on the trimmed length it must be a share of the inked rows
+coverage_scale = 1.0
+if trim is not None and trim["bbox"] is not None:
+    coverage_scale = trim["height_px"] / (trim["bbox"][3] - trim["bbox"][1])
+if estimate is not None:
+    auto_coverage_pct = float(round(estimate["coverage"] * 100, 1))
+    opacity_factor = estimate["mean_opacity"]
+    st.write(
+        f"Estimated coverage (sampled {estimate['rows_sampled']} rows): **{auto_coverage_pct:.1f}%** "
+        f"— 95% range {estimate['low'] * 100:.1f}% to {estimate['high'] * 100:.1f}%"
+    )
+    st.button("Exact result is computing — click to refresh")
+
+if ink_info:
+    auto_coverage_pct = float(round(min(1.0, ink_info["area_coverage"] * coverage_scale) * 100, 1))
+    opacity_factor = ink_info["mean_opacity"]
     st.write(f"Estimated coverage from image (alpha non-empty pixels): **{auto_coverage_pct:.1f}%**")
+    if coverage_scale != 1.0:
+        st.caption("Coverage is of the inked (trimmed) length, to match the pre-filled length.")
+    st.write(f"Mean opacity of inked pixels: **{ink_info['mean_opacity'] * 100:.1f}%** (ink is weighted by opacity)")
 
 # coverage slider (default uses auto estimate if available)
 default_coverage = int(auto_coverage_pct) if auto_coverage_pct is not None else 100
 coverage_pct = st.slider("Printing coverage (%) — adjust as needed", min_value=0, max_value=100, value=default_coverage)
 
+# ink follows opacity: a faint shadow uses less ink than a solid area of the same size
+ink_coverage_frac = (coverage_pct / 100.0) * opacity_factor
+
 # convert lengths
 length_m = design_height_cm / 100.0
 area_m2 = (fixed_width_cm / 100.0) * length_m  # area of the printed stripe in m²
@@ -89,52 +226,134 @@ st.write(f"Coverage (fraction): **{coverage_pct}%** → effective printed area:
 st.markdown("---")
 st.subheader("3) Cost calculation (range)")
 
-# Film cost (linear meters)
-film_cost_total = film_cost_per_m * length_m  # single value
-
-# Ink totals (min/avg/max)
-ink_ml_total_min = ink_ml_per_m_min * (coverage_pct/100.0) * length_m
-ink_ml_total_avg = ink_ml_per_m_avg * (coverage_pct/100.0) * length_m
-ink_ml_total_max = ink_ml_per_m_max * (coverage_pct/100.0) * length_m
-
-ink_cost_min = ink_ml_total_min * ink_price_per_ml
-ink_cost_avg = ink_ml_total_avg * ink_price_per_ml
-ink_cost_max = ink_ml_total_max * ink_price_per_ml
-
-# Powder totals
-powder_g_total_min = powder_g_per_m_min * (coverage_pct/100.0) * length_m
-powder_g_total_avg = powder_g_per_m_avg * (coverage_pct/100.0) * length_m
-powder_g_total_max = powder_g_per_m_max * (coverage_pct/100.0) * length_m
-
-powder_cost_min = powder_g_total_min * powder_price_per_g
-powder_cost_avg = powder_g_total_avg * powder_price_per_g
-powder_cost_max = powder_g_total_max * powder_price_per_g
-
-# Overhead
-overhead_per_m = (labor_monthly + electricity_monthly) / monthly_output_m if monthly_output_m > 0 else 0.0
-overhead_total = overhead_per_m * length_m
-
-# Totals min/avg/max
-total_min = film_cost_total + ink_cost_min + powder_cost_min + overhead_total
-total_avg = film_cost_total + ink_cost_avg + powder_cost_avg + overhead_total
-total_max = film_cost_total + ink_cost_max + powder_cost_max + overhead_total
+with stage("pricing"):
+    costs = price_jobs(length_m, coverage_pct / 100.0, settings, ink_coverage=ink_coverage_frac).iloc[0]
+ink_ml_total_min = costs["ink_ml_min"]
+ink_ml_total_avg = costs["ink_ml_avg"]
+ink_ml_total_max = costs["ink_ml_max"]
 
 # ------- Output table -------
 st.subheader("4) Results — cost range for this file (EGP)")
 
-rows = [
-    ["Film (EGP)", f"{film_cost_total:.2f}", f"{film_cost_total:.2f}", f"{film_cost_total:.2f}"],
-    ["Ink (EGP)", f"{ink_cost_min:.2f}", f"{ink_cost_avg:.2f}", f"{ink_cost_max:.2f}"],
-    ["Powder (EGP)", f"{powder_cost_min:.2f}", f"{powder_cost_avg:.2f}", f"{powder_cost_max:.2f}"],
-    ["Overhead (EGP)", f"{overhead_total:.2f}", f"{overhead_total:.2f}", f"{overhead_total:.2f}"],
-    ["TOTAL (EGP)", f"{total_min:.2f}", f"{total_avg:.2f}", f"{total_max:.2f}"]
-]
-
-result_df = pd.DataFrame(rows, columns=["Item", "Min", "Average", "Max"]).set_index("Item")
-st.table(result_df)
+with stage("render"):
+    result_df = cost_table(costs)
+    st.table(result_df)
 
 st.markdown(f"**Printed linear length:** {length_m:.3f} m — **Coverage:** {coverage_pct}% — **Effective printed area:** {area_m2 * (coverage_pct/100):.3f} m²")
 
+# Per-channel ink split and coverage along the print (only when a design is uploaded)
+if ink_info:
+    with st.expander("Ink by channel & coverage along the print"):
+        split = channel_split(ink_info["channels"])
+        channel_rows = [
+            [
+                name,
+                f"{ink_info['channels'][name] * 100:.1f}%",
+                f"{ink_ml_total_min * split[name]:.2f}",
+                f"{ink_ml_total_avg * split[name]:.2f}",
+                f"{ink_ml_total_max * split[name]:.2f}",
+            ]
+            for name in INK_CHANNELS
+        ]
+        st.table(pd.DataFrame(channel_rows, columns=["Channel", "Coverage", "Min (ml)", "Average (ml)", "Max (ml)"]).set_index("Channel"))
+
+        profile = ink_info["row_profile"]
+        step = max(1, len(profile) // 1000)
+        points = profile[: len(profile) // step * step].reshape(-1, step).mean(axis=1)
+        positions_cm = [i * step / len(profile) * design_height_cm for i in range(len(points))]
+        st.area_chart(pd.DataFrame({"Coverage (%)": points * 100}, index=pd.Index(positions_cm, name="Position (cm)")))
+
+# Zoomable preview with coverage and trim overlays (built once per upload, then cached)
+pyramid = None
+if uploaded_file and not read_error and st.checkbox("Show design preview (coverage & trim overlay)", value=False):
+    try:
+        pyramid = shared_cache().get_or_compute(("preview", digest), lambda: build_pyramid(uploaded_file))
+    except Exception as e:
+        st.error(f"Couldn't build the preview of {uploaded_file.name}: {e}")
+if pyramid is not None:
+    levels = pyramid["levels"]
+    pc1, pc2, pc3, pc4 = st.columns([2, 3, 1, 1])
+    level = pc1.select_slider(
+        "Zoom",
+        options=list(range(len(levels)))[::-1],
+        value=len(levels) - 1,
+        format_func=lambda lvl: f"1:{pyramid['scale'] * 2 ** lvl}",
+    )
+    window_rows = 1200
+    position = 0.0
+    if levels[level].shape[0] > window_rows:
+        position = pc2.slider("Position along the design (%)", min_value=0, max_value=100, value=0) / 100.0
+    show_cov = pc3.checkbox("Coverage", value=True)
+    show_trim = pc4.checkbox("Trim box", value=True)
+    st.image(render_view(pyramid, level, position, window_rows, show_coverage=show_cov, show_trim=show_trim))
+    if pyramid["bbox"] is not None:
+        left, top, right, bottom = pyramid["bbox"]
+        st.caption(
+            f"Trim box {right - left} × {bottom - top} px of {pyramid['width_px']} × {pyramid['height_px']} px "
+            f"({(bottom - top) / pyramid['height_px'] * 100:.1f}% of the height) — "
+            f"alpha coverage {pyramid['coverage'] * 100:.1f}%"
+        )
+    else:
+        st.caption("The design is fully transparent.")
+
 # Optional: downloadable CSV
 csv = result_df.to_csv().encode("utf-8")
 st.download_button("Download cost table (CSV)", csv, "dtf_costs_range.csv", "text/csv")
+
+# ------- Scenario analysis -------
+st.markdown("---")
+with st.expander("5) Scenario analysis — how the total moves when prices and rates change"):
+    st.caption("Each parameter varies around its sidebar value; consumption starts from the avg rate.")
+    varied = st.multiselect(
+        "Parameters to vary",
+        list(PARAMETERS),
+        default=["film_roll_price", "ink_price_per_l", "powder_price_per_kg"],
+        format_func=PARAMETERS.get,
+    )
+    base = base_params(settings)
+    spreads = {}
+    spread_cols = st.columns(3)
+    for i, name in enumerate(varied):
+        pct = spread_cols[i % 3].slider(f"{PARAMETERS[name]} ± %", min_value=1, max_value=100, value=20, key=f"spread_{name}")
+        spreads[name] = (base[name] * (1 - pct / 100.0), base[name] * (1 + pct / 100.0))
+
+    mode = st.radio("Mode", ["Monte Carlo", "Grid"], horizontal=True)
+    if varied:
+        try:
+            with stage("scenarios"):
+                if mode == "Grid":
+                    steps = st.number_input("Steps per parameter", min_value=2, max_value=50, value=10, step=1)
+                    scenarios = sweep_grid(
+                        settings, length_m, coverage_pct / 100.0,
+                        {name: np.linspace(low, high, int(steps)) for name, (low, high) in spreads.items()},
+                        ink_coverage=ink_coverage_frac,
+                    )
+                else:
+                    draws = st.number_input("Draws", min_value=100, max_value=1_000_000, value=20_000, step=1000)
+                    scenarios = monte_carlo(
+                        settings, length_m, coverage_pct / 100.0, spreads, n=int(draws), ink_coverage=ink_coverage_frac
+                    )
+                sensitivity = tornado(settings, length_m, coverage_pct / 100.0, spreads, ink_coverage=ink_coverage_frac)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.write(f"**{len(scenarios):,} scenarios** — total cost (EGP):")
+            st.table(percentiles(scenarios["total"]).to_frame("Total (EGP)").T.style.format("{:.2f}"))
+            st.pyplot(distribution_figure(scenarios["total"], base_total=sensitivity.attrs["base_total"]))
+            st.pyplot(tornado_figure(sensitivity))
+            st.download_button(
+                "Download scenario grid (CSV)",
+                scenarios.rename(columns=PARAMETERS).to_csv(index=False).encode("utf-8"),
+                "dtf_cost_scenarios.csv",
+                "text/csv",
+            )
+    else:
+        st.info("Pick at least one parameter.")
+
+# Timings for this run (DTF_TIMINGS=1 also logs them, see dtf/instrument.py)
+if recorder is not None:
+    recorder.deactivate()
+    recorder.flush()
+    if show_timings:
+        with st.expander("Timing debug panel"):
+            st.dataframe(pd.DataFrame(recorder.rows()))
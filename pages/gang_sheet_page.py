@@ -0,0 +1,122 @@
+# pages/gang_sheet_page.py
+import pandas as pd
+import streamlit as st
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+
+from dtf.cache import content_hash, shared_cache
+from dtf.nesting import DEFAULT_GAP_CM, alpha_extent, design_from_extent, nest
+from dtf.pricing import FIXED_WIDTH_CM, PriceSettings, cost_table, price_jobs
+
+st.set_page_config(page_title="Gang Sheet", layout="wide")
+
+st.title("🧩 Gang Sheet — nest designs on the 60 cm roll")
+
+# prices come from the calculator page's sidebar when it was opened this session
+settings = st.session_state.get("price_settings")
+if settings is None:
+    settings = PriceSettings()
+    st.caption("Using default prices — open the DTF Calculator page to change them.")
+
+uploaded_files = st.file_uploader(
+    "Upload designs (PNG/TIFF) — each is trimmed to the box around its non-transparent pixels",
+    type=["png", "tif", "tiff"],
+    accept_multiple_files=True,
+)
+
+c1, c2, c3, c4 = st.columns(4)
+gap_cm = c1.number_input("Gap between designs (cm)", min_value=0.0, value=DEFAULT_GAP_CM, step=0.1)
+allow_rotation = c2.checkbox("Allow 90° rotation", value=True)
+refine_seconds = c3.number_input("Refine for (seconds, 0 = off)", min_value=0.0, max_value=30.0, value=0.0, step=1.0)
+fallback_dpi = c4.number_input("DPI for files without one", min_value=1.0, value=300.0, step=1.0)
+
+if not uploaded_files:
+    st.info("Upload the designs that go on one sheet.")
+    st.stop()
+
+# --- Trim every design to its alpha bounding box ---
+extent_cache = shared_cache()
+upload_hashes = st.session_state.setdefault("upload_hashes", {})
+# corrupt or too large to decode: remembered per upload, so reruns don't read it again
+read_errors = st.session_state.setdefault("read_errors", {})
+readable, extents = [], []
+progress = st.progress(0.0, text="Reading designs…")
+for i, f in enumerate(uploaded_files):
+    if f.file_id not in upload_hashes:
+        upload_hashes[f.file_id] = content_hash(f.getvalue())
+    digest = upload_hashes[f.file_id]
+    if digest not in read_errors:
+        try:
+            extents.append(extent_cache.get_or_compute(("extent", digest), lambda: alpha_extent(f)))
+            readable.append(f)
+        except Exception as e:
+            read_errors[digest] = f"Couldn't read {f.name}: {e}"
+    progress.progress((i + 1) / len(uploaded_files), text=f"Reading designs… {i + 1}/{len(uploaded_files)}")
+progress.empty()
+for f in uploaded_files:
+    if upload_hashes[f.file_id] in read_errors:
+        st.error(read_errors[upload_hashes[f.file_id]] + " — left out.")
+if not readable:
+    st.stop()
+
+# copies and DPI per design are editable
+table = pd.DataFrame({
+    "Design": [f.name for f in readable],
+    "Copies": 1,
+    "DPI": [e["dpi"] or fallback_dpi for e in extents],
+})
+table = st.data_editor(table, disabled=["Design"], hide_index=True, use_container_width=True)
+
+designs = []
+skipped = []
+for (_, row), extent in zip(table.iterrows(), extents):
+    design = design_from_extent(row["Design"], extent, copies=row["Copies"], dpi=row["DPI"] or fallback_dpi)
+    if design is None:
+        skipped.append(row["Design"])
+    else:
+        designs.append(design)
+if skipped:
+    st.warning("Fully transparent, left out: " + ", ".join(skipped))
+if not designs:
+    st.stop()
+
+try:
+    with st.spinner("Nesting…"):
+        result = nest(designs, gap_cm=gap_cm, allow_rotation=allow_rotation, refine_seconds=refine_seconds)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+
+length_m = result["length_cm"] / 100.0
+st.subheader("Sheet")
+st.write(
+    f"Roll length: **{length_m:.3f} m** for {len(result['placements'])} pieces — "
+    f"box utilization **{result['utilization'] * 100:.1f}%**, "
+    f"print coverage **{result['coverage'] * 100:.1f}%**"
+)
+
+# --- Layout preview ---
+# a Figure of our own, not pyplot's global state: Streamlit runs sessions in threads
+fig = Figure(figsize=(4, max(2.0, min(40.0, 4 * result["length_cm"] / FIXED_WIDTH_CM))))
+ax = fig.subplots()
+ax.add_patch(Rectangle((0, 0), FIXED_WIDTH_CM, result["length_cm"], fill=False, edgecolor="black"))
+for p in result["placements"]:
+    ax.add_patch(Rectangle((p["x_cm"], p["y_cm"]), p["width_cm"], p["height_cm"], alpha=0.6, edgecolor="black", linewidth=0.3))
+ax.set_xlim(0, FIXED_WIDTH_CM)
+ax.set_ylim(result["length_cm"], 0)
+ax.set_aspect("equal")
+ax.set_xlabel("cm")
+st.pyplot(fig)
+
+# --- Cost of the whole sheet ---
+st.subheader("Cost range for this sheet (EGP)")
+costs = price_jobs(length_m, result["coverage"], settings, ink_coverage=result["ink_coverage"]).iloc[0]
+result_df = cost_table(costs)
+st.table(result_df)
+
+placements = pd.DataFrame(result["placements"])
+with st.expander("Placements"):
+    st.dataframe(placements, use_container_width=True)
+
+st.download_button("Download cost table (CSV)", result_df.to_csv().encode("utf-8"), "dtf_gang_sheet_costs.csv", "text/csv")
+st.download_button("Download placements (CSV)", placements.to_csv(index=False).encode("utf-8"), "dtf_gang_sheet_layout.csv", "text/csv")
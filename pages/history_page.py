@@ -0,0 +1,62 @@
+# pages/history_page.py
+import datetime
+import os
+
+import streamlit as st
+
+from dtf.history import HistoryStore, default_history_path
+
+st.set_page_config(page_title="Report History", layout="wide")
+
+st.title("🗂️ Report History — meters per client over time")
+
+history_path = default_history_path()
+if not os.path.exists(history_path):
+    st.info(f"No history yet. Reports run on the Reports page are recorded in {history_path}.")
+    st.stop()
+
+with HistoryStore(history_path) as store:
+    first, last = store.date_range()
+    if first is None:
+        st.info("The history is empty. Run a report on the Reports page first.")
+        st.stop()
+
+    today = datetime.date.today()
+    c1, c2, c3 = st.columns([2, 1, 3])
+    date_range = c1.date_input(
+        "Job dates",
+        value=(max(first, datetime.date(today.year, 1, 1)), last),
+        min_value=first,
+        max_value=max(last, today),
+    )
+    period_label = c2.selectbox("Group by", ["Week", "Month", "Day", "Year", "Whole range"])
+    clients = c3.multiselect("Clients (empty = all)", store.clients())
+
+    # the date widget returns one date while the user is still picking the second
+    start, end = (date_range if len(date_range) == 2 else (date_range[0], date_range[0]))
+    period = None if period_label == "Whole range" else period_label.lower()
+    totals = store.query(start=start, end=end, clients=clients, period=period)
+    raw = store.rows(start=start, end=end, clients=clients) if st.checkbox("Show individual files") else None
+
+if totals.empty:
+    st.info("No jobs in this range.")
+    st.stop()
+
+st.write(
+    f"**{totals['Files'].sum():,} files**, **{totals['Copies'].sum():,} copies**, "
+    f"**{totals['Meters'].sum():,.2f} m** (Σ c*d) from {start} to {end}"
+)
+
+if period is not None:
+    chart = totals.pivot_table(index="Period", columns="Client", values="Meters", aggfunc="sum", observed=True)
+    st.bar_chart(chart)
+
+st.subheader("Per client")
+st.dataframe(totals, use_container_width=True, hide_index=True)
+st.download_button(
+    "Download totals CSV", totals.to_csv(index=False).encode("utf-8"), "report_history_totals.csv", "text/csv"
+)
+
+if raw is not None:
+    st.subheader("Files")
+    st.dataframe(raw, use_container_width=True, hide_index=True)
@@ -1,71 +1,40 @@
 # pages/report_page.py
 import os
 import io
+import sqlite3
+
 import pandas as pd
 import streamlit as st
-from PIL import Image
+
+from dtf.batch import analyze_cached, shared_pool
+from dtf.cache import content_hash, file_hash, shared_cache
+from dtf.history import HistoryStore, default_history_path
+from dtf.instrument import Recorder, enabled_by_env, stage
+from dtf.pricing import PriceSettings
+from dtf.report import (
+    DEFAULT_SCAN_WORKERS,
+    add_costs,
+    apply_trim,
+    list_tifs,
+    process_files,
+    summarize,
+    summarize_costs,
+    trim_fraction,
+)
+from dtf.report_index import INDEX_FILENAME, ReportIndex
 
 st.set_page_config(page_title="Reports", layout="wide")
 
 
-def _get_dpi(img):
-    """
-    Try several ways to get DPI (pixels per inch) from the image.
-    Fallback to 300 if we can't find a reliable DPI.
-    """
-    # 1) Pillow info
-    dpi_info = img.info.get("dpi")
-    if dpi_info:
-        try:
-            if isinstance(dpi_info, (tuple, list)):
-                # (x_dpi, y_dpi)
-                dpi = float(dpi_info[1] or dpi_info[0])
-            else:
-                dpi = float(dpi_info)
-            if dpi > 0:
-                return dpi
-        except Exception:
-            pass
-
-    # 2) TIFF tags (common for .tif) using tag_v2
-    try:
-        tags = getattr(img, "tag_v2", None)
-        if tags:
-            xres = tags.get(282)  # XResolution
-            yres = tags.get(283)  # YResolution
-            resunit = tags.get(296)  # ResolutionUnit: 2=inches, 3=cm
+def _progress(label):
+    """A progress bar and a progress(done, total) callback for it (redrawn ~100 times at most)."""
+    bar = st.progress(0.0, text=label)
 
-            def to_float(v):
-                try:
-                    return float(v)
-                except Exception:
-                    # IFDRational or tuple like (num, den)
-                    try:
-                        if hasattr(v, "numerator") and hasattr(v, "denominator"):
-                            return v.numerator / v.denominator
-                        if isinstance(v, (tuple, list)) and len(v) >= 2:
-                            return float(v[0]) / float(v[1])
-                    except Exception:
-                        return None
-                return None
-
-            val = None
-            if yres is not None:
-                val = to_float(yres)
-            elif xres is not None:
-                val = to_float(xres)
-
-            if val:
-                # if resolution unit == 3 it's per cm, convert to per inch
-                if resunit == 3:
-                    val = val * 2.54
-                if val > 0:
-                    return val
-    except Exception:
-        pass
-
-    # fallback
-    return 300.0
+    def update(done, total):
+        if done == total or done % max(1, total // 100) == 0:
+            bar.progress(done / total, text=f"{label} {done}/{total}")
+
+    return bar, update
 
 
 st.title("📊 Reports — TIF folder → client summary")
@@ -84,18 +53,49 @@ uploaded_files = st.file_uploader(
 
 folder_path = st.text_input("Or enter folder path (local path, e.g. C:\\\\folder\\tifs):", "")
 
-# collect files to process: tuples of (filename, fileobj_or_path, is_uploaded)
+scan_workers = st.number_input(
+    "Scan workers (parallel file reads; 1 = one file at a time)",
+    min_value=1,
+    max_value=64,
+    value=DEFAULT_SCAN_WORKERS,
+    step=1,
+)
+
+use_index = st.checkbox(
+    f"Keep an incremental index in the folder ({INDEX_FILENAME}) — only new or changed files are read",
+    value=True,
+)
+
+compute_costs = st.checkbox(
+    "Compute coverage and cost per client (reads every pixel of every TIF — much slower than headers only)",
+    value=False,
+)
+
+trim_lengths = st.checkbox(
+    "Measure length from the inked area — transparent margins above and below aren't printed "
+    "(reads every pixel too; done in the same pass as coverage)",
+    value=False,
+)
+
+record_history = st.checkbox(
+    "Record processed files in the report history (see the History page)",
+    value=True,
+)
+
+show_timings = st.checkbox("Show timing debug panel", value=enabled_by_env())
+recorder = Recorder("report_page").activate() if show_timings or enabled_by_env() else None
+
+# collect files to process: tuples of (filename, fileobj_or_path)
 files_to_process = []
 
 if uploaded_files:
     for f in uploaded_files:
         # f is a UploadedFile-like object; PIL can open it directly
-        files_to_process.append((f.name, f, True))
+        files_to_process.append((f.name, f))
 elif folder_path:
     if os.path.isdir(folder_path):
-        for fname in os.listdir(folder_path):
-            if fname.lower().endswith((".tif", ".tiff")):
-                files_to_process.append((fname, os.path.join(folder_path, fname), False))
+        with stage("list_files"):
+            files_to_process = list_tifs(folder_path)
     else:
         st.warning("Folder path is not valid or not accessible from the server. If you're on Streamlit Cloud, use Upload instead.")
         files_to_process = []
@@ -105,53 +105,25 @@ if not files_to_process:
     st.stop()
 
 # --- Process files ---
-rows = []
-errors = []
-for fname, source, is_uploaded in files_to_process:
+summary = None
+header_bar, header_progress = _progress("Reading headers…")
+if use_index and not uploaded_files:
     try:
-        name_no_ext = os.path.splitext(fname)[0].strip()
-        # split from the right 2 parts so names with dashes in client are OK: a-b-c  (rsplit)
-        parts = name_no_ext.rsplit("-", 2)
-        if len(parts) != 3:
-            errors.append(f"Filename not in a-b-c format: {fname}")
-            continue
-        client = parts[0].strip()
-        order_s = parts[1].strip()
-        copies_s = parts[2].strip()
-        try:
-            order = int(order_s)
-            copies = int(copies_s)
-        except Exception:
-            errors.append(f"Order or copies not integer in file: {fname}")
-            continue
-
-        # open image
-        if is_uploaded:
-            img = Image.open(source)
-        else:
-            img = Image.open(source)
-
-        # ensure RGBA or at least we can read height
-        height_px = getattr(img, "height", img.size[1])
-
-        dpi = _get_dpi(img)
-        # calculate length in meters: height_px / dpi (inch) * 0.0254 m/in
-        length_m = (height_px / dpi) * 0.0254
-
-        p_val = copies * length_m
-
-        rows.append(
-            {
-                "Client": client,
-                "Order": order,
-                "Copies (c)": copies,
-                "Length (d, m)": round(length_m, 4),
-                "c*d": round(p_val, 4),
-                "File": fname,
-            }
+        with ReportIndex(os.path.join(folder_path, INDEX_FILENAME)) as index, stage("read_headers"):
+            changes = index.update(folder_path, workers=int(scan_workers), progress=header_progress)
+            rows, errors, summary = index.rows(), index.errors(), index.summary()
+        st.caption(
+            f"Index: {changes['added']} new, {changes['changed']} changed, "
+            f"{changes['removed']} removed, {changes['unchanged']} unchanged files"
         )
-    except Exception as e:
-        errors.append(f"Error processing {fname}: {e}")
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"Couldn't use the report index ({e}); reading every file instead.")
+        with stage("read_headers"):
+            rows, errors = process_files(files_to_process, workers=int(scan_workers), progress=header_progress)
+else:
+    with stage("read_headers"):
+        rows, errors = process_files(files_to_process, workers=int(scan_workers), progress=header_progress)
+header_bar.empty()
 
 # --- Build DataFrames and summary ---
 if not rows:
@@ -162,19 +134,104 @@ if not rows:
             st.write("- " + e)
     st.stop()
 
+# --- Record in the history store (once per distinct result, not on every rerun) ---
+if record_history:
+    fingerprint = (folder_path if not uploaded_files else tuple(f.name for f in uploaded_files), len(rows),
+                   round(sum(row["c*d"] for row in rows), 4))
+    if st.session_state.get("history_fingerprint") != fingerprint:
+        # folder files are recorded by path (names repeat across day folders);
+        # uploads have none and are recorded by name
+        job_times = paths = None
+        if not uploaded_files:
+            path_by_name = {name: os.path.abspath(path) for name, path in files_to_process}
+            paths = [path_by_name.get(row["File"]) for row in rows]
+            job_times = []
+            for path in paths:
+                try:
+                    job_times.append(os.stat(path).st_mtime if path else None)
+                except OSError:
+                    job_times.append(None)
+        try:
+            with stage("history"), HistoryStore(default_history_path()) as store:
+                added = store.append(rows, job_times, paths)
+            st.session_state["history_fingerprint"] = fingerprint
+            if added:
+                st.caption(f"History: {added} new or changed files recorded.")
+        except (sqlite3.Error, OSError) as e:
+            st.warning(f"Couldn't record the report history ({e}).")
+
 df = pd.DataFrame(rows)
+# --- Optional: read every file's pixels once for coverage and the inked (trim) box ---
+if compute_costs or trim_lengths:
+    sources = dict(files_to_process)
+    names = df["File"].tolist()
+    keys = []
+    if uploaded_files:
+        # hashed in chunks: getvalue() would copy every upload once more
+        upload_hashes = st.session_state.setdefault("upload_hashes", {})
+        new_uploads = [f for f in uploaded_files if f.file_id not in upload_hashes]
+        if new_uploads:
+            hash_bar, hash_progress = _progress("Hashing uploads…")
+            with stage("upload_hash"):
+                for done, f in enumerate(new_uploads, start=1):
+                    upload_hashes[f.file_id] = file_hash(f)
+                    hash_progress(done, len(new_uploads))
+            hash_bar.empty()
+        digest_by_name = {f.name: upload_hashes[f.file_id] for f in uploaded_files}
+        keys = [digest_by_name[name] for name in names]
+    else:
+        for name in names:
+            info = os.stat(sources[name])
+            keys.append(content_hash(f"{os.path.abspath(sources[name])}\0{info.st_size}\0{info.st_mtime_ns}".encode()))
+
+    progress = st.progress(0.0, text="Reading pixels…")
+
+    def _show(done, total, i, result):
+        progress.progress(done / total, text=f"Pixels {done}/{total}: {result['name']}")
+
+    # uploads are read (or spilled to temp files) only as workers free up,
+    # within DTF_MEMORY_BUDGET_MB of file bytes in flight
+    with stage("coverage"):
+        results = analyze_cached([(name, sources[name]) for name in names], keys, shared_cache(),
+                                 pool=shared_pool(), progress=_show,
+                                 memory_budget=int(os.environ.get("DTF_MEMORY_BUDGET_MB", "512")) * 1024 * 1024)
+    progress.empty()
+    errors = errors + [result["error"] for result in results if result["error"]]
+    if compute_costs:
+        # set before trimming, which rescales them to the trimmed area
+        df["Coverage"] = [result.get("coverage") for result in results]
+        df["Ink coverage"] = [result.get("ink_coverage") for result in results]
+
+# lengths without the transparent margins (the history keeps the header lengths)
+if trim_lengths:
+    with stage("trim"):
+        df = apply_trim(df, [trim_fraction(result) for result in results])
+    summary = None
+    saved = (df["Copies (c)"] * df["Raw length (m)"]).sum() - df["c*d"].sum()
+    st.caption(f"Without their transparent margins these jobs need {saved:,.2f} m less film (Σ c*d).")
+
+# --- Optional: cost of every file, priced with the calculator's settings ---
+if compute_costs:
+    # prices come from the calculator page's sidebar when it was opened this session
+    settings = st.session_state.get("price_settings")
+    if settings is None:
+        settings = PriceSettings()
+        st.caption("Costs use default prices — open the DTF Calculator page to change them.")
+    with stage("pricing"):
+        df = add_costs(df, settings)
+        summary = summarize_costs(df)
+
 # summary per client: Number of Orders = max order, P = sum(c*d)
-summary = (
-    df.groupby("Client", as_index=False)
-    .agg({"Order": "max", "c*d": "sum"})
-    .rename(columns={"Order": "Number of Orders", "c*d": "P (Σ c*d)"})
-)
+if summary is None:
+    with stage("groupby"):
+        summary = summarize(df)
 
-st.subheader("📌 Summary per Client")
-st.dataframe(summary, use_container_width=True)
+with stage("render"):
+    st.subheader("📌 Summary per Client")
+    st.dataframe(summary, use_container_width=True)
 
-st.subheader("📂 Raw Files Processed")
-st.dataframe(df.sort_values(["Client", "Order"]), use_container_width=True)
+    st.subheader("📂 Raw Files Processed")
+    st.dataframe(df.sort_values(["Client", "Order"]), use_container_width=True)
 
 # show any errors
 if errors:
@@ -185,3 +242,11 @@ if errors:
 # --- Download CSV ---
 csv = summary.to_csv(index=False).encode("utf-8")
 st.download_button("Download summary CSV", csv, "report_summary.csv", "text/csv")
+
+# Timings for this run (DTF_TIMINGS=1 also logs them, see dtf/instrument.py)
+if recorder is not None:
+    recorder.deactivate()
+    recorder.flush()
+    if show_timings:
+        with st.expander("Timing debug panel"):
+            st.dataframe(pd.DataFrame(recorder.rows()), use_container_width=True)
@@ -0,0 +1,65 @@
+"""Shared fixtures: hand-built TIFFs in layouts Pillow's writer doesn't produce."""
+import io
+import struct
+from fractions import Fraction
+
+import pytest
+
+# TIFF field type -> struct code (a RATIONAL is two LONGs)
+_CODES = {3: "H", 4: "L", 5: "L"}
+
+
+def write_tiff(pixels, byteorder="<", rows_per_strip=None, resolution=None, unit=2):
+    """
+    An uncompressed RGBA or LA TIFF of `pixels` ((rows, width, 4 or 2) uint8).
+
+    `byteorder` is "<" (II) or ">" (MM). `resolution` (pixels per `unit`,
+    2 = inch, 3 = cm) is left out when None.
+    """
+    height, width, samples = pixels.shape
+    rows = rows_per_strip or height
+    out = bytearray(b"II*\0" if byteorder == "<" else b"MM\0*") + bytes(4)
+
+    def put(data):
+        if len(out) % 2:
+            out.append(0)
+        offset = len(out)
+        out.extend(data)
+        return offset
+
+    strips = [pixels[y:y + rows].tobytes() for y in range(0, height, rows)]
+    offsets = [put(strip) for strip in strips]
+    entries = [
+        (256, 4, [width]),
+        (257, 4, [height]),
+        (258, 3, [8] * samples),
+        (259, 3, [1]),
+        (262, 3, [2 if samples == 4 else 1]),
+        (273, 4, offsets),
+        (277, 3, [samples]),
+        (278, 4, [rows]),
+        (279, 4, [len(strip) for strip in strips]),
+    ]
+    if resolution is not None:
+        ratio = Fraction(resolution).limit_denominator(10_000)
+        entries += [(282, 5, [ratio]), (283, 5, [ratio]), (296, 3, [unit])]
+    entries.append((338, 3, [2]))  # extra sample: unassociated alpha
+
+    ifd = struct.pack(byteorder + "H", len(entries))
+    for tag, field_type, values in entries:
+        if field_type == 5:
+            values = [part for value in values for part in (value.numerator, value.denominator)]
+            count = len(values) // 2
+        else:
+            count = len(values)
+        data = struct.pack(byteorder + _CODES[field_type] * len(values), *values)
+        inline = data.ljust(4, b"\0") if len(data) <= 4 else struct.pack(byteorder + "L", put(data))
+        ifd += struct.pack(byteorder + "HHL", tag, field_type, count) + inline
+    ifd += bytes(4)
+    out[4:8] = struct.pack(byteorder + "L", put(ifd))
+    return io.BytesIO(bytes(out))
+
+
+@pytest.fixture
+def make_tiff():
+    return write_tiff
@@ -0,0 +1,190 @@
+"""Streaming decoders: strip by strip gives the same pixels as a full Pillow decode."""
+import io
+import struct
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from dtf import coverage
+from dtf.coverage import alpha_pixel_count, iter_alpha_strips, iter_rgba_strips
+
+HEIGHT, WIDTH = 37, 23
+
+# strip sizes: one row, a few rows that don't divide the height, everything
+STRIP_BYTES = [1, WIDTH * 4 * 5, coverage.DEFAULT_STRIP_BYTES]
+
+
+def _pixels():
+    """Noise, gradients with partial alpha, a transparent gap and a solid block."""
+    rng = np.random.default_rng(0)
+    rgba = np.zeros((HEIGHT, WIDTH, 4), dtype=np.uint8)
+    rgba[:12] = rng.integers(0, 256, (12, WIDTH, 4))
+    rgba[12:25] = np.linspace(0, 255, WIDTH, dtype=np.uint8)[None, :, None]
+    rgba[12:25, :, 3] = np.arange(13)[:, None] * 20
+    rgba[30:, 5:9] = [10, 200, 30, 255]
+    return rgba
+
+
+def _rgba_image():
+    return Image.fromarray(_pixels(), "RGBA")
+
+
+def _la_pixels():
+    return np.asarray(_rgba_image().convert("LA"))
+
+
+def _saved(img, fmt, **save_args):
+    buf = io.BytesIO()
+    img.save(buf, fmt, **save_args)
+    buf.seek(0)
+    return buf
+
+
+def _palette_image(colours=256):
+    """P image with a tRNS chunk holding partial alphas."""
+    index = (_pixels()[..., 0] // (256 // colours)).astype(np.uint8)
+    img = Image.fromarray(index, "L").convert("P")
+    img.putpalette([v for i in range(colours) for v in (i, 255 - i, 128)])
+    img.info["transparency"] = bytes([0, 40, 255, 90] * (colours // 4))
+    return img
+
+
+def _pngs():
+    rgba = _rgba_image()
+    images = {
+        "RGBA": rgba,
+        "LA": rgba.convert("LA"),
+        "RGB": rgba.convert("RGB"),
+        "L": rgba.convert("L"),
+        "P": _palette_image(),
+    }
+    cases = {}
+    for mode, img in images.items():
+        for name, save_args in [("default", {}), ("optimize", {"optimize": True}), ("stored", {"compress_level": 0})]:
+            cases[f"{mode}-{name}"] = (img, save_args)
+    cases["RGB-transparency-key"] = (images["RGB"], {"transparency": tuple(_pixels()[3, 3, :3].tolist())})
+    cases["L-transparency-key"] = (images["L"], {"transparency": int(np.asarray(images["L"])[30, 0])})
+    # 4- and 16-bit: not streamed, decoded whole
+    cases["P-4bit"] = (_palette_image(16), {})
+    cases["I;16"] = (Image.fromarray(_pixels()[..., 0].astype(np.uint16) * 257), {})
+    return cases
+
+
+# name -> build(make_tiff); Pillow writes little-endian only, so the
+# big-endian files are built by hand
+TIFFS = {
+    "raw-one-strip": lambda make_tiff: _saved(_rgba_image(), "TIFF"),
+    "raw-strips": lambda make_tiff: _saved(_rgba_image(), "TIFF", tiffinfo={278: 5}),
+    "raw-LA": lambda make_tiff: _saved(_rgba_image().convert("LA"), "TIFF", tiffinfo={278: 4}),
+    "bigtiff": lambda make_tiff: _saved(_rgba_image(), "TIFF", big_tiff=True),
+    "big-endian-one-strip": lambda make_tiff: make_tiff(_pixels(), ">"),
+    "big-endian-strips": lambda make_tiff: make_tiff(_pixels(), ">", rows_per_strip=6),
+    "big-endian-LA": lambda make_tiff: make_tiff(_la_pixels(), ">", rows_per_strip=3),
+    "RGB": lambda make_tiff: _saved(_rgba_image().convert("RGB"), "TIFF"),
+    # compressed TIFFs go through libtiff and are decoded whole
+    "lzw": lambda make_tiff: _saved(_rgba_image(), "TIFF", compression="tiff_lzw", tiffinfo={278: 5}),
+    "deflate": lambda make_tiff: _saved(_rgba_image(), "TIFF", compression="tiff_deflate", tiffinfo={278: 5}),
+    "packbits": lambda make_tiff: _saved(_rgba_image(), "TIFF", compression="packbits"),
+}
+
+
+# cases that must take the streaming paths, or the comparisons below only
+# test Pillow against itself
+STREAMED_TIFFS = sorted(set(TIFFS) - {"RGB", "lzw", "deflate", "packbits"})
+STREAMED_PNGS = sorted(set(_pngs()) - {"P-4bit", "I;16"})
+
+
+def _expected(source):
+    source.seek(0)
+    with Image.open(source) as img:
+        return np.array(img.convert("RGBA"))
+
+
+def _check_strips(source, strip_bytes):
+    expected = _expected(source)
+    source.seek(0)
+    with Image.open(source) as img:
+        alpha = np.concatenate(list(iter_alpha_strips(img, strip_bytes=strip_bytes)))
+    np.testing.assert_array_equal(alpha, expected[..., 3])
+
+    source.seek(0)
+    with Image.open(source) as img:
+        rgba = np.concatenate(list(iter_rgba_strips(img, strip_bytes=strip_bytes)))
+    np.testing.assert_array_equal(rgba, expected)
+
+    assert alpha_pixel_count(source, strip_bytes=strip_bytes) == (
+        int(np.count_nonzero(expected[..., 3])), HEIGHT * WIDTH
+    )
+
+
+@pytest.mark.parametrize("strip_bytes", STRIP_BYTES)
+@pytest.mark.parametrize("name", sorted(_pngs()))
+def test_png_strips_match_full_decode(name, strip_bytes):
+    img, save_args = _pngs()[name]
+    _check_strips(_saved(img, "PNG", **save_args), strip_bytes)
+
+
+@pytest.mark.parametrize("strip_bytes", STRIP_BYTES)
+@pytest.mark.parametrize("name", sorted(TIFFS))
+def test_tiff_strips_match_full_decode(name, strip_bytes, make_tiff):
+    _check_strips(TIFFS[name](make_tiff), strip_bytes)
+
+
+def test_cases_take_streaming_paths(make_tiff):
+    for name in STREAMED_TIFFS:
+        with Image.open(TIFFS[name](make_tiff)) as img:
+            assert coverage._band_tiles(img, 5) is not None, name
+    for name in STREAMED_PNGS:
+        img, save_args = _pngs()[name]
+        with Image.open(_saved(img, "PNG", **save_args)) as png:
+            assert coverage._png_layout(png) is not None, name
+
+
+@pytest.mark.parametrize("name", ["RGBA-optimize", "P-default"])
+def test_without_band_decoder_matches(name, monkeypatch):
+    monkeypatch.setattr(coverage, "_HAVE_BAND_DECODER", False)
+    img, save_args = _pngs()[name]
+    _check_strips(_saved(img, "PNG", **save_args), WIDTH * 4 * 5)
+
+
+def _png_filters(source, bytes_per_pixel):
+    data = source.getvalue()
+    pos = 8
+    idat = b""
+    while pos < len(data):
+        length, kind = struct.unpack(">L4s", data[pos:pos + 8])
+        if kind == b"IDAT":
+            idat += data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+    scan = zlib.decompress(idat)
+    row_bytes = 1 + WIDTH * bytes_per_pixel
+    return {scan[y * row_bytes] for y in range(HEIGHT)}
+
+
+def test_png_fixture_uses_every_filter():
+    # None/Sub/Up/Average/Paeth; Up, Average and Paeth read the row above,
+    # which crosses band boundaries
+    img, save_args = _pngs()["RGBA-optimize"]
+    assert _png_filters(_saved(img, "PNG", **save_args), 4) == {0, 1, 2, 3, 4}
+
+
+def test_truncated_png_raises():
+    img, save_args = _pngs()["RGBA-default"]
+    data = _saved(img, "PNG", **save_args).getvalue()
+    idat = data.index(b"IDAT")
+    with Image.open(io.BytesIO(data[:idat + 60])) as truncated:
+        with pytest.raises(OSError):
+            list(iter_alpha_strips(truncated, strip_bytes=WIDTH * 4))
+
+
+def test_full_decode_limit(monkeypatch, make_tiff):
+    monkeypatch.setenv("DTF_MAX_FULL_DECODE_MB", "0")
+    with Image.open(TIFFS["lzw"](make_tiff)) as img:
+        with pytest.raises(ValueError, match="DTF_MAX_FULL_DECODE_MB"):
+            list(iter_alpha_strips(img))
+    # streamed formats don't need the limit
+    _check_strips(TIFFS["big-endian-strips"](make_tiff), WIDTH * 4 * 5)
+    img, save_args = _pngs()["LA-optimize"]
+    _check_strips(_saved(img, "PNG", **save_args), WIDTH * 4 * 5)
@@ -0,0 +1,58 @@
+"""DPI lookup: a TIFF without resolution tags has no DPI, whatever Pillow's info says."""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from dtf.batch import analyze_design, price_batch
+from dtf.nesting import alpha_extent, design_from_extent
+from dtf.pricing import PriceSettings
+from dtf.report import get_dpi, has_dpi, read_tif_info
+from dtf.trim import trim_extent
+
+
+def _design(fmt, size=(200, 300), **save_args):
+    pixels = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+    pixels[size[1] // 3:, :, 3] = 255
+    buf = io.BytesIO()
+    Image.fromarray(pixels, "RGBA").save(buf, fmt, **save_args)
+    buf.seek(0)
+    return buf
+
+
+@pytest.mark.parametrize("fmt, save_args, dpi, stated", [
+    ("TIFF", {}, 300.0, False),
+    ("TIFF", {"dpi": (150, 150)}, 150.0, True),
+    ("TIFF", {"resolution": 59.0, "resolution_unit": "cm"}, 149.86, True),
+    ("PNG", {}, 300.0, False),
+    ("PNG", {"dpi": (200, 200)}, 200.0, True),
+])
+def test_get_dpi_and_has_dpi(fmt, save_args, dpi, stated):
+    with Image.open(_design(fmt, **save_args)) as img:
+        assert get_dpi(img) == pytest.approx(dpi, abs=0.01)
+        assert has_dpi(img) is stated
+
+
+@pytest.mark.parametrize("save_args, dpi", [({}, 300.0), ({"dpi": (150, 150)}, 150.0)])
+def test_read_tif_info_header_path(save_args, dpi):
+    assert read_tif_info(_design("TIFF", **save_args)) == (300, pytest.approx(dpi))
+
+
+def test_untagged_tiff_uses_fallback_everywhere():
+    source = _design("TIFF", size=(2000, 3000))
+
+    result = analyze_design("untagged.tif", source.getvalue())
+    assert result["dpi"] is None
+    row = price_batch([result], PriceSettings()).iloc[0]
+    assert not row["DPI from file"]
+    assert row["Length (cm)"] == pytest.approx(3000 / 300 * 2.54)
+
+    trim = trim_extent(source)
+    assert not trim["dpi_in_file"]
+    assert trim["length_cm"] == pytest.approx(2000 / 300 * 2.54)
+
+    extent = alpha_extent(source)
+    assert extent["dpi"] is None
+    design = design_from_extent("untagged.tif", extent, dpi=200.0)
+    assert design.width_cm == pytest.approx(2000 / 200 * 2.54)
@@ -0,0 +1,82 @@
+"""Report history: one row per job, and daily totals that match the rows."""
+import datetime
+
+import pandas as pd
+import pytest
+
+from dtf.history import HistoryStore
+
+DAY = 86400
+T0 = datetime.datetime(2026, 3, 2, 12).timestamp()
+
+
+def _row(client, order, copies, length_m, name=None):
+    return {"Client": client, "Order": order, "Copies (c)": copies, "Length (d, m)": length_m,
+            "c*d": round(copies * length_m, 4), "File": name or f"{client}-{order}-{copies}.tif"}
+
+
+def _assert_totals_match_rows(store):
+    rows = store.rows()
+    expected = rows.groupby("Client", observed=True).agg(
+        Files=("File", "size"), Copies=("Copies (c)", "sum"), Meters=("c*d", "sum"), MaxOrder=("Order", "max"),
+    ).reset_index()
+    totals = store.query(period=None)
+    assert totals["Files"].tolist() == expected["Files"].tolist()
+    assert totals["Copies"].tolist() == expected["Copies"].tolist()
+    assert totals["Meters"].to_numpy() == pytest.approx(expected["Meters"].to_numpy())
+    assert totals["Max Order"].tolist() == expected["MaxOrder"].tolist()
+    days = store.query(period="day")
+    assert days["Files"].sum() == len(rows)
+
+
+@pytest.fixture
+def store(tmp_path):
+    with HistoryStore(str(tmp_path / "history.sqlite")) as store:
+        yield store
+
+
+def test_folder_files_are_recorded_once_per_path(store):
+    rows = [_row("acme", 1, 2, 0.5), _row("acme", 2, 1, 1.0), _row("zed", 7, 3, 0.25)]
+    paths = [f"/share/day1/{row['File']}" for row in rows]
+    assert store.append(rows, [T0] * 3, paths) == 3
+    assert store.append(rows, [T0] * 3, paths) == 0
+    # touched or re-synced: new mtime, same job
+    assert store.append(rows, [T0 + DAY] * 3, paths) == 0
+    # same names in another folder are other jobs
+    assert store.append(rows, [T0 + DAY] * 3, [p.replace("day1", "day2") for p in paths]) == 3
+    assert len(store.rows()) == 6
+    _assert_totals_match_rows(store)
+
+
+def test_changed_file_replaces_its_row(store):
+    rows = [_row("acme", 1, 2, 0.5), _row("acme", 5, 1, 1.0)]
+    paths = ["/share/a.tif", "/share/b.tif"]
+    store.append(rows, [T0, T0], paths)
+    # b.tif re-exported as a smaller job a week later, under another client
+    assert store.append([_row("zed", 3, 1, 0.2, name="b.tif")], [T0 + 7 * DAY], ["/share/b.tif"]) == 1
+    history = store.rows()
+    assert len(history) == 2
+    assert history["Client"].tolist() == ["acme", "zed"]
+    _assert_totals_match_rows(store)
+    acme = store.query(period=None).set_index("Client").loc["acme"]
+    assert acme["Max Order"] == 1
+    assert acme["Meters"] == pytest.approx(1.0)
+
+
+def test_uploads_are_recorded_once_per_name_and_length(store):
+    rows = [_row("acme", 1, 2, 0.5), _row("zed", 7, 3, 0.25)]
+    assert store.append(rows) == 2
+    assert store.append(rows) == 0
+    assert store.append([_row("acme", 1, 2, 0.75)]) == 1
+    _assert_totals_match_rows(store)
+
+
+def test_query_buckets(store):
+    rows = [_row("acme", i, 1, 1.0) for i in range(1, 4)]
+    store.append(rows, [T0, T0 + DAY, T0 + 40 * DAY], [f"/p/{i}" for i in range(3)])
+    weeks = store.query(period="week")
+    assert weeks["Period"].tolist() == [datetime.date(2026, 3, 2), datetime.date(2026, 4, 6)]
+    assert weeks["Meters"].tolist() == pytest.approx([2.0, 1.0])
+    months = store.query(start=datetime.date(2026, 4, 1), period="month")
+    assert months["Files"].tolist() == [1]
+    assert isinstance(store.query()["Client"].dtype, pd.CategoricalDtype)
@@ -0,0 +1,37 @@
+"""Request validation of the quote service: bad input is a 400, never a 500 or invalid JSON."""
+import json
+
+import pytest
+
+from dtf.quote_server import BadRequest, load_settings, price_json_jobs
+
+SETTINGS = load_settings()
+
+
+@pytest.mark.parametrize("job", [
+    {"length_m": 1e999, "coverage": 0.5},
+    {"length_m": float("nan"), "coverage": 0.5},
+    {"length_m": -1, "coverage": 0.5},
+    {"length_m": 1, "coverage": 1.5},
+    {"length_m": 1, "coverage": 0.5, "ink_coverage": 1.5},
+    {"length_m": 1, "coverage": 0.5, "copies": 2.5},
+    {"length_m": 1, "coverage": 0.5, "copies": 0},
+    {"length_m": 1e300, "coverage": 0.5, "copies": 1e10},
+    {"coverage": 0.5},
+])
+def test_bad_jobs_are_rejected(job):
+    with pytest.raises(BadRequest):
+        price_json_jobs([job], SETTINGS)
+
+
+def test_quote_is_valid_json():
+    quote = price_json_jobs([{"length_m": 1.5, "coverage": 0.4, "copies": "2"}], SETTINGS)[0]
+    json.loads(json.dumps(quote, allow_nan=False))
+    assert quote["film"] == pytest.approx(3 * SETTINGS.film_cost_per_m, abs=1e-3)
+
+
+@pytest.mark.parametrize("overrides", [{"roll_length_m": 0}, {"roll_length_m": "inf"}, {"ink_price_per_l": -1},
+                                       {"no_such_field": 1}])
+def test_bad_settings_are_rejected(overrides):
+    with pytest.raises(BadRequest):
+        load_settings(overrides=overrides)
@@ -0,0 +1,66 @@
+"""Incremental report index: totals match a full scan, however the folder is reached."""
+import os
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+from dtf.report import process_files, summarize, walk_tifs
+from dtf.report_index import ReportIndex
+
+
+def _write_tifs(folder, names, height=300, dpi=100):
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        Image.new("L", (10, height)).save(os.path.join(folder, name), "TIFF", dpi=(dpi, dpi))
+
+
+def _full_summary(folder):
+    rows, _ = process_files([(name, path) for name, path in walk_tifs(folder)])
+    return summarize(pd.DataFrame(rows))
+
+
+def _assert_same(index, folder):
+    pd.testing.assert_frame_equal(index.summary(), _full_summary(folder), check_dtype=False)
+
+
+def test_incremental_update(tmp_path):
+    folder = str(tmp_path / "jobs")
+    _write_tifs(folder, ["acme-1-2.tif", "acme-2-1.tif", "zed-7-3.tif", "bad name.tif"])
+    with ReportIndex(str(tmp_path / "index.sqlite")) as index:
+        assert index.update(folder) == {"added": 4, "changed": 0, "removed": 0, "unchanged": 0}
+        _assert_same(index, folder)
+        assert len(index.errors()) == 1
+
+        os.remove(os.path.join(folder, "acme-2-1.tif"))
+        _write_tifs(folder, ["zed-7-3.tif"], height=600)
+        os.utime(os.path.join(folder, "zed-7-3.tif"), ns=(1, 1))
+        _write_tifs(folder, ["zed-8-1.tif"])
+        assert index.update(folder) == {"added": 1, "changed": 1, "removed": 1, "unchanged": 2}
+        _assert_same(index, folder)
+        assert [os.path.basename(path) for path, _ in index.sources(folder)] == [row["File"] for row in index.rows()]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_same_folder_through_a_symlink(tmp_path):
+    folder = str(tmp_path / "jobs")
+    _write_tifs(folder, ["acme-1-2.tif", "zed-7-3.tif"])
+    link = str(tmp_path / "mounted")
+    os.symlink(folder, link)
+    with ReportIndex(os.path.join(folder, ".index.sqlite")) as index:
+        index.update(folder)
+        assert index.update(link) == {"added": 0, "changed": 0, "removed": 0, "unchanged": 2}
+        _assert_same(index, folder)
+        assert index.sources(link)[0][0] == os.path.join(link, "acme-1-2.tif")
+
+
+def test_another_folder_replaces_the_rows(tmp_path):
+    day1, day2 = str(tmp_path / "day1"), str(tmp_path / "day2")
+    _write_tifs(day1, ["acme-1-2.tif", "zed-7-3.tif"])
+    _write_tifs(day2, ["acme-1-1.tif"], height=900)
+    with ReportIndex(str(tmp_path / "index.sqlite")) as index:
+        index.update(day1)
+        assert index.update(day2)["removed"] == 2
+        _assert_same(index, day2)
+        assert index.update(day1)["added"] == 2
+        _assert_same(index, day1)
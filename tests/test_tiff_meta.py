@@ -0,0 +1,98 @@
+"""TIFF header reader: same size and DPI as Image.open + get_dpi."""
+import io
+import math
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from dtf.report import get_dpi, read_tif_info
+from dtf.tiff_meta import (
+    TAG_HEIGHT,
+    TAG_RESOLUTION_UNIT,
+    TAG_WIDTH,
+    TAG_X_RESOLUTION,
+    TAG_Y_RESOLUTION,
+    read_tiff_tags,
+)
+
+WANTED = (TAG_WIDTH, TAG_HEIGHT, TAG_X_RESOLUTION, TAG_Y_RESOLUTION, TAG_RESOLUTION_UNIT)
+
+
+def _pixels(height=41, width=17):
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    pixels[height // 2:, :, 3] = 255
+    return pixels
+
+
+def _saved(**save_args):
+    buf = io.BytesIO()
+    Image.fromarray(_pixels(), "RGBA").save(buf, "TIFF", **save_args)
+    buf.seek(0)
+    return buf
+
+
+# name -> build(make_tiff)
+TIFFS = {
+    "no-resolution": lambda make_tiff: _saved(),
+    "dpi": lambda make_tiff: _saved(dpi=(150, 150)),
+    "cm": lambda make_tiff: _saved(resolution=59.0, resolution_unit="cm"),
+    "odd-dpi": lambda make_tiff: _saved(dpi=(72.5, 72.5)),
+    "lzw": lambda make_tiff: _saved(dpi=(200, 200), compression="tiff_lzw"),
+    "bigtiff": lambda make_tiff: _saved(dpi=(600, 600), big_tiff=True),
+    "bigtiff-no-resolution": lambda make_tiff: _saved(big_tiff=True),
+    "big-endian": lambda make_tiff: make_tiff(_pixels(), ">", resolution=300),
+    "big-endian-cm": lambda make_tiff: make_tiff(_pixels(), ">", resolution=118.11, unit=3),
+    "big-endian-no-unit": lambda make_tiff: make_tiff(_pixels(), ">", resolution=96, unit=1),
+    "big-endian-no-resolution": lambda make_tiff: make_tiff(_pixels(), ">", rows_per_strip=4),
+    "little-endian-strips": lambda make_tiff: make_tiff(_pixels(), "<", rows_per_strip=4, resolution=254),
+}
+
+
+def _pillow_tags(source):
+    source.seek(0)
+    with Image.open(source) as img:
+        return {tag: img.tag_v2[tag] for tag in WANTED if tag in img.tag_v2}, (img.height, get_dpi(img))
+
+
+@pytest.mark.parametrize("name", sorted(TIFFS))
+def test_read_tiff_tags_matches_pillow(name, make_tiff):
+    source = TIFFS[name](make_tiff)
+    tags = read_tiff_tags(source)
+    expected, _ = _pillow_tags(source)
+    assert tags is not None
+    assert tags.keys() == expected.keys()
+    for tag, value in expected.items():
+        assert float(tags[tag]) == pytest.approx(float(value)), tag
+
+
+@pytest.mark.parametrize("name", sorted(TIFFS))
+def test_read_tif_info_matches_get_dpi(name, make_tiff):
+    source = TIFFS[name](make_tiff)
+    _, expected = _pillow_tags(source)
+    assert read_tif_info(source) == (expected[0], pytest.approx(expected[1]))
+
+
+def test_read_tiff_tags_restores_position(make_tiff):
+    source = TIFFS["big-endian"](make_tiff)
+    source.seek(5)
+    read_tiff_tags(source)
+    assert source.tell() == 5
+
+
+def test_zero_denominator_reads_as_nan(make_tiff):
+    # a resolution of 0/0 is NaN to Pillow too; get_dpi falls back to 300
+    source = make_tiff(_pixels(), "<", resolution=300)
+    data = bytearray(source.getvalue())
+    # each RATIONAL is stored out of line as numerator, denominator (LONGs)
+    rational = (300).to_bytes(4, "little") + (1).to_bytes(4, "little")
+    data = data.replace(rational, bytes(8))
+    source = io.BytesIO(bytes(data))
+    assert math.isnan(read_tiff_tags(source)[TAG_X_RESOLUTION])
+    _, expected = _pillow_tags(source)
+    assert read_tif_info(source) == expected
+
+
+@pytest.mark.parametrize("data", [b"", b"II*\0", b"XX*\0\x08\0\0\0", b"II\x2a\0\xff\xff\xff\x00"])
+def test_not_a_readable_tiff_returns_none(data):
+    assert read_tiff_tags(io.BytesIO(data)) is None
@@ -0,0 +1,56 @@
+"""Trim box: ink_usage() finds the same inked box as trim_extent()."""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from dtf.ink import ink_usage
+from dtf.trim import trim_extent, trim_from_ink
+
+
+def _png(alpha, dpi=(300, 300)):
+    rgba = np.zeros(alpha.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = 200
+    rgba[..., 3] = alpha
+    buf = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(buf, "PNG", dpi=dpi)
+    buf.seek(0)
+    return buf
+
+
+def _alphas():
+    rng = np.random.default_rng(1)
+    blank = np.zeros((120, 80), dtype=np.uint8)
+    band = blank.copy()
+    band[60:, :] = 255
+    speck = blank.copy()
+    speck[7, 33] = 1
+    box = blank.copy()
+    box[10:95, 5:70] = rng.integers(0, 256, (85, 65))
+    return {"blank": blank, "band": band, "speck": speck, "box": box}
+
+
+@pytest.mark.parametrize("name", sorted(_alphas()))
+@pytest.mark.parametrize("strip_bytes", [80 * 4 * 7, 64 * 1024 * 1024])
+def test_trim_from_ink_matches_trim_extent(name, strip_bytes):
+    source = _png(_alphas()[name])
+    expected = trim_extent(source, strip_bytes=strip_bytes)
+    ink = ink_usage(source, strip_bytes=strip_bytes)
+    assert ink["bbox"] == expected["bbox"]
+    assert trim_from_ink(source, ink) == expected
+
+
+def test_trim_lengths():
+    trim = trim_extent(_png(_alphas()["band"], dpi=(254, 254)))
+    assert trim["bbox"] == (0, 60, 80, 120)
+    assert trim["length_cm"] == pytest.approx(0.6)
+    assert trim["height_cm"] == pytest.approx(1.2)
+    assert trim["dpi_in_file"]
+
+
+def test_ink_result_without_bbox_falls_back():
+    source = _png(_alphas()["box"])
+    ink = ink_usage(source)
+    del ink["bbox"]
+    assert trim_from_ink(source, ink) == trim_extent(source)